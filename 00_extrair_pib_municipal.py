@@ -1,63 +1,114 @@
 # 00_extrair_pib_municipal.py
 # -*- coding: utf-8 -*-
-import os
+#
+# As publicações do IBGE vêm do registro de fontes_pib.py (lidas em paralelo,
+# com cache por arquivo). Novas versões (--extras / PIPELINE_PIB_EXTRAS)
+# entram depois das planilhas-base; anos repetidos ficam com o valor da
+# versão mais recente. Com --anexar, só as versões extras são consultadas e o
+# intermediário de cada região é atualizado por partição (codigo_ibge, ano).
 import argparse
 import logging
-from pathlib import Path
 
 import pandas as pd
-from variaveis import INPUT_PATHS, OUTPUT_PATHS, MUNICIPIOS
+import armazenamento
+from fontes_pib import carregar_fontes, combinar, registro
+from regioes import SELETOR_AJUDA, caminhos_regiao, distribuir, selecionar_regioes
+from variaveis import INPUT_PATHS, N_JOBS, PIB_EXTRAS, REGIOES_SELECIONADAS
 
 
-def load_pib(path: Path) -> pd.DataFrame:
+def filter_municipios(df: pd.DataFrame, ids: set[int]) -> pd.DataFrame:
     """
-    Carrega planilha de PIB (XLS ou XLSX), renomeia colunas dinamicamente
-    e retorna DataFrame com ['codigo_ibge','municipio','ano','pib'].
+    Filtra apenas os municípios da região selecionada.
     """
-    engine = "xlrd" if path.suffix.lower() == ".xls" else "openpyxl"
-    df = pd.read_excel(path, engine=engine)
-
-    # Detecta colunas conforme cabeçalhos reais
-    code_col = next(
-        c for c in df.columns if "Código" in c and "Município" in c)
-    name_col = next(c for c in df.columns if "Nome" in c and "Município" in c)
-    year_col = next(c for c in df.columns if c.strip().lower() == "ano")
-    pib_col = next(c for c in df.columns if "Produto Interno Bruto" in c)
-
-    df = df.rename(columns={
-        code_col:   "codigo_ibge",
-        name_col:   "municipio",
-        year_col:   "ano",
-        pib_col:    "pib"
-    })
-
-    # Garante apenas as 4 colunas necessárias
-    return df[["codigo_ibge", "municipio", "ano", "pib"]]
+    return df[df["codigo_ibge"].isin(ids)]
 
 
-def filter_municipios(df: pd.DataFrame) -> pd.DataFrame:
+def main(input_old: str, input_new: str, output_csv: str | None = None,
+         regioes: list[str] = REGIOES_SELECIONADAS,
+         extras: list[str] = PIB_EXTRAS,
+         n_jobs: int = N_JOBS):
     """
-    Filtra apenas os municípios definidos em variaveis.MUNICIPIOS.
+    Lê as publicações uma única vez para a união das regiões e grava um CSV
+    por região (`output_csv` só é aceito com uma região).
     """
-    ids = [m.id for m in MUNICIPIOS]
-    return df[df["codigo_ibge"].isin(ids)]
-
-
-def main(input_old: str, input_new: str, output_csv: str):
-    logging.info(f"Iniciando extração de PIB: {input_old}, {input_new}")
-    old_df = load_pib(Path(input_old))
-    new_df = load_pib(Path(input_new))
-
-    df = pd.concat([old_df, new_df], ignore_index=True)
-    df = filter_municipios(df)
-    df = df.sort_values(["codigo_ibge", "ano"])
-
-    # garante que a pasta de saída existe
-    out_dir = os.path.dirname(output_csv)
-    os.makedirs(out_dir, exist_ok=True)
-
-    df.to_csv(output_csv, index=False, encoding="utf-8-sig")
-    logging.info(f"Arquivo PIB salvo em: {output_csv}")
+    fontes = registro(input_old, input_new, extras)
+    logging.info("Iniciando extração de PIB: "
+                 + ", ".join(f.arquivo for f in fontes))
+    selecao = selecionar_regioes(regioes)
+    ids = {c for codigos in selecao.values() for c in codigos}
+    logging.info(f"{len(selecao)} região(ões), {len(ids)} municípios")
+
+    df = combinar(carregar_fontes(fontes, ids, n_jobs))
+    df = filter_municipios(df, ids)
+
+    for regiao, df_regiao in distribuir(df, selecao).items():
+        destino = output_csv or caminhos_regiao(regiao)[1].pib_ibge_csv
+        # formato e tipos definidos pela camada de armazenamento
+        destino = armazenamento.gravar(df_regiao, destino, "pib")
+        logging.info(f"Arquivo PIB ({regiao}) salvo em: {destino}")
+
+
+def anexar(input_old: str, input_new: str, output_csv: str | None = None,
+           regioes: list[str] = REGIOES_SELECIONADAS,
+           extras: list[str] = PIB_EXTRAS,
+           n_jobs: int = N_JOBS):
+    """
+    Modo anexar: lê só as planilhas `extras` e atualiza o intermediário de
+    cada região por partição (codigo_ibge, ano). Partições novas são
+    acrescentadas; as já gravadas são conferidas e, se o IBGE revisou o
+    valor, substituídas. Municípios que ainda não estão no intermediário são
+    lidos também das planilhas-base; os que saíram da seleção são removidos.
+    """
+    selecao = selecionar_regioes(regioes)
+    destinos = {r: output_csv or caminhos_regiao(r)[1].pib_ibge_csv
+                for r in selecao}
+    atuais = {}
+    for regiao, codigos in selecao.items():
+        if armazenamento.existe(destinos[regiao]):
+            atuais[regiao] = armazenamento.ler(destinos[regiao], "pib",
+                                               codigos=codigos)
+        else:
+            atuais[regiao] = armazenamento.vazio("pib")
+
+    ids = {c for codigos in selecao.values() for c in codigos}
+    ausentes = {c for regiao, codigos in selecao.items()
+                for c in set(codigos) - set(atuais[regiao]["codigo_ibge"])}
+    logging.info(f"Modo anexar: {len(extras)} planilha(s) nova(s), "
+                 f"{len(ausentes)} município(s) sem histórico")
+    base, novo, *novas = registro(input_old, input_new, extras)
+    dfs = carregar_fontes([base, novo], ausentes, n_jobs) if ausentes else []
+    dfs += carregar_fontes(novas, ids, n_jobs) if novas else []
+    if not dfs:
+        logging.info("Nada a anexar: informe as novas planilhas em --extras")
+        return
+    fonte = filter_municipios(combinar(dfs), ids)
+
+    for regiao, fonte_regiao in distribuir(fonte, selecao).items():
+        atual = atuais[regiao]
+        chaves = armazenamento.particoes(fonte_regiao)
+        sobrepostas = armazenamento.particoes(atual).isin(chaves)
+        # Confere os anos já gravados que reaparecem na planilha nova
+        comparacao = atual[sobrepostas].merge(
+            armazenamento.aplicar_esquema(fonte_regiao, "pib"),
+            on=["codigo_ibge", "ano"], suffixes=("_atual", "_novo"))
+        pib_igual = (comparacao["pib_atual"].eq(comparacao["pib_novo"])
+                     | (comparacao["pib_atual"].isna()
+                        & comparacao["pib_novo"].isna()))
+        nome_igual = (comparacao["municipio_atual"].astype(object)
+                      == comparacao["municipio_novo"].astype(object))
+        alteradas = comparacao[~(pib_igual & nome_igual)]
+        if len(alteradas):
+            exemplos = alteradas[["codigo_ibge", "ano"]].head(3).to_dict("records")
+            logging.warning(f"{regiao}: {len(alteradas)} partição(ões) revista(s) "
+                            f"pelo IBGE serão substituídas (ex.: {exemplos})")
+
+        df = pd.concat([atual[~sobrepostas], fonte_regiao], ignore_index=True)
+        df = df.sort_values(["codigo_ibge", "ano"])
+        destino = armazenamento.gravar(df, destinos[regiao], "pib")
+        logging.info(f"Arquivo PIB ({regiao}) atualizado em: {destino} "
+                     f"({len(chaves) - int(sobrepostas.sum())} partições novas, "
+                     f"{len(alteradas)} revistas, "
+                     f"{int(sobrepostas.sum()) - len(alteradas)} conferidas)")
 
 
 if __name__ == "__main__":
@@ -73,13 +124,37 @@ if __name__ == "__main__":
         help="Caminho do arquivo XLSX (2010–2021)"
     )
     parser.add_argument(
-        "--output", default=OUTPUT_PATHS.pib_ibge_csv,
-        help="CSV de saída consolidado"
+        "--extras", nargs="+", default=PIB_EXTRAS,
+        help="Versões posteriores do IBGE (ex.: 2010–2022), na ordem de "
+             "publicação; anos repetidos ficam com o valor da mais recente"
+    )
+    parser.add_argument(
+        "--anexar", action="store_true",
+        help="Lê só as planilhas de --extras e atualiza o intermediário por "
+             "(município, ano), conferindo os anos já gravados"
+    )
+    parser.add_argument(
+        "--output", default=None,
+        help="Saída consolidada; a extensão segue PIPELINE_FORMATO "
+             "(padrão: a de cada região)"
+    )
+    parser.add_argument(
+        "--regioes", "--regiao", nargs="+", default=REGIOES_SELECIONADAS,
+        help=f"Uma ou mais regiões: {SELETOR_AJUDA}"
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=N_JOBS,
+        help="Processos para ler as planilhas sem cache (-1 = todos os "
+             "núcleos). Padrão: %(default)s"
     )
     args = parser.parse_args()
+    if args.output and len(args.regioes) > 1:
+        parser.error("--output só pode ser usado com uma única região")
 
     logging.basicConfig(
         level=logging.INFO,
         format="%(asctime)s [%(levelname)s] %(message)s"
     )
-    main(args.input_old, args.input_new, args.output)
+    executar = anexar if args.anexar else main
+    executar(args.input_old, args.input_new, args.output, args.regioes,
+             args.extras, args.jobs)
@@ -1,56 +1,220 @@
 # 02_extrair_alertas_desmatamento.py
 # Extrai todos os alertas de desmatamento via API MapBiomas
+#
+# O período é dividido em janelas de datas × territórios ("shards"), baixados
+# em paralelo pelo cliente da API (cliente_api.py: pool de conexões, token
+# em cache, backoff em 429/5xx e limite de requisições por segundo). Cada
+# shard concluído é gravado em disco, de modo que uma execução interrompida
+# retoma de onde parou; os alertas são escritos no CSV e na base local
+# (SQLite) à medida que os shards chegam.
+#
+# Com --sync, só são buscados os alertas posteriores à data mais recente já
+# armazenada na base (menos uma janela de revisão), que são então mesclados.
+#
+# Sem --territories, os IDs de território vêm dos códigos IBGE das regiões
+# selecionadas (--regioes), pelo índice local de territórios (territorios.py),
+# que só baixa o catálogo da API quando vence o TTL.
 
 import os
 import sys
-import requests
+import json
 import argparse
+from typing import Iterator
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import pandas as pd
 
-from variaveis import OUTPUT_PATHS
+import base_alertas
+import territorios
+from cliente_api import ClienteAPI
+from regioes import SELETOR_AJUDA, selecionar_regioes
+from variaveis import API_ALERTAS, OUTPUT_PATHS, REGIOES_SELECIONADAS
 
+SHARDS_DIR = "data/cache/alertas_shards"
+# Chave única do alerta, usada para remover duplicatas entre territórios
+CHAVE_ALERTA = "alertCode"
 
-def get_token(base_url: str) -> str:
-    """Obtém token da API local via /token."""
-    email = os.getenv("MAPBIOMAS_EMAIL")
-    pwd = os.getenv("MAPBIOMAS_PASSWORD")
-    if not email or not pwd:
-        print("Erro: defina MAPBIOMAS_EMAIL e MAPBIOMAS_PASSWORD", file=sys.stderr)
-        sys.exit(1)
-    resp = requests.post(
-        f"{base_url}/token",
-        json={"email": email, "password": pwd},
-        timeout=30
-    )
-    resp.raise_for_status()
-    return resp.json()["token"]
-
-
-def fetch_all_alerts(base_url: str,
-                     token: str,
-                     start_date: str,
-                     end_date: str,
-                     territory_ids: list[int]) -> list[dict]:
-    """Chama /alerts/all e retorna a lista de alertas."""
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {
-        "startDate":     start_date,
-        "endDate":       end_date,
-        "territoryIds":  ",".join(str(i) for i in territory_ids)
-    }
-    resp = requests.get(
-        f"{base_url}/alerts/all",
-        headers=headers,
-        params=params,
-        timeout=300
-    )
-    resp.raise_for_status()
-    return resp.json().get("collection", [])
+
+# -----------------------------------------------------------------------
+# 1) Shards (janela de datas × território) e checkpoints
+
+def gerar_shards(start_date: str,
+                 end_date: str,
+                 territory_ids: list[int],
+                 dias_por_janela: int) -> list[tuple[str, str, int]]:
+    """Divide o período em janelas de `dias_por_janela` dias por território."""
+    ini, fim = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    janelas = []
+    while ini <= fim:
+        ate = min(ini + timedelta(days=dias_por_janela - 1), fim)
+        janelas.append((ini.isoformat(), ate.isoformat()))
+        ini = ate + timedelta(days=1)
+    return [(a, b, t) for t in territory_ids for a, b in janelas]
+
+
+def caminho_shard(shard: tuple[str, str, int], shards_dir: str = SHARDS_DIR) -> str:
+    ini, fim, tid = shard
+    return os.path.join(shards_dir, f"{tid}_{ini}_{fim}.json")
+
+
+def baixar_shard(cliente: ClienteAPI,
+                 shard: tuple[str, str, int],
+                 shards_dir: str = SHARDS_DIR) -> str:
+    """
+    Baixa um shard e grava o checkpoint (escrita atômica).
+    Shards já presentes em disco não são baixados de novo.
+    """
+    path = caminho_shard(shard, shards_dir)
+    if os.path.exists(path):
+        return path
+    ini, fim, tid = shard
+    alerts = cliente.alertas(ini, fim, [tid], timeout=120)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(alerts, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
+
+
+def ler_shard(path: str) -> list[dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iterar_shards(cliente: ClienteAPI,
+                  shards: list[tuple[str, str, int]],
+                  workers: int = 4,
+                  shards_dir: str = SHARDS_DIR) -> Iterator[tuple[tuple, list[dict]]]:
+    """
+    Baixa os shards em paralelo e produz (shard, alertas) em ordem de shard,
+    lendo cada um do checkpoint assim que os anteriores estiverem prontos
+    (a saída é determinística e nenhum shard fica retido em memória).
+    """
+    os.makedirs(shards_dir, exist_ok=True)
+    prontos: dict[int, str] = {}
+    proximo = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futuros = {
+            pool.submit(baixar_shard, cliente, s, shards_dir): i
+            for i, s in enumerate(shards)
+        }
+        for fut in as_completed(futuros):
+            prontos[futuros[fut]] = fut.result()
+            while proximo in prontos:
+                yield shards[proximo], ler_shard(prontos.pop(proximo))
+                proximo += 1
+
+
+class EscritorCSV:
+    """
+    Escreve lotes de alertas no CSV, sem duplicar `CHAVE_ALERTA`, e a tabela
+    filha de municípios cruzados (alert_code, source, name, geocode).
+    """
+
+    def __init__(self, output_path: str, municipios_path: str):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        self.output_path = output_path
+        self.municipios_path = municipios_path
+        self.tmp = f"{output_path}.tmp"
+        self.tmp_municipios = f"{municipios_path}.tmp"
+        self.arquivo = open(self.tmp, "w", encoding="utf-8-sig", newline="")
+        self.arquivo_municipios = open(
+            self.tmp_municipios, "w", encoding="utf-8-sig", newline="")
+        self.arquivo_municipios.write(
+            ",".join(base_alertas.COLUNAS_MUNICIPIOS) + "\n")
+        self.vistos: set = set()
+        self.colunas: list[str] | None = None
+        self.total = 0
+
+    def escrever(self, batch: list[dict]) -> int:
+        # registros sem a chave não são deduplicados (vão como vieram)
+        batch = [a for a in batch
+                 if a.get(CHAVE_ALERTA) is None
+                 or a[CHAVE_ALERTA] not in self.vistos]
+        self.vistos.update(a[CHAVE_ALERTA] for a in batch
+                           if a.get(CHAVE_ALERTA) is not None)
+        if batch:
+            df = pd.DataFrame(batch)
+            if self.colunas is None:
+                self.colunas = list(df.columns)
+            df.reindex(columns=self.colunas).to_csv(
+                self.arquivo, index=False, header=(self.total == 0))
+            pd.DataFrame(
+                base_alertas.municipios_de_alertas(batch),
+                columns=base_alertas.COLUNAS_MUNICIPIOS,
+            ).to_csv(self.arquivo_municipios, index=False, header=False)
+            self.total += len(df)
+        return len(batch)
+
+    def fechar(self) -> int:
+        self.arquivo.close()
+        self.arquivo_municipios.close()
+        for tmp, final in ((self.tmp, self.output_path),
+                           (self.tmp_municipios, self.municipios_path)):
+            if self.total:
+                os.replace(tmp, final)
+            else:
+                os.remove(tmp)
+        return self.total
+
+
+def limpar_shards(shards: list[tuple[str, str, int]], shards_dir: str = SHARDS_DIR):
+    """Remove os checkpoints após uma execução completa."""
+    for s in shards:
+        try:
+            os.remove(caminho_shard(s, shards_dir))
+        except FileNotFoundError:
+            pass
 
 
 # -----------------------------------------------------------------------
 # 2) Main
 
+def shards_sync(con,
+                territory_ids: list[int],
+                start_date: str,
+                end_date: str,
+                lookback_days: int,
+                dias_por_janela: int) -> list[tuple[str, str, int]]:
+    """
+    Shards incrementais: por território, do watermark armazenado menos
+    `lookback_days` (para capturar revisões) até `end_date`.
+    """
+    shards = []
+    for tid in territory_ids:
+        marca = base_alertas.watermark(con, tid)
+        inicio = start_date
+        if marca:
+            inicio = max(
+                start_date,
+                (date.fromisoformat(marca[:10])
+                 - timedelta(days=lookback_days)).isoformat(),
+            )
+        shards += gerar_shards(inicio, end_date, [tid], dias_por_janela)
+    return shards
+
+
+def resolver_territorios(seletores: list[str],
+                         cliente: ClienteAPI,
+                         forcar: bool = False) -> list[int]:
+    """IDs de território dos municípios das regiões, pelo índice local."""
+    codigos = sorted({c for cs in selecionar_regioes(seletores).values() for c in cs})
+    con = territorios.garantir_indice(cliente, forcar=forcar)
+    ids = territorios.territorios_por_codigo(con, codigos)
+    con.close()
+    faltando = [c for c in codigos if c not in ids]
+    if faltando:
+        print(f"[AVISO] {len(faltando)} municípios sem território no índice: "
+              f"{faltando[:10]}")
+    if not ids:
+        print("Erro: nenhum território encontrado para as regiões "
+              f"{seletores}", file=sys.stderr)
+        sys.exit(1)
+    print(f"[INFO] {len(ids)} territórios resolvidos para {len(codigos)} municípios")
+    return [ids[c] for c in codigos if c in ids]
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Extrai todos os alertas de desmatamento via API MapBiomas"
@@ -62,40 +226,111 @@ def main():
     )
     parser.add_argument(
         "--end", "-e",
-        default="2025-03-31",
-        help="Data final (YYYY-MM-DD). Padrão: %(default)s"
+        default=None,
+        help="Data final (YYYY-MM-DD). Padrão: 2025-03-31 (hoje com --sync)"
     )
     parser.add_argument(
         "--territories", "-t",
-        default="19606,17294,17994",
-        help="IDs de territórios separados por vírgula. Padrão: %(default)s"
+        default=None,
+        help="IDs de territórios separados por vírgula (padrão: os municípios "
+             "de --regioes, pelo índice de territórios)"
+    )
+    parser.add_argument(
+        "--regioes", "--regiao", nargs="+", default=REGIOES_SELECIONADAS,
+        help=f"Regiões cujos municípios são baixados: {SELETOR_AJUDA}. "
+             "Padrão: %(default)s"
+    )
+    parser.add_argument(
+        "--atualizar-territorios", action="store_true",
+        help="Baixa o catálogo de territórios mesmo dentro do TTL"
     )
     parser.add_argument(
         "--server", "-u",
-        default="http://localhost:8000",
+        default=API_ALERTAS.url,
         help="URL base do servidor API. Padrão: %(default)s"
     )
+    parser.add_argument(
+        "--rps",
+        type=float, default=API_ALERTAS.req_por_segundo,
+        help="Limite de requisições por segundo à API (0 = sem limite). "
+             "Padrão: %(default)s"
+    )
+    parser.add_argument(
+        "--window-days", "-w",
+        type=int, default=90,
+        help="Dias por janela de download. Padrão: %(default)s"
+    )
+    parser.add_argument(
+        "--workers", "-j",
+        type=int, default=4,
+        help="Downloads simultâneos. Padrão: %(default)s"
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Sincroniza a base local apenas com alertas novos ou revisados"
+    )
+    parser.add_argument(
+        "--lookback-days",
+        type=int, default=90,
+        help="Janela de revisão do --sync, em dias. Padrão: %(default)s"
+    )
+    parser.add_argument(
+        "--db",
+        default=OUTPUT_PATHS.alertas_db,
+        help="Base local de alertas (SQLite). Padrão: %(default)s"
+    )
     args = parser.parse_args()
 
-    territory_ids = [int(x) for x in args.territories.split(",")]
+    end_date = args.end or (
+        date.today().isoformat() if args.sync else "2025-03-31")
 
-    # 2.1) Autenticar e buscar alerts
-    token = get_token(args.server)
-    alerts = fetch_all_alerts(
-        args.server, token, args.start, args.end, territory_ids
-    )
+    # 2.1) Autenticar, resolver territórios e planejar shards
+    cliente = ClienteAPI(args.server, conexoes=args.workers,
+                         req_por_segundo=args.rps)
+    cliente.token()
+    if args.territories:
+        territory_ids = [int(x) for x in args.territories.split(",")]
+    else:
+        territory_ids = resolver_territorios(
+            args.regioes, cliente, forcar=args.atualizar_territorios)
+    con = base_alertas.conectar(args.db)
+    if args.sync:
+        shards = shards_sync(con, territory_ids, args.start, end_date,
+                             args.lookback_days, args.window_days)
+    else:
+        shards = gerar_shards(args.start, end_date, territory_ids,
+                              args.window_days)
+        base_alertas.remover_periodo(con, territory_ids, args.start, end_date)
+    print(f"[INFO] {len(shards)} shards "
+          f"({len(territory_ids)} territórios × janelas de {args.window_days} dias)")
+
+    # 2.2) Baixar shards, gravar na base e (carga completa) no CSV
+    output_path = OUTPUT_PATHS.alertas_csv
+    csv = None if args.sync else EscritorCSV(
+        output_path, OUTPUT_PATHS.alertas_municipios_csv)
+    total = 0
+    for i, (shard, batch) in enumerate(iterar_shards(
+            cliente, shards, workers=args.workers), start=1):
+        total += base_alertas.upsert_alertas(con, batch, shard[2])
+        novos = csv.escrever(batch) if csv else len(batch)
+        print(f"[INFO] Shard {i}/{len(shards)} ({novos} alertas)")
+    print(f"[INFO] {cliente.requisicoes} requisições à API "
+          f"({cliente.novas_tentativas} novas tentativas)")
+    con.commit()
+    con.close()
+    limpar_shards(shards)
 
-    if not alerts:
+    if args.sync:
+        print(f"✅ {total} alertas sincronizados em: {args.db}")
+        return
+
+    total = csv.fechar()
+    if not total:
         print("Nenhum alerta retornado para esses parâmetros.")
         sys.exit(0)
 
-    # 2.2) Salvar CSV
-    df = pd.DataFrame(alerts)
-    output_path = OUTPUT_PATHS.alertas_csv
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df.to_csv(output_path, index=False, encoding="utf-8-sig")
-
-    print(f"✅ {len(alerts)} alertas salvos em: {output_path}")
+    print(f"✅ {total} alertas salvos em: {output_path} e {args.db}")
 
 
 if __name__ == "__main__":
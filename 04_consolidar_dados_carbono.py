@@ -1,175 +1,349 @@
 # 04_consolidar_dados_carbono.py
 # Consolida dados, gera modelo de precificação e salva métricas
+#
+# Com várias regiões (--regioes), os alertas são lidos uma única vez e
+# repartidos pelo código IBGE do município; cada região gera o seu
+# consolidado, métricas e artefatos (ver regioes.caminhos_regiao).
 
 import os
-import ast
+import re
+import json
+import argparse
 
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import r2_score, mean_squared_error
-from sklearn.linear_model import LinearRegression, Lasso
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.neural_network import MLPRegressor
-from sklearn.svm import SVR
-from sklearn.dummy import DummyRegressor
-from xgboost import XGBRegressor
-
-from variaveis import INPUT_PATHS, OUTPUT_PATHS, FEATURE_COLS
-
-# 1) Cria diretórios de saída
-os.makedirs("results/figures", exist_ok=True)
-os.makedirs("data/generated", exist_ok=True)
-
-# 2) Carrega datasets pré-processados
-df_pib = pd.read_csv(INPUT_PATHS.pib_municipal,       encoding='utf-8-sig')
-df_gee = pd.read_csv(INPUT_PATHS.cobertura_municipal, encoding='utf-8-sig')
-df_alertas = pd.read_csv(INPUT_PATHS.alertas,             encoding='utf-8-sig')
-
-# 3) Extrai 'municipio' de crossedCitiesList e o 'ano'
-
-
-def extract_municipio(crossed_str):
-    try:
-        recs = ast.literal_eval(crossed_str)
-        for rec in recs:
-            if rec.get('source', '').lower() == 'município':
-                return rec.get('name')
-    except Exception:
-        return None
-
-
-df_alertas['municipio'] = df_alertas['crossedCitiesList'].apply(
-    extract_municipio)
-df_alertas['ano'] = pd.to_datetime(df_alertas['detectedAt']).dt.year
 
-# 4) Renomeia coluna de cobertura para GEE_tCO2e, se necessário
-if 'GEE_tCO2e' not in df_gee.columns:
-    if 'cobertura' in df_gee.columns:
-        df_gee.rename(columns={'cobertura': 'GEE_tCO2e'}, inplace=True)
-    else:
-        raise KeyError("Coluna 'GEE_tCO2e' não encontrada em df_gee")
-
-# 5) Agrupa dados por município e ano
-df_desmat = (
-    df_alertas
-    .groupby(['municipio', 'ano'], as_index=False)['areaHa']
-    .sum()
-    .rename(columns={'areaHa': 'area_desmatada_ha'})
-)
+import armazenamento
+from ajuste_modelos import N_CANDIDATOS, ajustar_modelos
+from consolidacao import codigos_por_nome, consolidar
+from base_alertas import (
+    ler_alertas, ler_municipios, municipio_por_alerta, municipios_de_texto)
+from artefatos_modelos import (
+    carregar_artefatos, marcar_atual, salvar_artefatos, versao_artefatos,
+    versao_existe)
+from modelos import criar_modelos, treinar_modelos
+from precos_carbono import INSTRUMENTO_PADRAO, instrumentos, serie_preco
+from regioes import SELETOR_AJUDA, caminhos_regiao, distribuir, selecionar_regioes
+from validacao_cruzada import ESQUEMAS, validar
+from variaveis import INPUT_PATHS, FEATURE_COLS, N_JOBS, REGIOES_SELECIONADAS
 
-df_merge_pib = (
-    df_pib
-    .groupby(['municipio', 'ano'], as_index=False)['pib']
-    .sum()
+parser = argparse.ArgumentParser(
+    description="Consolida dados e treina os modelos de preço de carbono."
 )
-
-df_merge_gee = (
-    df_gee
-    .groupby(['municipio', 'ano'], as_index=False)['GEE_tCO2e']
-    .sum()
+parser.add_argument(
+    "--n-jobs", "-j", type=int, default=N_JOBS,
+    help="Núcleos para o treino dos modelos (-1 = todos). Padrão: %(default)s"
 )
-
-# 6) Merge final
-df_final = pd.merge(df_merge_pib, df_merge_gee, on=[
-                    'municipio', 'ano'], how='outer')
-df_final = pd.merge(df_final,    df_desmat,     on=[
-                    'municipio', 'ano'], how='outer')
-
-# 7) Seleciona colunas e exporta CSV consolidado
-df_final = df_final[['municipio', 'ano',
-                     'pib', 'GEE_tCO2e', 'area_desmatada_ha']]
-df_final.to_csv(
-    'data/generated/carbono_serra_penitente.csv',
-    index=False,
-    encoding='utf-8-sig'
+parser.add_argument(
+    "--instrumentos", nargs="+", default=[INSTRUMENTO_PADRAO],
+    help="Mercados de carbono a modelar; o primeiro é o principal "
+         "(métricas em model_results_csv e figuras). 'todos' usa todos "
+         "os instrumentos da planilha. Padrão: %(default)s"
+)
+parser.add_argument(
+    "--regioes", "--regiao", nargs="+", default=REGIOES_SELECIONADAS,
+    help=f"Uma ou mais regiões: {SELETOR_AJUDA}. Padrão: %(default)s"
 )
-print('✅ Dataset final gerado: data/generated/carbono_serra_penitente.csv')
+parser.add_argument(
+    "--ajustar", action="store_true",
+    help="Busca os hiperparâmetros de cada modelo (successive halving em "
+         "validação cruzada no treino, com cache em disco) antes do treino"
+)
+parser.add_argument(
+    "--candidatos", type=int, default=N_CANDIDATOS,
+    help="Candidatos sorteados por modelo em --ajustar. Padrão: %(default)s"
+)
+parser.add_argument(
+    "--validacao", nargs="+", choices=ESQUEMAS, default=[],
+    help="Validação cruzada adicional: 'temporal' (janela expansível por "
+         "ano), 'janela' (janela deslizante) e/ou 'municipio' (dobras "
+         "agrupadas por município, repetidas); grava média e IC de 95%% "
+         "por modelo ao lado do CSV de métricas"
+)
+parser.add_argument(
+    "--repeticoes", type=int, default=5,
+    help="Repetições das dobras por município. Padrão: %(default)s"
+)
+args = parser.parse_args()
+if args.instrumentos == ['todos']:
+    args.instrumentos = [INSTRUMENTO_PADRAO] + [
+        i for i in instrumentos() if i != INSTRUMENTO_PADRAO]
+
+regioes = selecionar_regioes(args.regioes)
+
+# 2) Carrega os alertas (comuns a todas as regiões).
+# Alertas: base local da etapa 02 (SQLite); CSV monolítico como alternativa.
+# Os municípios cruzados vêm da tabela filha normalizada; para CSVs antigos
+# sem essa tabela, crossedCitiesList é interpretado de forma vetorizada.
+falhas_municipio = 0
+if os.path.exists(INPUT_PATHS.alertas_db):
+    df_alertas = ler_alertas(INPUT_PATHS.alertas_db)
+    df_cidades = ler_municipios(INPUT_PATHS.alertas_db)
+else:
+    df_alertas = pd.read_csv(INPUT_PATHS.alertas, encoding='utf-8-sig')
+    if 'alertCode' not in df_alertas.columns:
+        df_alertas['alertCode'] = df_alertas.index
+    if os.path.exists(INPUT_PATHS.alertas_municipios):
+        df_cidades = pd.read_csv(INPUT_PATHS.alertas_municipios,
+                                 encoding='utf-8-sig',
+                                 dtype={'alert_code': str})
+    else:
+        df_cidades, falhas_municipio = municipios_de_texto(
+            df_alertas['alertCode'], df_alertas['crossedCitiesList'])
+
+if df_alertas.empty:
+    print("[AVISO] Nenhum alerta na base: desmatamento zero em todas as regiões")
+
+# 3) Associa 'municipio' e 'codigo_ibge' (join pela chave do alerta) e
+# extrai o 'ano'
+chave_alerta = df_alertas['alertCode'].astype(str)
+df_alertas['municipio'] = chave_alerta.map(municipio_por_alerta(df_cidades))
+df_alertas['codigo_ibge'] = pd.to_numeric(
+    chave_alerta.map(municipio_por_alerta(df_cidades, 'geocode')),
+    errors='coerce').astype('Int64')
+# Alertas sem geocode: código pelo nome normalizado (só entre os municípios
+# selecionados; nomes ambíguos ficam sem código)
+sem_codigo = df_alertas['codigo_ibge'].isna() & df_alertas['municipio'].notna()
+if sem_codigo.any():
+    df_alertas.loc[sem_codigo, 'codigo_ibge'] = codigos_por_nome(
+        df_alertas.loc[sem_codigo, 'municipio'],
+        {c for codigos in regioes.values() for c in codigos}).astype('Int64')
+if falhas_municipio:
+    print(f"[AVISO] {falhas_municipio} alertas com crossedCitiesList "
+          "malformado (sem município)")
+sem_municipio = int(df_alertas['codigo_ibge'].isna().sum())
+if sem_municipio:
+    print(f"[AVISO] {sem_municipio} alertas sem município associado "
+          "serão ignorados na agregação")
+df_alertas['ano'] = pd.to_datetime(df_alertas['detectedAt']).dt.year
+
+# Um único groupby por código reparte os alertas entre as regiões
+alertas_por_regiao = distribuir(
+    df_alertas.dropna(subset=['codigo_ibge']), regioes)
+
+
+def consolidar_regiao(regiao: str, entradas, saidas) -> pd.DataFrame:
+    """
+    Consolida PIB, cobertura e desmatamento da região por município-ano,
+    com chave (codigo_ibge, ano) em vez do nome do município.
+    """
+    # 1) Cria diretórios de saída
+    os.makedirs(os.path.dirname(saidas.carbono_consolidado_csv), exist_ok=True)
+
+    # 2) Carrega datasets pré-processados da região
+    df_pib = armazenamento.ler(entradas.pib_municipal, 'pib',
+                               colunas=['codigo_ibge', 'municipio', 'ano', 'pib'])
+    df_gee = armazenamento.ler(entradas.cobertura_municipal, 'cobertura_long',
+                               colunas=['codigo_ibge', 'municipio', 'ano',
+                                        'cobertura'])
+    df_alertas_regiao = alertas_por_regiao[regiao]
+
+    # 3) Soma cada fonte por (codigo_ibge, ano) e junta na matriz densa
+    # município × ano; nomes do IBGE, depois MapBiomas, depois alertas
+    df_final = consolidar(
+        regioes[regiao],
+        {
+            'pib': (df_pib, 'pib'),
+            'GEE_tCO2e': (df_gee, 'cobertura'),
+            'area_desmatada_ha': (df_alertas_regiao, 'areaHa'),
+        },
+        nomes=[df_pib, df_gee, df_alertas_regiao],
+    )
+
+    # 4) Exporta o consolidado
+    destino = armazenamento.gravar(
+        df_final, saidas.carbono_consolidado_csv, 'carbono_consolidado')
+    print(f'✅ Dataset final gerado ({regiao}): {destino}')
+    return df_final
 
 # --- Removida aqui a geração de figuras 1–3, pois são recriadas em 05_gerar_figuras_carbono.py ---
 
 # 8) Predição de preço de carbono e salvamento de métricas
+SPLIT_PARAMS = {'test_size': 0.2, 'random_state': 42}
+# Mínimo de linhas município-ano para modelar um instrumento secundário
+# (--instrumentos): com menos, o split deixa o treino menor que os vizinhos
+# do KNN ou o teste vazio
+MIN_LINHAS_INSTRUMENTO = 20
 
-# 8.1) Carrega preços de carbono (EU ETS)
-price_raw = pd.read_excel(
-    INPUT_PATHS.carbon_prices_raw,
-    sheet_name=0,
-    header=1,
-    engine='openpyxl'
-)
-instrument_col = 'Instrument name'
-# identifica anos nas colunas
-year_cols = [c for c in price_raw.columns if isinstance(c, int)]
-
-df_price = (
-    price_raw
-    .melt(id_vars=[instrument_col], value_vars=year_cols,
-          var_name='ano', value_name='carbon_price_usd')
-    .query(f"`{instrument_col}` == 'EU ETS'")
-)
-df_price['ano'] = df_price['ano'].astype(int)
-df_price['carbon_price_usd'] = pd.to_numeric(
-    df_price['carbon_price_usd'], errors='coerce')
-df_price = df_price[['ano', 'carbon_price_usd']].dropna().drop_duplicates()
-
-# 8.2) Mescla preços ao dataset
-df_model = df_final.merge(df_price, on='ano', how='inner')
-
-# 8.3) Agrega único por município-ano
-df_model = (
-    df_model
-    .groupby(['municipio', 'ano'], as_index=False)
-    .agg({
-        'pib': 'first',
-        'GEE_tCO2e': 'sum',
-        'area_desmatada_ha': 'sum',
-        'carbon_price_usd': 'first'
-    })
-)
 
-# 8.4) Prepara features e target
-for feat in FEATURE_COLS:
-    df_model[feat] = pd.to_numeric(df_model[feat], errors='coerce').fillna(0)
-X = df_model[FEATURE_COLS]
-y = df_model['carbon_price_usd']
+def montar_base_modelo(df_final: pd.DataFrame, instrumento: str) -> pd.DataFrame:
+    """Linhas município-ano com as features e o preço do instrumento."""
+    # 8.1) Série de preços do instrumento (cache normalizado, sem reler o Excel)
+    df_price = serie_preco(instrumento)
 
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42
-)
-scaler = StandardScaler()
-X_train_s = scaler.fit_transform(X_train)
-X_test_s = scaler.transform(X_test)
-
-# 8.5) Define e treina modelos, coleta métricas
-models = {
-    'Linear Regression': LinearRegression(),
-    'Random Forest':     RandomForestRegressor(random_state=42),
-    'KNN':               KNeighborsRegressor(),
-    'Decision Tree':     DecisionTreeRegressor(random_state=42),
-    'MLP Regressor':     MLPRegressor(max_iter=1000, random_state=42),
-    'Lasso':             Lasso(alpha=0.01, random_state=42),
-    'SVR':               SVR(kernel='rbf'),
-    'Dummy':             DummyRegressor(),
-    'XGBoost':           XGBRegressor(random_state=42)
-}
-
-results = []
-for name, model in models.items():
-    model.fit(X_train_s, y_train)
-    preds = model.predict(X_test_s)
-    results.append({
-        'model': name,
-        'R2':    r2_score(y_test, preds),
-        'MSE':   mean_squared_error(y_test, preds)
-    })
-
-# 8.6) Salva métricas em CSV
-df_res = pd.DataFrame(results)
-df_res.to_csv(
-    OUTPUT_PATHS.model_results_csv,
-    index=False,
-    encoding='utf-8-sig'
-)
-print(f"✅ Métricas salvas em {OUTPUT_PATHS.model_results_csv}")
+    # 8.2) Mescla preços ao dataset
+    df_model = df_final.merge(df_price, on='ano', how='inner')
+
+    # 8.3) Agrega por código IBGE e ano (o nome vai junto com 'first', então
+    # municípios sem nome resolvido não somem do groupby); soma vazia = 0
+    df_model = (
+        df_model
+        .groupby(['codigo_ibge', 'ano'], as_index=False)
+        .agg({
+            'municipio': 'first',
+            'pib': 'first',
+            'GEE_tCO2e': 'sum',
+            'area_desmatada_ha': 'sum',
+            'carbon_price_usd': 'first'
+        })
+        [['codigo_ibge', 'municipio', 'ano', 'pib', 'GEE_tCO2e',
+          'area_desmatada_ha', 'carbon_price_usd']]
+    )
+
+    # 8.4) Prepara features e target
+    for feat in FEATURE_COLS:
+        df_model[feat] = pd.to_numeric(
+            df_model[feat], errors='coerce').fillna(0)
+    return df_model
+
+
+def modelar_instrumento(df_model: pd.DataFrame,
+                        instrumento: str,
+                        principal: bool,
+                        saidas) -> tuple[list[dict], list[dict]]:
+    """
+    Treina o zoo de modelos para o preço de um instrumento (mercado de
+    carbono) e persiste os artefatos. Só o instrumento principal passa a
+    ser a versão corrente lida pela etapa 05. Retorna as métricas e, com
+    --ajustar, as melhores configurações encontradas.
+    """
+    X = df_model[FEATURE_COLS]
+    y = df_model['carbon_price_usd']
+
+    X_train, X_test, y_train, y_test = train_test_split(X, y, **SPLIT_PARAMS)
+
+    scaler = StandardScaler()
+    X_train_s = scaler.fit_transform(X_train)
+    X_test_s = scaler.transform(X_test)
+
+    # 8.5) Com --ajustar, busca os hiperparâmetros só no treino (avaliações
+    # já feitas vêm do cache em disco)
+    melhores = []
+    if args.ajustar:
+        melhores = ajustar_modelos(X_train_s, y_train, n_jobs=args.n_jobs,
+                                   n_candidatos=args.candidatos)
+    hiperparametros = {r['model']: r['params'] for r in melhores}
+
+    # 8.6) Treina os modelos em paralelo (ou reaproveita a versão já gravada
+    # para os mesmos dados e parâmetros) e coleta métricas
+    params = {
+        'instrumento': instrumento,
+        'features': FEATURE_COLS,
+        'split': SPLIT_PARAMS,
+        'modelos': {nome: repr(m) for nome, m
+                    in criar_modelos(hiperparametros=hiperparametros).items()},
+    }
+    versao = versao_artefatos(X, y, params)
+    if versao_existe(versao, saidas.modelos_dir):
+        print(f"[INFO] Artefatos da versão {versao} ({instrumento}) já existem; "
+              "treino reaproveitado")
+        if principal:
+            marcar_atual(versao, saidas.modelos_dir)
+        return carregar_artefatos(versao, saidas.modelos_dir,
+                                  com_modelos=False)['resultados'], melhores
+
+    results, ajustados, predicoes = treinar_modelos(
+        X_train_s, y_train, X_test_s, y_test, n_jobs=args.n_jobs,
+        hiperparametros=hiperparametros
+    )
+
+    # 8.7) Persiste estimadores, scaler, split, predições e importâncias
+    df_pred = df_model.loc[X_test.index, ['municipio', 'ano']].copy()
+    df_pred['y_real'] = y_test.values
+    for nome, preds in predicoes.items():
+        df_pred[nome] = preds
+    df_imp = pd.DataFrame([
+        {'model': nome, 'variavel': feat, 'importancia': imp}
+        for nome, m in ajustados.items()
+        if hasattr(m, 'feature_importances_')
+        for feat, imp in zip(FEATURE_COLS, m.feature_importances_)
+    ])
+    destino = salvar_artefatos(
+        versao, params, scaler, ajustados, results,
+        X_train.index, X_test.index, df_pred, df_imp,
+        base_dir=saidas.modelos_dir, atual=principal
+    )
+    print(f"✅ Artefatos de modelagem ({instrumento}) salvos em {destino}")
+    return results, melhores
+
+
+def caminho_resultados(instrumento: str, principal: bool, saidas) -> str:
+    """O instrumento principal mantém o CSV padrão; os demais ganham sufixo."""
+    if principal:
+        return saidas.model_results_csv
+    raiz, ext = os.path.splitext(saidas.model_results_csv)
+    sufixo = re.sub(r'[^0-9a-zA-Z]+', '_', instrumento).strip('_').lower()
+    return f"{raiz}_{sufixo}{ext}"
+
+
+def caminho_melhores(destino_resultados: str) -> str:
+    """Melhores configurações do ajuste, ao lado do CSV de métricas."""
+    raiz, ext = os.path.splitext(destino_resultados)
+    return f"{raiz}_best_params{ext}"
+
+
+def caminho_validacao(destino_resultados: str, detalhe: bool = False) -> str:
+    """Resumo (ou métricas por dobra) da validação cruzada."""
+    raiz, ext = os.path.splitext(destino_resultados)
+    return f"{raiz}_cv{'_dobras' if detalhe else ''}{ext}"
+
+
+for regiao in regioes:
+    entradas, saidas = caminhos_regiao(regiao)
+    df_final = consolidar_regiao(regiao, entradas, saidas)
+    os.makedirs(os.path.dirname(saidas.model_results_csv), exist_ok=True)
+
+    for i, instrumento in enumerate(args.instrumentos):
+        df_model = montar_base_modelo(df_final, instrumento)
+        if i > 0 and len(df_model) < MIN_LINHAS_INSTRUMENTO:
+            print(f"[AVISO] {instrumento} ({regiao}): {len(df_model)} linhas "
+                  f"município-ano com preço (mínimo {MIN_LINHAS_INSTRUMENTO}); "
+                  "instrumento ignorado")
+            continue
+        results, melhores = modelar_instrumento(
+            df_model, instrumento, principal=(i == 0), saidas=saidas)
+
+        # 8.8) Salva métricas (e as melhores configurações) em CSV
+        df_res = pd.DataFrame(results)
+        destino = caminho_resultados(instrumento, (i == 0), saidas)
+        df_res.to_csv(
+            destino,
+            index=False,
+            encoding='utf-8-sig'
+        )
+        print(f"✅ Métricas ({regiao}, {instrumento}) salvas em {destino}")
+        if melhores:
+            df_melhores = pd.DataFrame(melhores).assign(
+                params=lambda d: d['params'].map(
+                    lambda p: json.dumps(p, sort_keys=True)))
+            destino_melhores = caminho_melhores(destino)
+            df_melhores.to_csv(destino_melhores, index=False,
+                               encoding='utf-8-sig')
+            print(f"✅ Melhores configurações ({regiao}, {instrumento}) "
+                  f"salvas em {destino_melhores}")
+
+        # 8.9) Validação cruzada por ano e/ou município (média e IC por modelo)
+        if args.validacao:
+            hiperparametros = {r['model']: r['params'] for r in melhores}
+            validacoes, esquemas = [], []
+            for esquema in args.validacao:
+                try:
+                    validacoes.append(validar(
+                        df_model, FEATURE_COLS, 'carbon_price_usd', esquema,
+                        hiperparametros, n_jobs=args.n_jobs,
+                        repeticoes=args.repeticoes))
+                    esquemas.append(esquema)
+                except ValueError as e:  # sem dobras (poucos anos/municípios)
+                    print(f"[AVISO] Validação '{esquema}' ({regiao}, "
+                          f"{instrumento}) ignorada: {e}")
+            if not validacoes:
+                continue
+            destino_cv = caminho_validacao(destino)
+            pd.concat([r for _, r in validacoes]).to_csv(
+                destino_cv, index=False, encoding='utf-8-sig')
+            pd.concat([d for d, _ in validacoes]).to_csv(
+                caminho_validacao(destino, detalhe=True),
+                index=False, encoding='utf-8-sig')
+            print(f"✅ Validação cruzada ({regiao}, {instrumento}: "
+                  f"{', '.join(esquemas)}) salva em {destino_cv}")
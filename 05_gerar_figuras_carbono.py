@@ -15,226 +15,388 @@ Figura05_Correlacoes.png
 Figura07_x.png  (x = 1..9)
     - Scatters Real vs Previsto para cada modelo: 1=LinearRegression, 2=RandomForest, 3=KNN, 4=DecisionTree,
       5=MLP, 6=Lasso, 7=SVR, 8=Dummy, 9=XGBoost (antes em etapa 07)
+      Usa as predições de teste gravadas pela etapa 04 (results/models).
 Figura08_Importancia_Variaveis.png
     - Importância relativa das variáveis (Random Forest) (antes em etapa 08)
+      Lida dos artefatos da etapa 04; nenhum modelo é treinado aqui.
 Figura09_Evolucao_Preco_Carbono.png
     - Evolução temporal do preço do carbono (EU ETS) (antes em etapa 08)
+
+Cada figura é uma função independente registrada em FIGURAS, desenhada com a
+API orientada a objetos (matplotlib.figure.Figure, backend Agg) em um pool de
+processos. Uma figura só é redesenhada se mudou o hash dos seus dados, das
+impressões digitais dos arquivos de que eles vêm, do código da função e dos
+auxiliares que ela chama (ou das versões de matplotlib/seaborn).
+
+Com várias regiões (--regioes), as figuras de todas entram no mesmo pool;
+cada região grava no seu diretório de figuras (ver regioes.caminhos_regiao).
+
+Uso:
+    python 05_gerar_figuras_carbono.py                      # figuras desatualizadas
+    python 05_gerar_figuras_carbono.py --only "Figura07_*"  # apenas os scatters
+    python 05_gerar_figuras_carbono.py --force              # redesenha todas
+    python 05_gerar_figuras_carbono.py --regioes "Serra do Penitente" uf:MA
 """
 import os
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LinearRegression, Lasso
-from sklearn.neighbors import KNeighborsRegressor
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.tree import DecisionTreeRegressor
-from sklearn.neural_network import MLPRegressor
-from sklearn.svm import SVR
-from sklearn.dummy import DummyRegressor
-from xgboost import XGBRegressor
-from variaveis import INPUT_PATHS, OUTPUT_PATHS, FEATURE_COLS, CARBONO_CONSOLIDADO
+import json
+import fnmatch
+import hashlib
+import inspect
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure  # noqa: E402
+
+import pandas as pd  # noqa: E402
+import seaborn as sns  # noqa: E402
+
+import armazenamento  # noqa: E402
+from artefatos_modelos import carregar_artefatos  # noqa: E402
+from cache_arquivos import ler_meta, salvar_meta, sha256_arquivo  # noqa: E402
+from precos_carbono import INSTRUMENTO_PADRAO, serie_preco  # noqa: E402
+from regioes import SELETOR_AJUDA, caminhos_regiao  # noqa: E402
+from variaveis import (  # noqa: E402
+    INPUT_PATHS, FEATURE_COLS, CACHE_PATHS, REGIOES_SELECIONADAS)
 
 sns.set(style='whitegrid')
-fig_dir = os.path.dirname(OUTPUT_PATHS.evolucao_pib_png)
-os.makedirs(fig_dir, exist_ok=True)
-
-# contador de figuras
-fig_num = 1
-
-# 1) Carregar dados consolidados e verificar
-print("[INFO] Carregando dados consolidados de:", CARBONO_CONSOLIDADO)
-df = pd.read_csv(CARBONO_CONSOLIDADO, encoding='utf-8-sig')
-print(
-    f"[INFO] DataFrame carregado: {df.shape[0]} linhas, {df.shape[1]} colunas")
-
-# 2) Ler e mesclar preços de carbono (EU ETS)
-print("[INFO] Carregando série de preços de carbono de:",
-      INPUT_PATHS.carbon_prices_raw)
-price_raw = pd.read_excel(
-    INPUT_PATHS.carbon_prices_raw,
-    sheet_name=0,
-    header=1
-)
-print(
-    f"[INFO] Série de preços carregada: {price_raw.shape[0]} linhas, {price_raw.shape[1]} colunas")
-year_cols = [c for c in price_raw.columns if isinstance(c, int)]
-price_df = price_raw.melt(
-    id_vars=['Instrument name'],
-    value_vars=year_cols,
-    var_name='ano',
-    value_name='carbon_price_usd'
-)
-price_df = price_df[price_df['Instrument name'] == 'EU ETS']
-price_df['ano'] = price_df['ano'].astype(int)
-price_df['carbon_price_usd'] = pd.to_numeric(
-    price_df['carbon_price_usd'], errors='coerce')
-price_df = price_df[['ano', 'carbon_price_usd']].dropna().drop_duplicates()
-print(f"[INFO] Preços filtrados EU ETS: {price_df.shape[0]} anos")
-
-# 3) Mesclar preços
-df = df.merge(price_df, on='ano', how='left')
-print(
-    f"[INFO] Após merge de preços: {df.shape[0]} linhas, {df.shape[1]} colunas")
-
-# 4) Agregar por município e ano
-print("[INFO] Agregando dados por município e ano...")
-df_agg = df.groupby(['municipio', 'ano'], as_index=False).agg({
-    'pib': 'first',
-    'GEE_tCO2e': 'sum',
-    'area_desmatada_ha': 'sum',
-    'carbon_price_usd': 'first'
-})
-print(f"[INFO] DataFrame agregado: {df_agg.shape[0]} registros únicos")
-
-# --- Figura 01: Evolução do PIB Municipal ---
-print("[INFO] Gerando Figura 01")
-path = os.path.join(fig_dir, f'Figura{fig_num:02d}_Evolucao_PIB.png')
-plt.figure(figsize=(8, 5))
-sns.lineplot(data=df_agg, x='ano', y='pib', hue='municipio', marker='o')
-plt.xlabel('Ano')
-plt.ylabel('PIB (R$)')
-plt.title('Figura 01. Evolução do PIB Municipal')
-plt.tight_layout()
-plt.savefig(path)
-plt.close()
-print(f"[OK] Figura {fig_num:02d} salva em {path}")
-fig_num += 1
-
-# --- Figura 02: Evolução das Emissões de GEE Municipais ---
-print("[INFO] Gerando Figura 02")
-path = os.path.join(fig_dir, f'Figura{fig_num:02d}_Evolucao_GEE.png')
-plt.figure(figsize=(8, 5))
-sns.lineplot(data=df_agg, x='ano', y='GEE_tCO2e', hue='municipio', marker='o')
-plt.xlabel('Ano')
-plt.ylabel('Emissões de GEE (tCO2e)')
-plt.title('Figura 02. Evolução das Emissões de GEE Municipais')
-plt.tight_layout()
-plt.savefig(path)
-plt.close()
-print(f"[OK] Figura {fig_num:02d} salva em {path}")
-fig_num += 1
-
-# --- Figura 03: Evolução do Desmatamento Municipal ---
-print("[INFO] Gerando Figura 03")
-path = os.path.join(fig_dir, f'Figura{fig_num:02d}_Evolucao_Desmatamento.png')
-plt.figure(figsize=(8, 5))
-sns.lineplot(data=df_agg, x='ano', y='area_desmatada_ha',
-             hue='municipio', marker='o')
-plt.xlabel('Ano')
-plt.ylabel('Área Desmatada (ha)')
-plt.title('Figura 03. Evolução do Desmatamento Municipal')
-plt.tight_layout()
-plt.savefig(path)
-plt.close()
-print(f"[OK] Figura {fig_num:02d} salva em {path}")
-fig_num += 1
-
-# --- Figura 04: Comparação de EQM (MSE) dos Modelos ---
-print("[INFO] Carregando métricas de modelos")
-df_res = pd.read_csv(OUTPUT_PATHS.model_results_csv)
-print(f"[INFO] Métricas carregadas: {df_res.shape[0]} modelos")
-print("[INFO] Gerando Figura 04")
-path = os.path.join(fig_dir, f'Figura{fig_num:02d}_EQM_Modelos.png')
-plt.figure(figsize=(8, 5))
-sns.barplot(data=df_res, x='model', y='MSE')
-plt.xticks(rotation=45, ha='right')
-plt.ylabel('EQM (MSE)')
-plt.xlabel('Modelos')
-plt.title('Figura 04. Comparação de Erro Quadrático Médio (MSE)')
-plt.tight_layout()
-plt.savefig(path)
-plt.close()
-print(f"[OK] Figura {fig_num:02d} salva em {path}")
-fig_num += 1
-
-# --- Figura 05: Correlação entre Variáveis ---
-print("[INFO] Gerando Figura 05")
-corr_cols = FEATURE_COLS + ['carbon_price_usd']
-corr = df_agg[corr_cols].corr()
-path = os.path.join(fig_dir, f'Figura{fig_num:02d}_Correlacoes.png')
-plt.figure(figsize=(6, 6))
-sns.heatmap(corr, annot=True, fmt='.2f', cmap='coolwarm',
-            xticklabels=corr_cols, yticklabels=corr_cols)
-plt.xticks(rotation=45)
-plt.title('Figura 05. Correlação entre Variáveis')
-plt.tight_layout()
-plt.savefig(path)
-plt.close()
-print(f"[OK] Figura {fig_num:02d} salva em {path}")
-fig_num += 1
-
-# --- Preparar dados para scatter ------------------------------------------------
-print("[INFO] Preparando dados para scatters")
-model_df = df_agg.dropna(subset=FEATURE_COLS + ['carbon_price_usd'])
-print(f"[INFO] Amostras válidas para modelagem: {model_df.shape}")
-X = model_df[FEATURE_COLS]
-y = model_df['carbon_price_usd']
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42)
-scaler = StandardScaler()
-X_train_s = scaler.fit_transform(X_train)
-X_test_s = scaler.transform(X_test)
-
-# --- Figura 07_x: Scatter Real vs Previsto para cada modelo ---
-print("[INFO] Gerando scatters para cada modelo")
-models = {
-    'LinearRegression': LinearRegression(),
-    'RandomForest': RandomForestRegressor(random_state=42),
-    'KNN': KNeighborsRegressor(),
-    'DecisionTree': DecisionTreeRegressor(random_state=42),
-    'MLP': MLPRegressor(max_iter=1000, random_state=42),
-    'Lasso': Lasso(alpha=0.01, random_state=42),
-    'SVR': SVR(kernel='rbf'),
-    'Dummy': DummyRegressor(),
-    'XGBoost': XGBRegressor(random_state=42)
+
+# nome do modelo na etapa 04 → nome usado no arquivo da figura
+NOMES_FIGURA = {
+    'Linear Regression': 'LinearRegression',
+    'Random Forest': 'RandomForest',
+    'KNN': 'KNN',
+    'Decision Tree': 'DecisionTree',
+    'MLP Regressor': 'MLP',
+    'Lasso': 'Lasso',
+    'SVR': 'SVR',
+    'Dummy': 'Dummy',
+    'XGBoost': 'XGBoost'
 }
-for idx, (name, model) in enumerate(models.items(), start=1):
-    print(f"[INFO] Treinando modelo {name} (scatter {idx})")
-    model.fit(X_train_s, y_train)
-    y_pred = model.predict(X_test_s)
-    filename = f"Figura07_{idx}_{name}.png"
-    path = os.path.join(fig_dir, filename)
-    plt.figure(figsize=(6, 6))
-    sns.scatterplot(x=y_test, y=y_pred)
-    plt.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], 'r--')
-    plt.xlabel('Real')
-    plt.ylabel('Previsto')
-    plt.title(f'Figura 07_{idx}. Real vs Previsto – {name}')
-    plt.tight_layout()
-    plt.savefig(path)
-    plt.close()
-    print(f"[OK] Figura07_{idx} salva em {path}")
-
-# --- Figura 08: Importância de variáveis – Random Forest ---
-print("[INFO] Gerando Figura 08")
-model_rf = RandomForestRegressor(random_state=42)
-model_rf.fit(X_train_s, y_train)
-importances = model_rf.feature_importances_
-path = os.path.join(fig_dir, 'Figura08_Importancia_Variaveis.png')
-plt.figure(figsize=(6, 5))
-sns.barplot(x=FEATURE_COLS, y=importances)
-plt.xticks(rotation=45)
-plt.ylabel('Importância Relativa')
-plt.xlabel('Variáveis')
-plt.title('Figura 08. Importância de Variáveis – Random Forest')
-plt.tight_layout()
-plt.savefig(path)
-plt.close()
-print(f"[OK] Figura08 salva em {path}")
-
-# --- Figura 09: Evolução temporal do preço de carbono ---
-print("[INFO] Gerando Figura 09")
-path = os.path.join(fig_dir, 'Figura09_Evolucao_Preco_Carbono.png')
-plt.figure(figsize=(8, 5))
-sns.lineplot(data=price_df, x='ano', y='carbon_price_usd', marker='o')
-plt.xlabel('Ano')
-plt.ylabel('Preço do Carbono (USD)')
-plt.title('Figura 09. Evolução Temporal do Preço de Carbono – EU ETS')
-plt.tight_layout()
-plt.savefig(path)
-plt.close()
-print(f"[OK] Figura09 salva em {path}")
-
-print('✅ Todas as figuras numeradas geradas com sucesso!')
+
+# Acima deste número de municípios, as figuras de evolução mostram o total
+# da região (uma linha por município deixaria a legenda ilegível)
+MAX_SERIES_MUNICIPIO = 12
+
+
+def _rotacionar(ax, angulo: int = 45, ha: str | None = None):
+    for lbl in ax.get_xticklabels():
+        lbl.set_rotation(angulo)
+        if ha:
+            lbl.set_ha(ha)
+
+
+def _salvar(fig: Figure, path: str):
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+# -----------------------------------------------------------------------
+# 1) Funções de figura (uma por arquivo; recebem só os dados que usam)
+
+def figura_evolucao(path: str, df_agg: pd.DataFrame, coluna: str,
+                    ylabel: str, titulo: str):
+    """Figuras 01–03: série anual por município."""
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    sns.lineplot(data=df_agg, x='ano', y=coluna, hue='municipio',
+                 marker='o', ax=ax)
+    ax.set_xlabel('Ano')
+    ax.set_ylabel(ylabel)
+    ax.set_title(titulo)
+    _salvar(fig, path)
+
+
+def figura_eqm(path: str, df_res: pd.DataFrame):
+    """Figura 04: comparação de EQM (MSE) dos modelos."""
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    sns.barplot(data=df_res, x='model', y='MSE', ax=ax)
+    _rotacionar(ax, 45, 'right')
+    ax.set_ylabel('EQM (MSE)')
+    ax.set_xlabel('Modelos')
+    ax.set_title('Figura 04. Comparação de Erro Quadrático Médio (MSE)')
+    _salvar(fig, path)
+
+
+def figura_correlacoes(path: str, df_agg: pd.DataFrame):
+    """Figura 05: correlação entre variáveis."""
+    corr_cols = FEATURE_COLS + ['carbon_price_usd']
+    corr = df_agg[corr_cols].corr()
+    fig = Figure(figsize=(6, 6))
+    ax = fig.subplots()
+    sns.heatmap(corr, annot=True, fmt='.2f', cmap='coolwarm',
+                xticklabels=corr_cols, yticklabels=corr_cols, ax=ax)
+    _rotacionar(ax, 45)
+    ax.set_title('Figura 05. Correlação entre Variáveis')
+    _salvar(fig, path)
+
+
+def figura_scatter(path: str, idx: int, name: str,
+                   y_test: pd.Series, y_pred: pd.Series):
+    """Figura 07_x: Real vs Previsto de um modelo."""
+    fig = Figure(figsize=(6, 6))
+    ax = fig.subplots()
+    sns.scatterplot(x=y_test, y=y_pred, ax=ax)
+    ax.plot([y_test.min(), y_test.max()], [y_test.min(), y_test.max()], 'r--')
+    ax.set_xlabel('Real')
+    ax.set_ylabel('Previsto')
+    ax.set_title(f'Figura 07_{idx}. Real vs Previsto – {name}')
+    _salvar(fig, path)
+
+
+def figura_importancia(path: str, importances: list[float]):
+    """Figura 08: importância de variáveis – Random Forest."""
+    fig = Figure(figsize=(6, 5))
+    ax = fig.subplots()
+    sns.barplot(x=FEATURE_COLS, y=importances, ax=ax)
+    _rotacionar(ax, 45)
+    ax.set_ylabel('Importância Relativa')
+    ax.set_xlabel('Variáveis')
+    ax.set_title('Figura 08. Importância de Variáveis – Random Forest')
+    _salvar(fig, path)
+
+
+def figura_preco(path: str, price_df: pd.DataFrame):
+    """Figura 09: evolução temporal do preço de carbono."""
+    fig = Figure(figsize=(8, 5))
+    ax = fig.subplots()
+    sns.lineplot(data=price_df, x='ano', y='carbon_price_usd', marker='o', ax=ax)
+    ax.set_xlabel('Ano')
+    ax.set_ylabel('Preço do Carbono (USD)')
+    ax.set_title('Figura 09. Evolução Temporal do Preço de Carbono – EU ETS')
+    _salvar(fig, path)
+
+
+# -----------------------------------------------------------------------
+# 2) Dados e registro de figuras
+
+def carregar_dados(saidas) -> dict:
+    """Carrega consolidado, preços, métricas e artefatos da etapa 04."""
+    print("[INFO] Carregando dados consolidados de:",
+          armazenamento.caminho(saidas.carbono_consolidado_csv))
+    df = armazenamento.ler(saidas.carbono_consolidado_csv, 'carbono_consolidado')
+    print(
+        f"[INFO] DataFrame carregado: {df.shape[0]} linhas, {df.shape[1]} colunas")
+
+    print("[INFO] Carregando série de preços de carbono de:",
+          INPUT_PATHS.carbon_prices_raw)
+    price_df = serie_preco(INSTRUMENTO_PADRAO)
+    print(f"[INFO] Preços filtrados {INSTRUMENTO_PADRAO}: {price_df.shape[0]} anos")
+
+    df = df.merge(price_df, on='ano', how='left')
+    # por código IBGE: homônimos de UFs diferentes são municípios distintos
+    df_agg = df.groupby(['codigo_ibge', 'ano'], as_index=False).agg({
+        'municipio': 'first',
+        'pib': 'first',
+        'GEE_tCO2e': 'sum',
+        'area_desmatada_ha': 'sum',
+        'carbon_price_usd': 'first'
+    })
+    # rótulo das séries: nomes repetidos (ou ausentes) levam o código
+    nomes = df_agg.groupby('codigo_ibge')['municipio'].first().astype('string')
+    ambiguos = nomes.duplicated(keep=False) | nomes.isna()
+    if ambiguos.any():
+        nomes[ambiguos] = (nomes[ambiguos].fillna('?') + ' ('
+                           + nomes.index[ambiguos].astype(str) + ')')
+        df_agg['municipio'] = df_agg['codigo_ibge'].map(nomes)
+    print(f"[INFO] DataFrame agregado: {df_agg.shape[0]} registros únicos")
+
+    df_res = pd.read_csv(saidas.model_results_csv)
+    print(f"[INFO] Métricas carregadas: {df_res.shape[0]} modelos")
+
+    artefatos = carregar_artefatos(base_dir=saidas.modelos_dir, com_modelos=False)
+    print(f"[INFO] Artefatos de modelagem: versão {artefatos['versao']}")
+
+    # impressões digitais (conteúdo) dos arquivos de entrada, por fonte
+    entradas = {
+        'consolidado': sha256_arquivo(
+            armazenamento.caminho(saidas.carbono_consolidado_csv)),
+        'precos': sha256_arquivo(INPUT_PATHS.carbon_prices_raw),
+        'metricas': sha256_arquivo(saidas.model_results_csv),
+        'artefatos': artefatos['versao'],
+    }
+    return {'df_agg': df_agg, 'price_df': price_df, 'df_res': df_res,
+            'artefatos': artefatos, 'entradas': entradas}
+
+
+def registrar_figuras(dados: dict) -> dict[str, tuple]:
+    """
+    Registro nome → (função, kwargs, entradas). Cada entrada carrega apenas
+    os dados de que a figura precisa e as impressões digitais dos arquivos
+    de onde eles vêm, o que também define o seu hash.
+    """
+    df_agg = dados['df_agg']
+    n_municipios = df_agg['codigo_ibge'].nunique()
+    if n_municipios > MAX_SERIES_MUNICIPIO:
+        df_evol = df_agg.groupby('ano', as_index=False)[
+            ['pib', 'GEE_tCO2e', 'area_desmatada_ha']].sum()
+        df_evol.insert(0, 'municipio', f'Total ({n_municipios} municípios)')
+    else:
+        df_evol = df_agg
+    # arquivos de que vêm os dados de cada figura: as evoluções só usam o
+    # consolidado; a correlação também usa o preço
+    entradas = dados['entradas']
+    consolidado = {'consolidado': entradas['consolidado']}
+    com_precos = {k: entradas[k] for k in ('consolidado', 'precos')}
+    figuras = {
+        'Figura01_Evolucao_PIB': (figura_evolucao, {
+            'df_agg': df_evol[['municipio', 'ano', 'pib']], 'coluna': 'pib',
+            'ylabel': 'PIB (R$)',
+            'titulo': 'Figura 01. Evolução do PIB Municipal'}, consolidado),
+        'Figura02_Evolucao_GEE': (figura_evolucao, {
+            'df_agg': df_evol[['municipio', 'ano', 'GEE_tCO2e']],
+            'coluna': 'GEE_tCO2e', 'ylabel': 'Emissões de GEE (tCO2e)',
+            'titulo': 'Figura 02. Evolução das Emissões de GEE Municipais'},
+            consolidado),
+        'Figura03_Evolucao_Desmatamento': (figura_evolucao, {
+            'df_agg': df_evol[['municipio', 'ano', 'area_desmatada_ha']],
+            'coluna': 'area_desmatada_ha', 'ylabel': 'Área Desmatada (ha)',
+            'titulo': 'Figura 03. Evolução do Desmatamento Municipal'},
+            consolidado),
+        'Figura04_EQM_Modelos': (figura_eqm, {'df_res': dados['df_res']},
+                                 {'metricas': entradas['metricas']}),
+        'Figura05_Correlacoes': (figura_correlacoes, {
+            'df_agg': df_agg[FEATURE_COLS + ['carbon_price_usd']]}, com_precos),
+    }
+
+    artefatos = dados['artefatos']
+    df_pred = artefatos['predicoes']
+    for idx, res in enumerate(artefatos['resultados'], start=1):
+        name = NOMES_FIGURA.get(res['model'], res['model'])
+        figuras[f"Figura07_{idx}_{name}"] = (figura_scatter, {
+            'idx': idx, 'name': name,
+            'y_test': df_pred['y_real'], 'y_pred': df_pred[res['model']]},
+            {'artefatos': entradas['artefatos']})
+
+    df_imp = artefatos['importancias']
+    df_imp = df_imp[df_imp['model'] == 'Random Forest'].set_index('variavel')
+    figuras['Figura08_Importancia_Variaveis'] = (figura_importancia, {
+        'importances': df_imp.loc[FEATURE_COLS, 'importancia'].tolist()},
+        {'artefatos': entradas['artefatos']})
+    figuras['Figura09_Evolucao_Preco_Carbono'] = (figura_preco, {
+        'price_df': dados['price_df']}, {'precos': entradas['precos']})
+    return figuras
+
+
+def _nomes_globais(codigo) -> set[str]:
+    """Nomes globais usados por um code object (inclui os aninhados)."""
+    nomes = set(codigo.co_names)
+    for const in codigo.co_consts:
+        if inspect.iscode(const):
+            nomes |= _nomes_globais(const)
+    return nomes
+
+
+def codigo_figura(funcao) -> str:
+    """
+    Código da função de figura e de tudo o que ela usa deste módulo:
+    auxiliares (recursivamente) e constantes simples (ex.: FEATURE_COLS).
+    """
+    partes, vistos, pilha = [], set(), [funcao]
+    while pilha:
+        f = pilha.pop()
+        if f.__name__ in vistos:
+            continue
+        vistos.add(f.__name__)
+        partes.append(inspect.getsource(f))
+        for nome in sorted(_nomes_globais(f.__code__)):
+            valor = globals().get(nome)
+            if inspect.isfunction(valor) and valor.__module__ == __name__:
+                pilha.append(valor)
+            elif isinstance(valor, (str, int, float, list, tuple, dict)):
+                partes.append(f"{nome} = {valor!r}")
+    return "\n".join(sorted(set(partes)))
+
+
+def hash_figura(funcao, kwargs: dict, entradas: dict) -> str:
+    """
+    Hash dos dados de entrada, das impressões digitais dos arquivos de que
+    vêm, do código da figura (com auxiliares) e das bibliotecas de desenho.
+    """
+    h = hashlib.sha256(codigo_figura(funcao).encode())
+    h.update(f"{matplotlib.__version__}/{sns.__version__}".encode())
+    h.update(json.dumps(entradas, sort_keys=True).encode())
+    for chave in sorted(kwargs):
+        valor = kwargs[chave]
+        h.update(chave.encode())
+        if isinstance(valor, (pd.DataFrame, pd.Series)):
+            h.update(pd.util.hash_pandas_object(valor, index=True).values.tobytes())
+            nomes = valor.columns if isinstance(valor, pd.DataFrame) else [valor.name]
+            h.update(repr(list(nomes)).encode())
+        else:
+            h.update(json.dumps(valor, default=str).encode())
+    return h.hexdigest()
+
+
+def _renderizar(path: str, funcao, kwargs: dict) -> str:
+    funcao(path, **kwargs)
+    return path
+
+
+# -----------------------------------------------------------------------
+# 3) Main
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Gera as figuras do artigo em paralelo (backend Agg)."
+    )
+    parser.add_argument(
+        "--only", nargs="+", default=["*"],
+        help="Padrões (glob) de nomes de figura, ex.: 'Figura07_*'"
+    )
+    parser.add_argument(
+        "--force", action="store_true",
+        help="Redesenha mesmo se os dados não mudaram"
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=os.cpu_count() or 1,
+        help="Processos de renderização. Padrão: %(default)s"
+    )
+    parser.add_argument(
+        "--regioes", "--regiao", nargs="+", default=REGIOES_SELECIONADAS,
+        help=f"Uma ou mais regiões: {SELETOR_AJUDA}. Padrão: %(default)s"
+    )
+    args = parser.parse_args()
+
+    # Figuras de todas as regiões, indexadas pelo caminho do PNG
+    selecionadas = {}
+    for regiao in dict.fromkeys(args.regioes):
+        saidas = caminhos_regiao(regiao)[1]
+        fig_dir = os.path.dirname(saidas.evolucao_pib_png)
+        os.makedirs(fig_dir, exist_ok=True)
+        for nome, spec in registrar_figuras(carregar_dados(saidas)).items():
+            if any(fnmatch.fnmatch(nome, p) for p in args.only):
+                selecionadas[os.path.join(fig_dir, f"{nome}.png")] = spec
+
+    estado = ler_meta(CACHE_PATHS.figuras_estado) or {}
+    pendentes = {}
+    for png, (funcao, kwargs, entradas) in selecionadas.items():
+        h = hash_figura(funcao, kwargs, entradas)
+        if not args.force and estado.get(png) == h and os.path.exists(png):
+            print(f"[SKIP] {png} (dados inalterados)")
+            continue
+        pendentes[png] = (funcao, kwargs, h)
+
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futuros = {
+                pool.submit(_renderizar, png, funcao, kwargs): png
+                for png, (funcao, kwargs, _) in pendentes.items()
+            }
+            for fut in as_completed(futuros):
+                png = futuros[fut]
+                fut.result()
+                estado[png] = pendentes[png][2]
+                print(f"[OK] {os.path.basename(png)} salva em {png}")
+    finally:
+        # Mesmo em caso de falha, as figuras concluídas não são refeitas
+        salvar_meta(CACHE_PATHS.figuras_estado, estado)
+
+    print(f'✅ Figuras geradas: {len(pendentes)} '
+          f'(inalteradas: {len(selecionadas) - len(pendentes)})')
+
+
+if __name__ == "__main__":
+    main()
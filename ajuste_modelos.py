@@ -0,0 +1,187 @@
+# ajuste_modelos.py
+# Busca de hiperparâmetros dos regressores da etapa 04 por successive halving
+#
+# Para cada modelo do catálogo (modelos.py), sorteia candidatos do espaço em
+# ESPACOS e os avalia em validação cruzada sobre o conjunto de treino: a
+# primeira rodada usa poucas amostras por dobra e cada rodada seguinte mantém
+# o melhor 1/FATOR dos candidatos com FATOR vezes mais amostras, até a última
+# usar o treino inteiro (o esquema do HalvingRandomSearchCV).
+#
+# Cada avaliação (dados da dobra, modelo, parâmetros) é memorizada em disco
+# (joblib.Memory em data/cache/ajuste/): reexecuções e espaços ampliados só
+# ajustam os pontos ainda não avaliados. As avaliações pendentes de cada
+# rodada rodam em paralelo (joblib/loky).
+
+import math
+import warnings
+
+import numpy as np
+from joblib import Memory, Parallel, delayed
+from sklearn.metrics import r2_score, mean_squared_error
+from sklearn.model_selection import KFold, ParameterSampler
+
+from modelos import criar_modelos, dividir_nucleos
+from variaveis import CACHE_PATHS, N_JOBS
+
+# Espaço de busca por modelo (listas: amostragem sem reposição da grade)
+ESPACOS = {
+    'Linear Regression': {'fit_intercept': [True, False]},
+    'Random Forest': {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [None, 3, 5, 10],
+        'min_samples_leaf': [1, 2, 4],
+        'max_features': [1.0, 'sqrt'],
+    },
+    'KNN': {
+        'n_neighbors': [2, 3, 5, 7, 10],
+        'weights': ['uniform', 'distance'],
+        'p': [1, 2],
+    },
+    'Decision Tree': {
+        'max_depth': [None, 2, 3, 5, 10],
+        'min_samples_leaf': [1, 2, 4, 8],
+    },
+    'MLP Regressor': {
+        'hidden_layer_sizes': [(50,), (100,), (50, 50)],
+        'alpha': [1e-4, 1e-3, 1e-2, 1e-1],
+        'learning_rate_init': [1e-3, 1e-2],
+    },
+    'Lasso': {'alpha': [1e-4, 1e-3, 1e-2, 1e-1, 1.0, 10.0]},
+    'SVR': {
+        'C': [0.1, 1.0, 10.0, 100.0],
+        'gamma': ['scale', 0.01, 0.1, 1.0],
+        'epsilon': [0.01, 0.1, 1.0],
+    },
+    'Dummy': {'strategy': ['mean', 'median']},
+    'XGBoost': {
+        'n_estimators': [100, 300, 600],
+        'max_depth': [2, 3, 4, 6],
+        'learning_rate': [0.01, 0.05, 0.1, 0.3],
+        'subsample': [0.7, 1.0],
+    },
+}
+
+N_CANDIDATOS = 16   # candidatos sorteados por modelo
+FATOR = 3           # razão de eliminação entre rodadas
+MIN_AMOSTRAS = 10   # amostras de treino por dobra na primeira rodada
+N_DOBRAS = 5
+
+_memoria = Memory(CACHE_PATHS.ajuste_dir, verbose=0)
+
+
+@_memoria.cache
+def avaliar(nome: str, params: dict, X_tr, y_tr, X_te, y_te) -> dict:
+    """
+    Ajusta o modelo `nome` com `params` em uma dobra e devolve R² e MSE na
+    parte de validação (NaN se o ajuste falhar, como error_score=np.nan).
+    """
+    modelo = criar_modelos(hiperparametros={nome: params})[nome]
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            modelo.fit(X_tr, y_tr)
+            preds = modelo.predict(X_te)
+    except ValueError:
+        return {'R2': np.nan, 'MSE': np.nan}
+    return {'R2': r2_score(y_te, preds), 'MSE': mean_squared_error(y_te, preds)}
+
+
+def candidatos(nome: str, n: int = N_CANDIDATOS,
+               random_state: int = 42) -> list[dict]:
+    """Candidatos do modelo (a grade inteira, se for menor que `n`)."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # grade menor que n
+        return list(ParameterSampler(ESPACOS[nome], n, random_state=random_state))
+
+
+def _log_inteiro(x: float, base: int) -> int:
+    """Maior k com base**k <= x (sem erro de arredondamento do math.log)."""
+    k = 0
+    while base ** (k + 1) <= x:
+        k += 1
+    return k
+
+
+def _rodadas(n_candidatos: int, n_treino: int,
+             fator: int, min_amostras: int) -> list[tuple[int, int]]:
+    """
+    (candidatos mantidos, amostras por dobra) em cada rodada: tantas rodadas
+    quanto os candidatos pedem e as amostras permitem, a última com o
+    treino inteiro.
+    """
+    n_rodadas = 1 + min(_log_inteiro(n_candidatos, fator),
+                        _log_inteiro(n_treino / min_amostras, fator))
+    return [
+        (math.ceil(n_candidatos / fator ** i),
+         n_treino // fator ** (n_rodadas - 1 - i))
+        for i in range(n_rodadas)
+    ]
+
+
+def ajustar_modelo(nome: str, X, y,
+                   n_candidatos: int = N_CANDIDATOS,
+                   fator: int = FATOR,
+                   min_amostras: int = MIN_AMOSTRAS,
+                   n_dobras: int = N_DOBRAS,
+                   n_jobs: int = N_JOBS,
+                   random_state: int = 42) -> dict:
+    """
+    Successive halving para um modelo. Retorna os melhores parâmetros, o
+    R² médio deles na última rodada e quantas avaliações vieram do cache.
+    """
+    X, y = np.asarray(X, dtype=float), np.asarray(y, dtype=float)
+    dobras = list(KFold(n_dobras, shuffle=True,
+                        random_state=random_state).split(X))
+    # Ordem fixa dentro de cada dobra: a rodada com r amostras usa as r
+    # primeiras, então rodadas e execuções repetem exatamente os mesmos dados
+    rng = np.random.RandomState(random_state)
+    dobras = [(rng.permutation(tr), te) for tr, te in dobras]
+
+    vivos = candidatos(nome, n_candidatos, random_state)
+    n_sorteados = len(vivos)
+    plano = _rodadas(len(vivos), min(len(tr) for tr, _ in dobras),
+                     fator, min_amostras)
+    processos, _ = dividir_nucleos(n_jobs, len(vivos) * n_dobras)
+    avaliados = do_cache = 0
+
+    for manter, amostras in plano:
+        vivos = vivos[:manter]
+        tarefas = [
+            (nome, p, X[tr[:amostras]], y[tr[:amostras]], X[te], y[te])
+            for p in vivos for tr, te in dobras
+        ]
+        do_cache += sum(avaliar.check_call_in_cache(*t) for t in tarefas)
+        avaliados += len(tarefas)
+        saidas = Parallel(n_jobs=processos)(delayed(avaliar)(*t) for t in tarefas)
+        r2 = np.array([s['R2'] for s in saidas]).reshape(len(vivos), n_dobras)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            media = np.nanmean(r2, axis=1)
+        media = np.where(np.isnan(media), -np.inf, media)
+        ordem = np.argsort(-media, kind="stable")
+        vivos = [vivos[i] for i in ordem]
+        melhor_r2 = float(media[ordem[0]])
+
+    return {
+        'model': nome,
+        'params': vivos[0],
+        'cv_R2': melhor_r2,
+        'candidatos': n_sorteados,
+        'rodadas': len(plano),
+        'avaliacoes': avaliados,
+        'do_cache': do_cache,
+    }
+
+
+def ajustar_modelos(X, y, n_jobs: int = N_JOBS, **kwargs) -> list[dict]:
+    """Ajusta todos os modelos de ESPACOS, na ordem do catálogo."""
+    melhores = []
+    for nome in criar_modelos():
+        if nome not in ESPACOS:
+            continue
+        r = ajustar_modelo(nome, X, y, n_jobs=n_jobs, **kwargs)
+        print(f"[INFO] Ajuste ({nome}): {r['candidatos']} candidatos, "
+              f"{r['rodadas']} rodada(s), {r['avaliacoes']} avaliações "
+              f"({r['do_cache']} do cache), R² de validação {r['cv_R2']:.3f}")
+        melhores.append(r)
+    return melhores
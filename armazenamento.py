@@ -0,0 +1,233 @@
+# armazenamento.py
+# Camada de armazenamento dos intermediários (data/partial, data/generated)
+#
+# Os caminhos de INPUT_PATHS/OUTPUT_PATHS são lógicos (terminam em .csv); o
+# arquivo físico depende do formato configurado (FORMATO_INTERMEDIARIOS):
+# Parquet tipado e comprimido (padrão) ou CSV. Cada intermediário tem um
+# esquema fixo, aplicado na escrita e na leitura, de modo que tipos como
+# `codigo_ibge` não mudam de uma etapa para outra. Com EXPORTAR_CSV, o CSV
+# é gravado também ao lado do Parquet, para inspeção ou uso externo.
+
+import os
+import shutil
+from dataclasses import dataclass
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from variaveis import FORMATO_INTERMEDIARIOS, EXPORTAR_CSV
+
+FORMATOS = ("parquet", "csv")
+LINHAS_POR_LOTE = 200_000
+
+# dtype pandas → tipo Arrow usado ao juntar partes; categorias viram
+# dicionários com índice int32 (as partes podem ter dicionários diferentes)
+TIPOS_ARROW = {
+    "int16": pa.int16(), "int32": pa.int32(), "int64": pa.int64(),
+    "Int16": pa.int16(), "Int32": pa.int32(), "Int64": pa.int64(),
+    "float32": pa.float32(), "float64": pa.float64(),
+    "string": pa.string(), "category": pa.dictionary(pa.int32(), pa.string()),
+}
+
+
+@dataclass(frozen=True)
+class Esquema:
+    colunas: dict[str, str]  # coluna → dtype pandas, na ordem de gravação
+    encoding_csv: str = "utf-8-sig"
+
+
+ESQUEMAS = {
+    # Etapa 00
+    "pib": Esquema({
+        "codigo_ibge": "int64", "municipio": "string", "ano": "int64",
+        "pib": "float64",
+    }),
+    # Etapa 01 (tabela long: rótulos como dicionário, chaves inteiras
+    # pequenas; áreas seguem em float64, pois municípios passam de 10^7 ha e
+    # float32 não guarda as casas decimais nessa escala)
+    "cobertura_long": Esquema({
+        "codigo_ibge": "int32", "municipio": "category", "uf": "category",
+        "bioma": "category", "classe_codigo": "Int16",
+        "classe_level_0": "category", "classe_level_1": "category",
+        "classe_level_2": "category", "ano": "int16", "cobertura": "float64",
+    }, encoding_csv="utf-8"),
+    # Etapa 03
+    "uso_timeseries": Esquema({
+        "codigo_ibge": "int32", "municipio": "category", "year": "int16",
+        "uso": "Int16", "area_ha": "float64", "area_km2": "float64",
+    }),
+    # Etapa 01: cubo de cobertura por nível da hierarquia de classes
+    # (cubo_cobertura.py); níveis acima de `nivel` ficam vazios
+    "cubo_cobertura": Esquema({
+        "nivel": "int16", "codigo_ibge": "int32", "classe_level_0": "category",
+        "classe_level_1": "category", "classe_level_2": "category",
+        "ano": "int16", "cobertura": "float64",
+    }, encoding_csv="utf-8"),
+    # Etapa 04
+    "carbono_consolidado": Esquema({
+        "codigo_ibge": "int32", "municipio": "string", "ano": "int16",
+        "pib": "float64",
+        "GEE_tCO2e": "float64", "area_desmatada_ha": "float64",
+    }),
+}
+
+
+def schema_arrow(esquema: str) -> pa.Schema:
+    return pa.schema([(c, TIPOS_ARROW[t])
+                      for c, t in ESQUEMAS[esquema].colunas.items()])
+
+
+def caminho(path: str, formato: str = FORMATO_INTERMEDIARIOS) -> str:
+    """Arquivo físico de um caminho lógico no formato dado."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconhecido: {formato!r} (use {FORMATOS})")
+    raiz, _ = os.path.splitext(path)
+    return f"{raiz}.{formato}"
+
+
+def aplicar_esquema(df: pd.DataFrame, esquema: str) -> pd.DataFrame:
+    """Ordena as colunas e converte os tipos conforme o esquema."""
+    colunas = ESQUEMAS[esquema].colunas
+    faltando = set(colunas) - set(df.columns)
+    if faltando:
+        raise KeyError(f"Colunas ausentes para o esquema '{esquema}': "
+                       f"{sorted(faltando)}")
+    return df[list(colunas)].astype(colunas)
+
+
+def _gravar_csv(df: pd.DataFrame, destino: str, esquema: str):
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    df.to_csv(tmp, index=False, encoding=ESQUEMAS[esquema].encoding_csv)
+    os.replace(tmp, destino)
+
+
+def gravar(df: pd.DataFrame,
+           path: str,
+           esquema: str,
+           formato: str = FORMATO_INTERMEDIARIOS,
+           exportar_csv: bool = EXPORTAR_CSV) -> str:
+    """
+    Grava `df` (com o esquema aplicado) no caminho lógico `path` e retorna o
+    arquivo físico. Escrita atômica.
+    """
+    df = aplicar_esquema(df, esquema)
+    destino = caminho(path, formato)
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+    if formato == "parquet":
+        tmp = f"{destino}.{os.getpid()}.tmp"
+        df.to_parquet(tmp, index=False, compression="zstd")
+        os.replace(tmp, destino)
+        if exportar_csv:
+            _gravar_csv(df, caminho(path, "csv"), esquema)
+    else:
+        _gravar_csv(df, destino, esquema)
+    return destino
+
+
+def existe(path: str) -> bool:
+    return any(os.path.exists(caminho(path, f)) for f in FORMATOS)
+
+
+def ler(path: str,
+        esquema: str,
+        colunas: list[str] | None = None,
+        codigos: list[int] | None = None) -> pd.DataFrame:
+    """
+    Lê o intermediário no formato configurado (ou no outro, se só ele
+    existir), com os tipos do esquema. `colunas` restringe a leitura e
+    `codigos` as linhas (por codigo_ibge; filtro empurrado para o Parquet).
+    """
+    formatos = sorted(FORMATOS, key=lambda f: f != FORMATO_INTERMEDIARIOS)
+    for formato in formatos:
+        fisico = caminho(path, formato)
+        if os.path.exists(fisico):
+            break
+    else:
+        raise FileNotFoundError(f"Intermediário não encontrado: {path} "
+                                f"({', '.join(caminho(path, f) for f in FORMATOS)})")
+
+    tipos = ESQUEMAS[esquema].colunas
+    if colunas is not None:
+        tipos = {c: tipos[c] for c in colunas}
+    leitura = list(tipos)
+    if codigos is not None and "codigo_ibge" not in tipos:
+        leitura.append("codigo_ibge")
+    if formato == "parquet":
+        filtros = None
+        if codigos is not None:
+            filtros = [("codigo_ibge", "in", [int(c) for c in codigos])]
+        df = pd.read_parquet(fisico, columns=leitura, filters=filtros)
+    else:
+        df = pd.read_csv(fisico, usecols=leitura,
+                         encoding=ESQUEMAS[esquema].encoding_csv)
+        if codigos is not None:
+            df = df[df["codigo_ibge"].isin(codigos)]
+    df = df[list(tipos)].astype(tipos).reset_index(drop=True)
+    # Partes juntadas têm dicionários próprios: categorias sempre ordenadas
+    for col, tipo in tipos.items():
+        if tipo == "category":
+            df[col] = df[col].cat.remove_unused_categories()
+            df[col] = df[col].cat.set_categories(sorted(df[col].cat.categories))
+    return df
+
+
+def vazio(esquema: str) -> pd.DataFrame:
+    """DataFrame sem linhas com as colunas e tipos do esquema."""
+    return pd.DataFrame({c: pd.Series(dtype=t)
+                         for c, t in ESQUEMAS[esquema].colunas.items()})
+
+
+def particoes(df: pd.DataFrame, coluna_ano: str = "ano") -> pd.MultiIndex:
+    """Partição (codigo_ibge, ano) de cada linha, para comparar intermediários."""
+    return pd.MultiIndex.from_arrays(
+        [df["codigo_ibge"].to_numpy(dtype="int64"),
+         df[coluna_ano].to_numpy(dtype="int64")],
+        names=["codigo_ibge", "ano"],
+    )
+
+
+def juntar(partes: list[str],
+           path: str,
+           esquema: str,
+           formato: str = FORMATO_INTERMEDIARIOS,
+           exportar_csv: bool = EXPORTAR_CSV) -> str:
+    """
+    Concatena partes gravadas com `gravar` (caminhos lógicos, mesmo
+    formato) no intermediário `path`, sem carregá-las inteiras em memória.
+    """
+    destino = caminho(path, formato)
+    os.makedirs(os.path.dirname(destino) or ".", exist_ok=True)
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    if formato == "parquet":
+        schema = schema_arrow(esquema)
+        with pq.ParquetWriter(tmp, schema, compression="zstd") as writer:
+            for parte in partes:
+                writer.write_table(pq.read_table(caminho(parte, formato))
+                                   .cast(schema))
+    else:
+        encoding = ESQUEMAS[esquema].encoding_csv
+        with open(tmp, "w", encoding=encoding, newline="") as out:
+            for i, parte in enumerate(partes):
+                with open(caminho(parte, formato), encoding="utf-8-sig",
+                          newline="") as f:
+                    cabecalho = f.readline()
+                    if i == 0:
+                        out.write(cabecalho)
+                    shutil.copyfileobj(f, out)
+    os.replace(tmp, destino)
+    if formato == "parquet" and exportar_csv:
+        exportar(path, esquema)
+    return destino
+
+
+def exportar(path: str, esquema: str) -> str:
+    """Exporta o Parquet de `path` para CSV, lote a lote."""
+    destino = caminho(path, "csv")
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    arquivo = pq.ParquetFile(caminho(path, "parquet"))
+    with open(tmp, "w", encoding=ESQUEMAS[esquema].encoding_csv, newline="") as out:
+        for i, lote in enumerate(arquivo.iter_batches(batch_size=LINHAS_POR_LOTE)):
+            lote.to_pandas().to_csv(out, index=False, header=(i == 0))
+    os.replace(tmp, destino)
+    return destino
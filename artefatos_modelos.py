@@ -0,0 +1,128 @@
+# artefatos_modelos.py
+# Repositório de artefatos de modelagem gerados pela etapa 04 e consumidos
+# pela etapa 05: estimadores ajustados, scaler, índices do split, predições
+# no conjunto de teste e importâncias de variáveis.
+#
+# Cada versão fica em results/models/<hash>/, onde o hash cobre os dados de
+# entrada e os parâmetros do treino; latest.json aponta a versão corrente.
+
+import os
+import re
+import json
+import shutil
+import hashlib
+
+import joblib
+import pandas as pd
+
+from variaveis import OUTPUT_PATHS
+
+MANIFESTO = "manifest.json"
+
+
+def _slug(nome: str) -> str:
+    return re.sub(r"[^0-9a-zA-Z]+", "_", nome).strip("_").lower()
+
+
+def versao_artefatos(X: pd.DataFrame, y: pd.Series, params: dict) -> str:
+    """Hash (curto) dos dados de treino/teste e dos parâmetros."""
+    h = hashlib.sha256()
+    h.update(pd.util.hash_pandas_object(X, index=True).values.tobytes())
+    h.update(pd.util.hash_pandas_object(y, index=True).values.tobytes())
+    h.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return h.hexdigest()[:16]
+
+
+def caminho_versao(versao: str, base_dir: str = OUTPUT_PATHS.modelos_dir) -> str:
+    return os.path.join(base_dir, versao)
+
+
+def versao_existe(versao: str, base_dir: str = OUTPUT_PATHS.modelos_dir) -> bool:
+    return os.path.exists(os.path.join(caminho_versao(versao, base_dir), MANIFESTO))
+
+
+def salvar_artefatos(versao: str,
+                     params: dict,
+                     scaler,
+                     modelos: dict,
+                     resultados: list[dict],
+                     idx_train: list,
+                     idx_test: list,
+                     predicoes: pd.DataFrame,
+                     importancias: pd.DataFrame,
+                     base_dir: str = OUTPUT_PATHS.modelos_dir,
+                     atual: bool = True) -> str:
+    """
+    Grava todos os artefatos de uma versão (escrita em diretório temporário
+    e renomeada ao final) e, se `atual`, atualiza o ponteiro latest.json.
+    """
+    destino = caminho_versao(versao, base_dir)
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    os.makedirs(os.path.join(tmp, "modelos"), exist_ok=True)
+
+    joblib.dump(scaler, os.path.join(tmp, "scaler.joblib"))
+    arquivos = {}
+    for nome, modelo in modelos.items():
+        arquivo = os.path.join("modelos", f"{_slug(nome)}.joblib")
+        joblib.dump(modelo, os.path.join(tmp, arquivo))
+        arquivos[nome] = arquivo
+    predicoes.to_csv(os.path.join(tmp, "predicoes_teste.csv"),
+                     index=False, encoding="utf-8-sig")
+    importancias.to_csv(os.path.join(tmp, "importancias.csv"),
+                        index=False, encoding="utf-8-sig")
+    with open(os.path.join(tmp, MANIFESTO), "w", encoding="utf-8") as f:
+        json.dump({
+            "versao": versao,
+            "params": params,
+            "modelos": arquivos,
+            "resultados": resultados,
+            "idx_train": [int(i) for i in idx_train],
+            "idx_test": [int(i) for i in idx_test],
+        }, f, ensure_ascii=False, indent=2, default=str)
+
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(tmp, destino)
+    if atual:
+        marcar_atual(versao, base_dir)
+    return destino
+
+
+def marcar_atual(versao: str, base_dir: str = OUTPUT_PATHS.modelos_dir):
+    """Aponta latest.json para `versao`."""
+    path = os.path.join(base_dir, "latest.json")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"versao": versao}, f)
+    os.replace(tmp, path)
+
+
+def carregar_artefatos(versao: str | None = None,
+                       base_dir: str = OUTPUT_PATHS.modelos_dir,
+                       com_modelos: bool = True) -> dict:
+    """
+    Carrega uma versão (ou a mais recente). Retorna dicionário com
+    manifesto, scaler, modelos (ordem do treino), predições e importâncias.
+    """
+    if versao is None:
+        with open(os.path.join(base_dir, "latest.json"), encoding="utf-8") as f:
+            versao = json.load(f)["versao"]
+    pasta = caminho_versao(versao, base_dir)
+    with open(os.path.join(pasta, MANIFESTO), encoding="utf-8") as f:
+        manifesto = json.load(f)
+
+    artefatos = {
+        "versao": versao,
+        "manifesto": manifesto,
+        "resultados": manifesto["resultados"],
+        "predicoes": pd.read_csv(os.path.join(pasta, "predicoes_teste.csv"),
+                                 encoding="utf-8-sig"),
+        "importancias": pd.read_csv(os.path.join(pasta, "importancias.csv"),
+                                    encoding="utf-8-sig"),
+    }
+    if com_modelos:
+        artefatos["scaler"] = joblib.load(os.path.join(pasta, "scaler.joblib"))
+        artefatos["modelos"] = {
+            nome: joblib.load(os.path.join(pasta, arquivo))
+            for nome, arquivo in manifesto["modelos"].items()
+        }
+    return artefatos
@@ -0,0 +1,294 @@
+# base_alertas.py
+# Base local (SQLite) de alertas de desmatamento, com chave pelo código do
+# alerta e índices por data de detecção e território. Alimentada pela etapa
+# 02 (carga completa ou --sync incremental) e lida pela etapa 04.
+#
+# Os municípios cruzados por cada alerta (crossedCitiesList) ficam em uma
+# tabela filha normalizada (alert_code, source, name, geocode), gerada no
+# download, para que a consolidação não precise interpretar texto.
+
+import os
+import json
+import sqlite3
+from typing import Iterable
+
+import pandas as pd
+
+COLUNAS_MUNICIPIOS = ["alert_code", "source", "name", "geocode"]
+# Campos sem os quais um alerta não entra na base
+CAMPOS_OBRIGATORIOS = ("alertCode", "detectedAt")
+# Colunas da API sempre presentes no DataFrame lido (mesmo sem alertas)
+COLUNAS_ALERTAS = ["alertCode", "detectedAt", "publishedAt", "areaHa",
+                   "territoryId", "crossedCitiesList"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS alertas (
+    alert_code  TEXT PRIMARY KEY,
+    detected_at TEXT NOT NULL,
+    area_ha     REAL,
+    payload     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_alertas_detected_at ON alertas (detected_at);
+
+CREATE TABLE IF NOT EXISTS alertas_territorios (
+    alert_code   TEXT NOT NULL,
+    territory_id INTEGER NOT NULL,
+    PRIMARY KEY (alert_code, territory_id)
+);
+CREATE INDEX IF NOT EXISTS idx_alertas_territorio
+    ON alertas_territorios (territory_id, alert_code);
+
+CREATE TABLE IF NOT EXISTS alertas_municipios (
+    alert_code TEXT NOT NULL,
+    source     TEXT,
+    name       TEXT,
+    geocode    INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_alertas_municipios
+    ON alertas_municipios (alert_code);
+"""
+
+
+def _geocode(rec: dict):
+    valor = rec.get("geocode", rec.get("code"))
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def municipios_de_alertas(alertas: Iterable[dict]) -> list[tuple]:
+    """
+    Achata `crossedCitiesList` de cada alerta em linhas
+    (alert_code, source, name, geocode).
+    """
+    linhas = []
+    for a in alertas:
+        if a.get("alertCode") is None:
+            continue
+        codigo = str(a["alertCode"])
+        for rec in a.get("crossedCitiesList") or []:
+            linhas.append((codigo, rec.get("source"), rec.get("name"),
+                           _geocode(rec)))
+    return linhas
+
+
+def conectar(path: str) -> sqlite3.Connection:
+    """Abre (e cria, se preciso) a base de alertas."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    con = sqlite3.connect(path)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript(SCHEMA)
+    _preencher_municipios(con)
+    return con
+
+
+def _preencher_municipios(con: sqlite3.Connection):
+    """Popula a tabela filha em bases criadas antes de ela existir."""
+    vazia = con.execute(
+        "SELECT NOT EXISTS (SELECT 1 FROM alertas_municipios)"
+    ).fetchone()[0]
+    if not vazia:
+        return
+    cursor = con.execute("SELECT payload FROM alertas")
+    while lote := cursor.fetchmany(10_000):
+        con.executemany(
+            "INSERT INTO alertas_municipios VALUES (?, ?, ?, ?)",
+            municipios_de_alertas(json.loads(p) for (p,) in lote),
+        )
+    con.commit()
+
+
+def upsert_alertas(con: sqlite3.Connection,
+                   alertas: Iterable[dict],
+                   territory_id: int) -> int:
+    """
+    Insere ou atualiza alertas (por `alertCode`) e registra o território de
+    origem. Registros sem `alertCode` ou `detectedAt` são ignorados, com
+    aviso. Retorna a quantidade processada. Não faz commit.
+    """
+    alertas = list(alertas)
+    validos = [a for a in alertas
+               if all(a.get(c) is not None for c in CAMPOS_OBRIGATORIOS)]
+    if len(validos) < len(alertas):
+        print(f"[AVISO] Território {territory_id}: {len(alertas) - len(validos)} "
+              f"alertas sem {' ou '.join(CAMPOS_OBRIGATORIOS)} ignorados na base")
+    alertas = validos
+    linhas = [
+        (str(a["alertCode"]), str(a["detectedAt"]), a.get("areaHa"),
+         json.dumps(a, ensure_ascii=False))
+        for a in alertas
+    ]
+    con.executemany(
+        """
+        INSERT INTO alertas (alert_code, detected_at, area_ha, payload)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (alert_code) DO UPDATE SET
+            detected_at = excluded.detected_at,
+            area_ha     = excluded.area_ha,
+            payload     = excluded.payload
+        """,
+        linhas,
+    )
+    con.executemany(
+        "INSERT OR IGNORE INTO alertas_territorios VALUES (?, ?)",
+        [(codigo, territory_id) for codigo, *_ in linhas],
+    )
+    con.executemany(
+        "DELETE FROM alertas_municipios WHERE alert_code = ?",
+        [(codigo,) for codigo, *_ in linhas],
+    )
+    con.executemany(
+        "INSERT INTO alertas_municipios VALUES (?, ?, ?, ?)",
+        municipios_de_alertas(alertas),
+    )
+    return len(linhas)
+
+
+def remover_periodo(con: sqlite3.Connection,
+                    territory_ids: list[int],
+                    inicio: str,
+                    fim: str):
+    """
+    Desassocia dos territórios os alertas detectados no período e apaga os
+    que ficarem sem território (usado na carga completa). Não faz commit.
+    """
+    marcadores = ",".join("?" * len(territory_ids))
+    con.execute(
+        f"""
+        DELETE FROM alertas_territorios
+        WHERE territory_id IN ({marcadores})
+          AND alert_code IN (
+              SELECT alert_code FROM alertas
+              WHERE detected_at BETWEEN ? AND ?)
+        """,
+        [*territory_ids, inicio, f"{fim}\uffff"],
+    )
+    con.execute(
+        """
+        DELETE FROM alertas
+        WHERE alert_code NOT IN (SELECT alert_code FROM alertas_territorios)
+        """
+    )
+    con.execute(
+        """
+        DELETE FROM alertas_municipios
+        WHERE alert_code NOT IN (SELECT alert_code FROM alertas)
+        """
+    )
+
+
+def watermark(con: sqlite3.Connection, territory_id: int) -> str | None:
+    """Data de detecção mais recente armazenada para o território."""
+    row = con.execute(
+        """
+        SELECT MAX(a.detected_at)
+        FROM alertas a
+        JOIN alertas_territorios t USING (alert_code)
+        WHERE t.territory_id = ?
+        """,
+        (territory_id,),
+    ).fetchone()
+    return row[0]
+
+
+def ler_alertas(path: str,
+                territory_ids: list[int] | None = None,
+                inicio: str | None = None,
+                fim: str | None = None) -> pd.DataFrame:
+    """
+    Lê os alertas da base como DataFrame com as colunas originais da API
+    (mesmo formato do CSV da etapa 02). COLUNAS_ALERTAS estão sempre
+    presentes, mesmo com a base vazia.
+    """
+    filtros, params = [], []
+    if territory_ids:
+        filtros.append(
+            "alert_code IN (SELECT alert_code FROM alertas_territorios "
+            f"WHERE territory_id IN ({','.join('?' * len(territory_ids))}))"
+        )
+        params.extend(territory_ids)
+    if inicio:
+        filtros.append("detected_at >= ?")
+        params.append(inicio)
+    if fim:
+        filtros.append("detected_at <= ?")
+        params.append(f"{fim}\uffff")
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+
+    con = sqlite3.connect(path)
+    try:
+        rows = con.execute(
+            f"SELECT payload FROM alertas {where} ORDER BY detected_at, alert_code",
+            params,
+        ).fetchall()
+    finally:
+        con.close()
+    df = pd.DataFrame([json.loads(p) for (p,) in rows])
+    faltando = [c for c in COLUNAS_ALERTAS if c not in df.columns]
+    return df.reindex(columns=[*df.columns, *faltando])
+
+
+def ler_municipios(path: str) -> pd.DataFrame:
+    """Lê a tabela filha (alert_code, source, name, geocode)."""
+    con = sqlite3.connect(path)
+    try:
+        return pd.read_sql_query(
+            "SELECT alert_code, source, name, geocode FROM alertas_municipios",
+            con,
+        )
+    finally:
+        con.close()
+
+
+# Parser vetorizado de crossedCitiesList serializado (CSVs antigos): cada
+# dicionário é isolado por regex e os campos extraídos coluna a coluna.
+_RE_DICT = r"(\{[^{}]*\})"
+_RE_CAMPO = r"""['"]{campo}['"]\s*:\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)"|(-?\d+))"""
+
+
+def _campo(dicts: pd.Series, campo: str) -> pd.Series:
+    partes = dicts.str.extract(_RE_CAMPO.format(campo=campo))
+    return partes[0].fillna(partes[1]).fillna(partes[2])
+
+
+def municipios_de_texto(codigos: pd.Series,
+                        crossed: pd.Series) -> tuple[pd.DataFrame, int]:
+    """
+    Converte a coluna textual `crossedCitiesList` na tabela filha, sem
+    avaliar cada linha em Python. Retorna (tabela, nº de linhas malformadas):
+    textos não vazios que não são uma lista de dicionários reconhecível.
+    """
+    texto = crossed.astype("string").str.strip()
+    dicts = texto.str.extractall(_RE_DICT)[0]
+    nivel = dicts.index.get_level_values(0)
+
+    geocode = pd.to_numeric(
+        _campo(dicts, "geocode").fillna(_campo(dicts, "code")),
+        errors="coerce").astype("Int64")
+    tabela = pd.DataFrame({
+        "alert_code": codigos.astype(str).reindex(nivel).reset_index(drop=True),
+        "source": _campo(dicts, "source").reset_index(drop=True),
+        "name": _campo(dicts, "name").reset_index(drop=True),
+        "geocode": geocode.reset_index(drop=True),
+    }, columns=COLUNAS_MUNICIPIOS)
+
+    validos = texto.str.fullmatch(r"\[\s*(\{[^{}]*\}\s*,?\s*)*\]").fillna(False)
+    vazios = texto.isna() | (texto == "")
+    falhas = int((~validos & ~vazios).sum())
+    return tabela, falhas
+
+
+def municipio_por_alerta(municipios: pd.DataFrame,
+                         coluna: str = "name") -> pd.Series:
+    """
+    Primeiro registro com source == 'município' de cada alerta
+    (mesma regra da extração anterior). Retorna Series alert_code → nome
+    (ou → `coluna`, p.ex. 'geocode').
+    """
+    eh_municipio = municipios["source"].fillna("").str.lower() == "município"
+    return (
+        municipios.loc[eh_municipio]
+        .drop_duplicates("alert_code")
+        .set_index("alert_code")[coluna]
+    )
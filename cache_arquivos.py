@@ -0,0 +1,73 @@
+# cache_arquivos.py
+# Utilitários de impressão digital de arquivos para invalidar caches derivados
+
+import os
+import json
+import hashlib
+from pathlib import Path
+
+BLOCO_HASH = 1 << 20  # 1 MiB
+
+
+def sha256_arquivo(path: str | Path) -> str:
+    """Calcula o SHA-256 do arquivo lendo em blocos (memória constante)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloco in iter(lambda: f.read(BLOCO_HASH), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def impressao_digital(path: str | Path, com_hash: bool = True) -> dict:
+    """
+    Retorna tamanho, mtime (ns) e, opcionalmente, SHA-256 do arquivo.
+    """
+    st = os.stat(path)
+    info = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+    if com_hash:
+        info["sha256"] = sha256_arquivo(path)
+    return info
+
+
+def ler_meta(meta_path: str | Path) -> dict | None:
+    """Lê o JSON de metadados do cache; None se ausente ou corrompido."""
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def salvar_meta(meta_path: str | Path, meta: dict):
+    """Grava os metadados do cache de forma atômica."""
+    os.makedirs(os.path.dirname(meta_path) or ".", exist_ok=True)
+    tmp = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, meta_path)
+
+
+def fonte_inalterada(fonte: str | Path,
+                     meta: dict | None,
+                     meta_path: str | Path | None = None) -> bool:
+    """
+    Verifica se o arquivo-fonte corresponde à impressão registrada em `meta`.
+
+    Tamanho e mtime iguais bastam; se apenas o mtime mudou (ex.: cópia ou
+    checkout), o SHA-256 decide, evitando reconstruir o cache à toa. Nesse
+    caso o novo mtime é gravado em `meta_path` para não recalcular o hash.
+    """
+    if not meta or "fonte" not in meta:
+        return False
+    registrada = meta["fonte"]
+    atual = impressao_digital(fonte, com_hash=False)
+    if atual["size"] != registrada.get("size"):
+        return False
+    if atual["mtime_ns"] == registrada.get("mtime_ns"):
+        return True
+    if sha256_arquivo(fonte) != registrada.get("sha256"):
+        return False
+    if meta_path is not None:
+        registrada["mtime_ns"] = atual["mtime_ns"]
+        salvar_meta(meta_path, meta)
+    return True
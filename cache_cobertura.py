@@ -0,0 +1,192 @@
+# cache_cobertura.py
+# Cache colunar (Parquet) da planilha COVERAGE_9 do MapBiomas, compartilhado
+# pelas etapas 01 e 03.
+#
+# A planilha nacional é convertida uma única vez; as leituras seguintes usam
+# projeção de colunas e filtro por `geocode` empurrado para o Parquet.
+
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from cache_arquivos import fonte_inalterada, impressao_digital, ler_meta, salvar_meta
+from leitor_xlsx import eh_coluna_ano, exata, iterar_lotes, ler_filtrado
+from variaveis import CACHE_PATHS, INPUT_PATHS
+
+SHEET_NAME = "COVERAGE_9"
+VERSAO_CACHE = 1
+LINHAS_POR_GRUPO = 20_000
+# Linhas ordenadas em memória de cada vez na construção do cache
+LINHAS_POR_FAIXA = 500_000
+
+
+def _tipar(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Normaliza tipos: `geocode` inteiro, anos como float64 com nome texto
+    (exigência do Parquet) e demais colunas como texto.
+    """
+    df = df.rename(columns={c: str(c) for c in df.columns if eh_coluna_ano(c)})
+    for col in df.columns:
+        if col.isdigit():
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        elif col == "geocode":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        elif col == "class":
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("Int64")
+        else:
+            df[col] = df[col].astype("string")
+    return df
+
+
+def _faixas(contagem: dict[int, int], limite: int) -> list[tuple[int, int]]:
+    """
+    Faixas contíguas de `geocode` com até `limite` linhas cada (um código com
+    mais linhas que o limite fica sozinho na sua faixa).
+    """
+    faixas, inicio, linhas = [], None, 0
+    for codigo in sorted(contagem):
+        if inicio is not None and linhas + contagem[codigo] > limite:
+            faixas.append((inicio, anterior))
+            inicio, linhas = None, 0
+        if inicio is None:
+            inicio = codigo
+        linhas += contagem[codigo]
+        anterior = codigo
+    if inicio is not None:
+        faixas.append((inicio, anterior))
+    return faixas
+
+
+def construir_cache(fonte: str | Path = INPUT_PATHS.mapbiomas,
+                    sheet_name: str = SHEET_NAME,
+                    destino: str = CACHE_PATHS.cobertura_parquet,
+                    meta_path: str = CACHE_PATHS.cobertura_meta) -> str:
+    """
+    Converte a planilha em Parquet ordenado por `geocode`, com grupos de
+    linhas pequenos para que o filtro por município descarte o restante.
+
+    Duas passadas com memória limitada, qualquer que seja o tamanho da
+    planilha: (1) cada lote lido em streaming é gravado num Parquet
+    intermediário, contando as linhas por `geocode`; (2) o intermediário é
+    relido por faixas de códigos de até LINHAS_POR_FAIXA linhas, e cada
+    faixa é ordenada e anexada ao cache final. O pico de memória é uma
+    faixa, nunca a planilha inteira.
+    """
+    print(f"[INFO] Construindo cache Parquet de {fonte} ({sheet_name})...")
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    bruto = f"{destino}.{os.getpid()}.bruto"
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    contagem: dict[int, int] = {}
+    writer, schema = None, None
+    try:
+        # 1) Lotes da planilha → Parquet intermediário (ordem original)
+        for lote in iterar_lotes(fonte, None, "geocode", sheet_name=sheet_name):
+            tabela = pa.Table.from_pandas(_tipar(lote), preserve_index=False)
+            if writer is None:
+                schema = tabela.schema
+                writer = pq.ParquetWriter(bruto, schema, compression="zstd")
+            else:
+                tabela = tabela.cast(schema)
+            writer.write_table(tabela, row_group_size=LINHAS_POR_GRUPO)
+            for codigo, n in lote["geocode"].value_counts().items():
+                contagem[int(codigo)] = contagem.get(int(codigo), 0) + int(n)
+        if writer is None:
+            raise ValueError(f"Planilha {sheet_name} sem linhas em {fonte}")
+        writer.close()
+
+        # 2) Faixas de geocode ordenadas → cache final (nulos ao fim, como
+        # no sort_by da tabela inteira)
+        dataset = ds.dataset(bruto, format="parquet")
+        geocode = ds.field("geocode")
+        filtros = [(geocode >= ini) & (geocode <= fim)
+                   for ini, fim in _faixas(contagem, LINHAS_POR_FAIXA)]
+        filtros.append(geocode.is_null())
+        with pq.ParquetWriter(tmp, schema, compression="zstd") as saida:
+            for filtro in filtros:
+                faixa = dataset.to_table(filter=filtro).sort_by("geocode")
+                if faixa.num_rows:
+                    saida.write_table(faixa, row_group_size=LINHAS_POR_GRUPO)
+        os.replace(tmp, destino)
+    finally:
+        for path in (bruto, tmp):
+            if os.path.exists(path):
+                os.remove(path)
+
+    salvar_meta(meta_path, {
+        "versao": VERSAO_CACHE,
+        "sheet": sheet_name,
+        "fonte": impressao_digital(fonte),
+    })
+    print(f"✅ Cache de cobertura gerado em: {destino}")
+    return destino
+
+
+def garantir_cache(fonte: str | Path = INPUT_PATHS.mapbiomas,
+                   sheet_name: str = SHEET_NAME,
+                   destino: str = CACHE_PATHS.cobertura_parquet,
+                   meta_path: str = CACHE_PATHS.cobertura_meta) -> str:
+    """Reconstrói o cache apenas se a planilha-fonte mudou."""
+    meta = ler_meta(meta_path)
+    if (
+        os.path.exists(destino)
+        and meta is not None
+        and meta.get("versao") == VERSAO_CACHE
+        and meta.get("sheet") == sheet_name
+        and fonte_inalterada(fonte, meta, meta_path)
+    ):
+        return destino
+    return construir_cache(fonte, sheet_name, destino, meta_path)
+
+
+def carregar_cobertura(fonte: str | Path = INPUT_PATHS.mapbiomas,
+                       codigos: list[int] | None = None,
+                       colunas: list[str] | None = None,
+                       sheet_name: str = SHEET_NAME,
+                       usar_cache: bool = True,
+                       categoricas: list[str] | None = None,
+                       anos: list[int] | None = None) -> pd.DataFrame:
+    """
+    Lê a planilha de cobertura via cache Parquet.
+
+    - `codigos`: códigos IBGE a manter (filtro aplicado na leitura).
+    - `colunas`: colunas de identificação desejadas; as colunas de ano são
+      sempre incluídas. None mantém todas.
+    - `usar_cache=False`: lê direto da planilha em streaming, sem gravar
+      cache (útil quando não há espaço em disco ou para conferência).
+    - `categoricas`: colunas de texto lidas como dicionário (category), sem
+      criar um objeto Python por linha; categorias em ordem alfabética.
+    - `anos`: colunas de ano a ler (None = todas); só vale com o cache.
+
+    As colunas de ano voltam como `int`, como em `pd.read_excel`.
+    """
+    if not usar_cache:
+        regras = None if colunas is None else {c: exata(c) for c in colunas}
+        return ler_filtrado(fonte, regras, "geocode",
+                            codigos=None if codigos is None else set(codigos),
+                            sheet_name=sheet_name, manter_anos=True)
+
+    path = garantir_cache(fonte, sheet_name)
+    schema = pq.read_schema(path)
+    if colunas is not None or anos is not None:
+        nomes_anos = [c for c in schema.names if c.isdigit()
+                      and (anos is None or int(c) in set(anos))]
+        ids = [c for c in schema.names if not c.isdigit()]
+        if colunas is not None:
+            ids = [c for c in colunas if c in schema.names]
+        colunas = ids + nomes_anos
+    filtros = None
+    if codigos is not None:
+        filtros = [("geocode", "in", [int(c) for c in codigos])]
+
+    categoricas = [c for c in categoricas or [] if c in schema.names]
+    df = pq.read_table(path, columns=colunas, filters=filtros,
+                       read_dictionary=categoricas or None).to_pandas()
+    for col in categoricas:
+        # o dicionário lido é o do grupo de linhas inteiro
+        df[col] = df[col].cat.remove_unused_categories()
+        df[col] = df[col].cat.set_categories(sorted(df[col].cat.categories))
+    return df.rename(columns={c: int(c) for c in df.columns if c.isdigit()})
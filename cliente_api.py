@@ -0,0 +1,226 @@
+# cliente_api.py
+# Cliente HTTP único da API de alertas MapBiomas
+#
+# - Uma requests.Session com pool de conexões (keep-alive) compartilhada por
+#   todas as chamadas e threads.
+# - Token bearer guardado em disco (CACHE_PATHS.token_api) até perto de
+#   expirar, por URL base e e-mail; execuções seguidas não pedem token novo.
+#   Um 401 com token em cache descarta o token e repete a chamada uma vez.
+# - Backoff exponencial em 429/5xx e falhas de conexão, respeitando o
+#   Retry-After quando a API o envia.
+# - Limite de requisições por segundo, comum a todas as threads do cliente.
+#
+# Credenciais: MAPBIOMAS_EMAIL e MAPBIOMAS_PASSWORD. Limites e tentativas:
+# variaveis.API_ALERTAS (PIPELINE_API_RPS, PIPELINE_API_TENTATIVAS,
+# PIPELINE_API_BACKOFF).
+#
+# Usado pela etapa 02, por territorios.py, tests/list_territories.py e
+# diagnosis/get_municipality_ids.py.
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from variaveis import API_ALERTAS, CACHE_PATHS
+
+# Status que valem nova tentativa
+RETENTAVEIS = {429, 500, 502, 503, 504}
+# Teto da espera entre tentativas, em segundos
+ESPERA_MAXIMA = 60.0
+# Margem antes da expiração a partir da qual o token é renovado
+MARGEM_TOKEN = 60
+# Validade assumida quando a API não informa expiresIn
+VALIDADE_PADRAO = 3600
+
+
+def credenciais() -> dict:
+    """E-mail e senha do ambiente (encerra se ausentes)."""
+    email = os.getenv("MAPBIOMAS_EMAIL")
+    pwd = os.getenv("MAPBIOMAS_PASSWORD")
+    if not email or not pwd:
+        print("Erro: defina MAPBIOMAS_EMAIL e MAPBIOMAS_PASSWORD", file=sys.stderr)
+        sys.exit(1)
+    return {"email": email, "password": pwd}
+
+
+class LimiteTaxa:
+    """No máximo `por_segundo` liberações por segundo (0 = sem limite)."""
+
+    def __init__(self, por_segundo: float):
+        self.intervalo = 1.0 / por_segundo if por_segundo > 0 else 0.0
+        self.proximo = 0.0
+        self.lock = threading.Lock()
+
+    def esperar(self):
+        if not self.intervalo:
+            return
+        with self.lock:
+            agora = time.monotonic()
+            espera = self.proximo - agora
+            self.proximo = max(agora, self.proximo) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+class CacheToken:
+    """Tokens em disco (JSON), por URL base e e-mail, com a expiração."""
+
+    def __init__(self, path: str = CACHE_PATHS.token_api):
+        self.path = path
+
+    @staticmethod
+    def chave(base_url: str, email: str) -> str:
+        return hashlib.sha256(f"{base_url}|{email}".encode()).hexdigest()[:16]
+
+    def _ler(self) -> dict:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def ler(self, chave: str) -> str | None:
+        item = self._ler().get(chave)
+        if item and item["expira_em"] - MARGEM_TOKEN > time.time():
+            return item["token"]
+        return None
+
+    def gravar(self, chave: str, token: str | None, expira_em: float = 0):
+        """Grava (ou, com token None, remove) o token; escrita atômica, 0600."""
+        dados = self._ler()
+        if token is None:
+            dados.pop(chave, None)
+        else:
+            dados[chave] = {"token": token, "expira_em": expira_em}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(dados, f)
+        os.replace(tmp, self.path)
+
+
+class ClienteAPI:
+    """Sessão, token, backoff e limite de taxa da API de alertas."""
+
+    def __init__(self,
+                 base_url: str = API_ALERTAS.url,
+                 conexoes: int = 4,
+                 req_por_segundo: float = API_ALERTAS.req_por_segundo,
+                 tentativas: int = API_ALERTAS.tentativas,
+                 backoff: float = API_ALERTAS.backoff,
+                 cache_token: CacheToken | None = None):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, conexoes))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.limite = LimiteTaxa(req_por_segundo)
+        self.tentativas = max(1, tentativas)
+        self.backoff = backoff
+        self.cache_token = cache_token or CacheToken()
+        self._token: str | None = None
+        self._lock_token = threading.Lock()
+        self.requisicoes = 0
+        self.novas_tentativas = 0
+
+    # -------------------------------------------------------------------
+    # Requisições com backoff
+
+    def _espera(self, tentativa: int, resp: requests.Response | None) -> float:
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), ESPERA_MAXIMA)
+            except ValueError:
+                pass
+        return min(self.backoff * 2 ** tentativa, ESPERA_MAXIMA)
+
+    def requisitar(self, metodo: str, caminho: str,
+                   timeout: float = 60, **kwargs) -> requests.Response:
+        """
+        Uma chamada com limite de taxa e até `tentativas` tentativas em
+        429/5xx ou falha de conexão; a resposta final passa por
+        raise_for_status.
+        """
+        url = f"{self.base_url}{caminho}"
+        for tentativa in range(self.tentativas):
+            self.limite.esperar()
+            self.requisicoes += 1
+            resp = None
+            try:
+                resp = self.session.request(metodo, url, timeout=timeout, **kwargs)
+                if resp.status_code not in RETENTAVEIS:
+                    break
+                motivo = f"HTTP {resp.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if tentativa == self.tentativas - 1:
+                    raise
+                motivo = type(e).__name__
+            if tentativa == self.tentativas - 1:
+                break
+            espera = self._espera(tentativa, resp)
+            self.novas_tentativas += 1
+            print(f"[AVISO] {metodo} {caminho}: {motivo}; nova tentativa "
+                  f"em {espera:.1f} s ({tentativa + 2}/{self.tentativas})")
+            time.sleep(espera)
+        resp.raise_for_status()
+        return resp
+
+    # -------------------------------------------------------------------
+    # Token
+
+    def token(self, renovar: bool = False) -> str:
+        """Token bearer: memória, disco ou /token (nessa ordem)."""
+        with self._lock_token:
+            if self._token and not renovar:
+                return self._token
+            creds = credenciais()
+            chave = CacheToken.chave(self.base_url, creds["email"])
+            if not renovar:
+                self._token = self.cache_token.ler(chave)
+                if self._token:
+                    return self._token
+            dados = self.requisitar("POST", "/token", json=creds, timeout=30).json()
+            self._token = dados["token"]
+            validade = float(dados.get("expiresIn") or VALIDADE_PADRAO)
+            self.cache_token.gravar(chave, self._token, time.time() + validade)
+            return self._token
+
+    def get(self, caminho: str, params: dict | None = None,
+            timeout: float = 60):
+        """GET autenticado; devolve o JSON. Renova o token uma vez em 401."""
+        for renovar in (False, True):
+            token = self.token(renovar=renovar)
+            try:
+                return self.requisitar(
+                    "GET", caminho, params=params, timeout=timeout,
+                    headers={"Authorization": f"Bearer {token}"},
+                ).json()
+            except requests.HTTPError as e:
+                if renovar or e.response.status_code != 401:
+                    raise
+                print("[AVISO] Token recusado pela API; pedindo um novo")
+
+    # -------------------------------------------------------------------
+    # Endpoints
+
+    def alertas(self, start_date: str, end_date: str,
+                territory_ids: list[int], timeout: float = 300) -> list[dict]:
+        """GET /alerts/all: alertas do período nos territórios."""
+        params = {
+            "startDate":    start_date,
+            "endDate":      end_date,
+            "territoryIds": ",".join(str(i) for i in territory_ids),
+        }
+        return self.get("/alerts/all", params, timeout).get("collection", [])
+
+    def opcoes_territorios(self) -> list[dict]:
+        """GET /territories/options: catálogo de territórios (todas as categorias)."""
+        return self.get("/territories/options", timeout=120)
@@ -0,0 +1,151 @@
+# consolidacao.py
+# Junção das fontes da etapa 04 por (codigo_ibge, ano)
+#
+# PIB (IBGE), cobertura (MapBiomas) e alertas trazem o nome do município em
+# grafias diferentes (acentos, caixa, hífens). Em vez de juntar pelo nome, cada
+# fonte é somada por código IBGE (int32) × ano (int16) e acumulada numa matriz
+# densa município × ano, com a linha de cada código lida de uma tabela densa
+# (código → posição) na faixa de códigos da região; o consolidado tem uma
+# linha por célula com algum dado.
+#
+# Quando uma fonte só tem o nome (alertas sem geocode), o código vem da tabela
+# de nomes normalizados (sem acento, caixa ou pontuação), montada uma vez por
+# processo a partir do catálogo de municípios.
+
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+from regioes import catalogo_municipios
+from variaveis import REGIOES
+
+COLUNAS = ["codigo_ibge", "municipio", "ano"]
+
+
+def normalizar_nome(nome: str) -> str:
+    """'Olho-d'Água das Flores' → 'olho d agua das flores'."""
+    return " ".join(re.sub(r"[^0-9a-z]+", " ", unidecode(str(nome)).lower()).split())
+
+
+@lru_cache(maxsize=2)
+def tabela_nomes(construir_cache: bool = True) -> pd.DataFrame:
+    """
+    ['codigo_ibge', 'municipio', 'uf', 'chave'] de todos os municípios do
+    catálogo de cobertura e das regiões nomeadas, com `chave` normalizada.
+    Sem a planilha de cobertura, só as regiões nomeadas entram; com
+    `construir_cache=False`, o catálogo só entra se o cache Parquet já
+    existir (a planilha nunca é convertida).
+    """
+    partes = [pd.DataFrame(
+        [(m.id, m.nome, m.uf) for ms in REGIOES.values() for m in ms],
+        columns=["codigo_ibge", "municipio", "uf"])]
+    try:
+        partes.append(catalogo_municipios(construir=construir_cache)
+                      [["codigo_ibge", "municipio", "uf"]])
+    except FileNotFoundError:
+        pass
+    df = (pd.concat(partes, ignore_index=True)
+          .drop_duplicates("codigo_ibge")
+          .astype({"codigo_ibge": "int32"})
+          .sort_values("codigo_ibge", ignore_index=True))
+    df["chave"] = df["municipio"].map(normalizar_nome)
+    return df
+
+
+def codigos_por_nome(nomes: pd.Series, codigos=None) -> pd.Series:
+    """
+    Código IBGE (Int32) de cada nome, comparando nomes normalizados; com
+    `codigos`, só esses municípios são candidatos. Nomes ausentes ou
+    ambíguos (mesma chave em mais de um candidato) ficam nulos.
+    """
+    tabela = tabela_nomes()
+    if codigos is not None:
+        tabela = tabela[tabela["codigo_ibge"].isin(codigos)]
+    unicos = tabela.drop_duplicates("chave", keep=False).set_index("chave")["codigo_ibge"]
+    # normaliza só os valores distintos
+    valores, rotulos = pd.factorize(nomes)
+    chaves = pd.Index([normalizar_nome(r) for r in rotulos])
+    por_rotulo = unicos.reindex(chaves).to_numpy()
+    saida = np.full(len(valores), np.nan)
+    validos = valores >= 0
+    saida[validos] = por_rotulo[valores[validos]]
+    return pd.Series(saida, index=nomes.index).astype("Int32")
+
+
+def _indices(df: pd.DataFrame, posicao: np.ndarray, cod0: int,
+             ano0: int, n_anos: int, nome: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Posição plana (município × ano) de cada linha e máscara das válidas;
+    `posicao[codigo - cod0]` é a linha do município na matriz (-1 = fora).
+    """
+    cod = df["codigo_ibge"].to_numpy(dtype="int64", na_value=-1) - cod0
+    ano = df["ano"].to_numpy(dtype="int64", na_value=-1)
+    dentro = (cod >= 0) & (cod < len(posicao))
+    linha = np.where(dentro, posicao[np.where(dentro, cod, 0)], -1)
+    validos = (linha >= 0) & (ano >= ano0)
+    fora = int(((cod + cod0) >= 0).sum() - (linha >= 0).sum())
+    if fora:
+        print(f"[AVISO] {nome}: {fora} linhas com município fora da região ignoradas")
+    return linha * n_anos + (ano - ano0), validos
+
+
+def consolidar(codigos,
+               medidas: dict[str, tuple[pd.DataFrame, str]],
+               nomes: list[pd.DataFrame] = ()) -> pd.DataFrame:
+    """
+    Soma cada medida por (codigo_ibge, ano) numa matriz densa e devolve as
+    células com algum dado (junção externa), ordenadas por código e ano.
+
+    `medidas` mapeia a coluna de saída a (tabela, coluna de valor); cada
+    tabela precisa de 'codigo_ibge' e 'ano'. Células sem linhas da fonte
+    ficam NaN. O nome de cada município vem da primeira tabela de `nomes`
+    que o tiver e, na falta, da tabela de nomes normalizados.
+    """
+    codigos = np.unique(np.asarray(list(codigos), dtype="int64"))
+    anos = pd.concat([pd.to_numeric(df["ano"], errors="coerce")
+                      for df, _ in medidas.values()]).dropna()
+    colunas = COLUNAS + list(medidas)
+    if anos.empty or len(codigos) == 0:
+        return pd.DataFrame(columns=colunas)
+    ano0, n_anos = int(anos.min()), int(anos.max()) - int(anos.min()) + 1
+    n_celulas = len(codigos) * n_anos
+    # tabela densa código → linha da matriz (faixa de códigos da região)
+    cod0 = int(codigos[0])
+    posicao = np.full(int(codigos[-1]) - cod0 + 1, -1, dtype="int64")
+    posicao[codigos - cod0] = np.arange(len(codigos))
+
+    valores, presente = {}, np.zeros(n_celulas, dtype=bool)
+    for saida, (df, coluna) in medidas.items():
+        plano, validos = _indices(df, posicao, cod0, ano0, n_anos, saida)
+        v = pd.to_numeric(df[coluna], errors="coerce").to_numpy(dtype="float64")
+        # soma compensada do groupby (mesmos totais da junção por nome),
+        # agrupando pela posição inteira da célula
+        soma = pd.Series(v[validos]).groupby(plano[validos], sort=False).sum()
+        valores[saida] = np.full(n_celulas, np.nan)
+        valores[saida][soma.index.to_numpy()] = soma.to_numpy()
+        presente[soma.index.to_numpy()] = True
+
+    celulas = np.flatnonzero(presente)
+    df = pd.DataFrame({
+        "codigo_ibge": codigos[celulas // n_anos].astype("int32"),
+        "ano": (ano0 + celulas % n_anos).astype("int16"),
+    })
+    for saida, v in valores.items():
+        df[saida] = v[celulas]
+
+    # nome por código: fontes na ordem dada, depois a tabela normalizada
+    nome = pd.Series(pd.NA, index=pd.Index(codigos, dtype="int64"), dtype="string")
+    for t in [*nomes, None]:
+        if not nome.isna().any():
+            break
+        if t is None:  # só consulta o catálogo se faltar algum nome
+            t = tabela_nomes()
+        t = t[["codigo_ibge", "municipio"]].dropna().drop_duplicates("codigo_ibge")
+        mapa = pd.Series(t["municipio"].astype("string").to_numpy(),
+                         index=t["codigo_ibge"].astype("int64").to_numpy())
+        nome = nome.fillna(mapa.reindex(nome.index))
+    df.insert(1, "municipio", nome.reindex(df["codigo_ibge"].astype("int64")).to_numpy())
+    return df[colunas]
@@ -0,0 +1,179 @@
+# cubo_cobertura.py
+# Consultas e atualização incremental do cubo de cobertura MapBiomas
+#
+# O cubo (projeção 'cubo_cobertura' de extracao_cobertura.py, gravada pela
+# etapa 01 ao lado dos intermediários) guarda a área por município × ano em
+# cada nível da hierarquia de classes (classe_level_0, _1 e _2), já somada
+# sobre biomas e códigos de classe. Roll-ups (ex.: floresta × agropecuária no
+# nível 1) e fatias por município, ano ou classe são filtros sobre as linhas
+# do nível pedido, sem refazer o groupby sobre a tabela long; o cubo fica em
+# memória, separado por nível, enquanto o arquivo não muda.
+#
+# Quando uma nova coleção traz anos novos (ou revisa anos antigos),
+# `atualizar` agrega só as partições (município, ano) novas ou alteradas.
+#
+# Uso:
+#     python cubo_cobertura.py consultar --nivel 1 --largo
+#     python cubo_cobertura.py consultar --nivel 2 --classes "1. Natural" --anos 2020 2023 --total
+#     python cubo_cobertura.py atualizar --regioes "Serra do Penitente" uf:MA
+
+import os
+import argparse
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+import armazenamento
+from extracao_cobertura import NIVEIS, anexar, extrair
+from regioes import SELETOR_AJUDA, caminhos_regiao
+from variaveis import REGIAO, REGIOES_SELECIONADAS, N_JOBS
+
+ESQUEMA = "cubo_cobertura"
+
+
+def caminho_cubo(regiao: str = REGIAO) -> str:
+    """Caminho lógico do cubo da região."""
+    return caminhos_regiao(regiao)[1].cubo_cobertura_csv
+
+
+def _versao(path: str) -> tuple:
+    """Data de modificação dos arquivos físicos (invalida o cubo em memória)."""
+    return tuple(
+        (f, os.stat(armazenamento.caminho(path, f)).st_mtime_ns)
+        for f in armazenamento.FORMATOS
+        if os.path.exists(armazenamento.caminho(path, f))
+    )
+
+
+@lru_cache(maxsize=8)
+def _carregar(path: str, versao: tuple) -> dict[int, pd.DataFrame]:
+    cubo = armazenamento.ler(path, ESQUEMA)
+    return {
+        int(nivel): df[["codigo_ibge", *NIVEIS[:int(nivel) + 1], "ano", "cobertura"]]
+        .reset_index(drop=True)
+        for nivel, df in cubo.groupby("nivel", sort=True)
+    }
+
+
+def carregar_cubo(regiao: str = REGIAO) -> dict[int, pd.DataFrame]:
+    """Cubo da região separado por nível (nivel → DataFrame), em memória."""
+    path = caminho_cubo(regiao)
+    versao = _versao(path)
+    if not versao:
+        raise FileNotFoundError(
+            f"Cubo de cobertura não encontrado para '{regiao}' ({path}). "
+            f"Rode a etapa 01 ou 'python cubo_cobertura.py atualizar'.")
+    return _carregar(path, versao)
+
+
+def consultar(nivel: int = 0,
+              regiao: str = REGIAO,
+              codigos: list[int] | None = None,
+              anos: list[int] | None = None,
+              classes: list[str] | None = None,
+              por_municipio: bool = True,
+              largo: bool = False) -> pd.DataFrame:
+    """
+    Roll-up do cubo no nível `nivel` da hierarquia (0 = natural/antrópico
+    ... 2 = mais detalhado), com área em hectares.
+
+    - `codigos`, `anos`: fatias por município e ano.
+    - `classes`: rótulos de qualquer nível até `nivel`; mantém as classes
+      que descendem de algum deles (ex.: nivel=2, classes=['1. Natural']).
+    - `por_municipio=False`: soma os municípios (total da região por ano).
+    - `largo=True`: uma coluna por classe do nível, indexado por
+      município (se `por_municipio`) e ano.
+    """
+    if nivel not in range(len(NIVEIS)):
+        raise ValueError(f"Nível inválido: {nivel} (use 0 a {len(NIVEIS) - 1})")
+    df = carregar_cubo(regiao)[nivel]
+    niveis = NIVEIS[:nivel + 1]
+
+    mascara = np.ones(len(df), dtype=bool)
+    if codigos is not None:
+        mascara &= df["codigo_ibge"].isin(codigos).to_numpy()
+    if anos is not None:
+        mascara &= df["ano"].isin(anos).to_numpy()
+    if classes is not None:
+        descende = np.zeros(len(df), dtype=bool)
+        for col in niveis:
+            descende |= df[col].isin(classes).to_numpy()
+        mascara &= descende
+    df = df[mascara]
+
+    linhas = ["codigo_ibge", "ano"] if por_municipio else ["ano"]
+    if not por_municipio:
+        df = (df.groupby([*niveis, "ano"], observed=True, dropna=False,
+                         as_index=False)["cobertura"].sum())
+    if largo:
+        df = df.pivot_table(index=linhas, columns=niveis[-1],
+                            values="cobertura", aggfunc="sum",
+                            observed=True, fill_value=0.0)
+        df.columns = df.columns.astype(str)
+        df.columns.name = None
+        return df.reset_index()
+    return (df[[*linhas[:-1], *niveis, "ano", "cobertura"]]
+            .sort_values([*linhas, *niveis], ignore_index=True))
+
+
+def atualizar(seletores: list[str],
+              n_jobs: int = N_JOBS,
+              reconstruir: bool = False) -> dict[str, int]:
+    """
+    Atualiza o cubo de cada região agregando só as partições (município,
+    ano) novas ou alteradas na planilha, como uma nova coleção com anos a
+    mais (modo anexar de extracao_cobertura.py). Com `reconstruir`, refaz o
+    cubo inteiro. Retorna as linhas gravadas por região.
+    """
+    if reconstruir:
+        return extrair(seletores, [ESQUEMA], n_jobs=n_jobs)[ESQUEMA]
+    return anexar(seletores, [ESQUEMA], n_jobs=n_jobs)[ESQUEMA]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Consulta e atualiza o cubo de cobertura por nível de classe."
+    )
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_cons = sub.add_parser("consultar", help="Roll-up ou fatia do cubo")
+    p_cons.add_argument("--regiao", default=REGIAO,
+                        help="Região do cubo. Padrão: %(default)s")
+    p_cons.add_argument("--nivel", type=int, default=0, choices=range(len(NIVEIS)))
+    p_cons.add_argument("--codigos", nargs="+", type=int, default=None)
+    p_cons.add_argument("--anos", nargs="+", type=int, default=None)
+    p_cons.add_argument("--classes", nargs="+", default=None,
+                        help="Rótulos de classe (qualquer nível até --nivel)")
+    p_cons.add_argument("--total", action="store_true",
+                        help="Soma os municípios (total da região)")
+    p_cons.add_argument("--largo", action="store_true",
+                        help="Uma coluna por classe")
+    p_cons.add_argument("--output", default=None, help="CSV opcional")
+
+    p_atu = sub.add_parser("atualizar",
+                           help="Agrega só as partições novas ou alteradas")
+    p_atu.add_argument(
+        "--regioes", "--regiao", nargs="+", default=REGIOES_SELECIONADAS,
+        help=f"Uma ou mais regiões: {SELETOR_AJUDA}. Padrão: %(default)s"
+    )
+    p_atu.add_argument("--reconstruir", action="store_true",
+                       help="Refaz o cubo inteiro")
+    p_atu.add_argument("--jobs", "-j", type=int, default=N_JOBS)
+
+    args = parser.parse_args()
+    if args.comando == "atualizar":
+        atualizar(args.regioes, n_jobs=args.jobs, reconstruir=args.reconstruir)
+        return
+
+    df = consultar(args.nivel, args.regiao, args.codigos, args.anos,
+                   args.classes, por_municipio=not args.total, largo=args.largo)
+    if args.output:
+        df.to_csv(args.output, index=False, encoding="utf-8-sig")
+        print(f"✅ Consulta salva em: {args.output}")
+    else:
+        print(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# benchmark_memoria_cobertura.py
+# Compara a memória das tabelas de cobertura (long da etapa 01 e série de uso
+# da etapa 03) na representação anterior (rótulos como objetos Python, ano
+# como texto, inteiros de 64 bits, melt completo antes de agregar) com a
+# atual (category, int16/int32, extracao_cobertura.py).
+#
+# Mede o tamanho final da tabela (memory_usage(deep=True)), o pico de
+# alocação durante a construção (tracemalloc) e o tempo.
+#
+# Uso (a partir da raiz do repositório):
+#     python diagnosis/benchmark_memoria_cobertura.py              # Brasil
+#     python diagnosis/benchmark_memoria_cobertura.py --regiao uf:MA
+
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from cache_cobertura import carregar_cobertura  # noqa: E402
+from extracao_cobertura import (  # noqa: E402
+    ROTULOS, carregar_largo, cobertura_long, uso_timeseries)
+from regioes import SELETOR_AJUDA, selecionar  # noqa: E402
+
+
+def cobertura_anterior(codigos: list[int]) -> pd.DataFrame:
+    """Tabela long da etapa 01 como era construída antes (rótulos em texto)."""
+    df = carregar_cobertura(
+        codigos=codigos,
+        colunas=["geocode", "class", *ROTULOS],
+    ).astype({c: object for c in ROTULOS})
+    df["geocode"] = df["geocode"].astype(str)
+    anos = [c for c in df.columns if isinstance(c, int)]
+    df_long = df.melt(
+        id_vars=["geocode", "class", *ROTULOS],
+        value_vars=anos, var_name="ano", value_name="cobertura",
+    )
+    df_long["ano"] = df_long["ano"].astype(str)
+    return df_long
+
+
+def uso_anterior(codigos: list[int]) -> pd.DataFrame:
+    """Série da etapa 03 como era construída antes (melt e depois groupby)."""
+    df = carregar_cobertura(
+        codigos=codigos, colunas=["geocode", "municipality", "class"],
+    ).astype({"municipality": object})
+    anos = [c for c in df.columns if isinstance(c, int)]
+    df_long = df.melt(
+        id_vars=["geocode", "municipality", "class"],
+        value_vars=anos, var_name="year", value_name="area_ha",
+    )
+    df_long["year"] = df_long["year"].astype(int)
+    df_long["area_km2"] = df_long["area_ha"] * 0.01
+    return (df_long.groupby(["geocode", "municipality", "year", "class"],
+                            as_index=False)[["area_ha", "area_km2"]].sum())
+
+
+def cobertura_compacta(codigos: list[int]) -> pd.DataFrame:
+    return cobertura_long(carregar_largo(codigos))
+
+
+def uso_compacto(codigos: list[int]) -> pd.DataFrame:
+    return uso_timeseries(carregar_largo(codigos))
+
+
+def medir(funcao, codigos: list[int]) -> dict:
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    df = funcao(codigos)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "linhas": len(df),
+        "tabela_mib": round(df.memory_usage(deep=True).sum() / 2**20, 2),
+        "pico_mib": round(pico / 2**20, 2),
+        "segundos": round(segundos, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Memória das tabelas long de cobertura: anterior × compacta."
+    )
+    parser.add_argument("--regiao", default="brasil",
+                        help=f"Municípios: {SELETOR_AJUDA}. Padrão: %(default)s")
+    args = parser.parse_args()
+
+    codigos = [m.id for m in selecionar(args.regiao)]
+    # aquece o cache Parquet para não medir a conversão da planilha
+    carregar_cobertura(codigos=codigos[:1], colunas=["geocode"])
+
+    casos = [
+        ("01 cobertura long", "anterior", cobertura_anterior),
+        ("01 cobertura long", "compacta", cobertura_compacta),
+        ("03 uso por ano", "anterior", uso_anterior),
+        ("03 uso por ano", "compacta", uso_compacto),
+    ]
+    linhas = []
+    for tabela, versao, funcao in casos:
+        r = medir(funcao, codigos)
+        linhas.append({"tabela": tabela, "versao": versao, **r})
+        print(f"[INFO] {tabela} ({versao}): {r['linhas']} linhas, "
+              f"{r['tabela_mib']} MiB, pico {r['pico_mib']} MiB, {r['segundos']} s")
+
+    df = pd.DataFrame(linhas)
+    print()
+    print(f"Região: {args.regiao} ({len(codigos)} municípios)")
+    print(df.to_string(index=False))
+    for tabela, grupo in df.groupby("tabela"):
+        anterior, compacta = grupo["tabela_mib"].tolist()
+        print(f"✅ {tabela}: {anterior / max(compacta, 1e-9):.1f}× menor")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# benchmark_predicao.py
+# Vazão e latência da predição de preço de carbono (servico_predicao.py)
+# para lotes de 1 a 1.000.000 de linhas.
+#
+# As linhas são sintéticas, sorteadas em torno da média e do desvio do scaler
+# da versão corrente. Mede a predição em processo (todos os modelos e cada
+# modelo isolado) e, para lotes até --max-http linhas, a ida e volta pelo
+# endpoint HTTP local (inclui serialização JSON).
+#
+# Uso (a partir da raiz do repositório, depois da etapa 04):
+#     python diagnosis/benchmark_predicao.py
+#     python diagnosis/benchmark_predicao.py --tamanhos 1 1000 100000 --por-modelo
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+from servico_predicao import Preditor, criar_handler  # noqa: E402
+from variaveis import FEATURE_COLS, REGIAO  # noqa: E402
+
+TAMANHOS = [1, 10, 100, 1_000, 10_000, 100_000, 1_000_000]
+
+
+def lote_sintetico(preditor: Preditor, n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    media, escala = preditor.scaler.mean_, preditor.scaler.scale_
+    X = np.abs(media + escala * rng.standard_normal((n, len(FEATURE_COLS))))
+    df = pd.DataFrame(X, columns=FEATURE_COLS)
+    df.insert(0, 'municipio', 'Sintético')
+    df.insert(1, 'ano', rng.integers(2008, 2024, n))
+    return df
+
+
+def cronometrar(funcao, repeticoes: int) -> float:
+    """Mediana do tempo de `repeticoes` chamadas, em segundos."""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return float(np.median(tempos))
+
+
+def repeticoes_para(n: int) -> int:
+    return max(1, min(50, 100_000 // max(n, 1)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Vazão e latência da predição por tamanho de lote."
+    )
+    parser.add_argument("--regiao", default=REGIAO)
+    parser.add_argument("--tamanhos", nargs="+", type=int, default=TAMANHOS)
+    parser.add_argument("--por-modelo", action="store_true",
+                        help="Mede também cada modelo isolado")
+    parser.add_argument("--max-http", type=int, default=10_000,
+                        help="Maior lote enviado pelo endpoint HTTP")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    preditor = Preditor(regiao=args.regiao)
+    print(f"[INFO] Versão {preditor.versao} carregada em "
+          f"{time.perf_counter() - inicio:.2f} s ({len(preditor.modelos)} modelos)")
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), criar_handler(preditor))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/predict"
+
+    def via_http(df: pd.DataFrame):
+        corpo = json.dumps({"linhas": json.loads(df.to_json(orient="records"))})
+        req = urllib.request.Request(url, data=corpo.encode(), method="POST",
+                                     headers={"Content-Type": "application/json"})
+        with urllib.request.urlopen(req) as r:
+            r.read()
+
+    casos = [('todos', None)]
+    if args.por_modelo:
+        casos += [(nome, [nome]) for nome in preditor.modelos]
+
+    linhas = []
+    for n in args.tamanhos:
+        df = lote_sintetico(preditor, n)
+        rep = repeticoes_para(n)
+        for rotulo, modelos in casos:
+            s = cronometrar(lambda: preditor.prever(df, modelos), rep)
+            linhas.append({'modo': 'processo', 'modelos': rotulo, 'linhas': n,
+                           'latencia_ms': round(s * 1000, 3),
+                           'linhas_por_s': round(n / s)})
+        if n <= args.max_http:
+            s = cronometrar(lambda: via_http(df), rep)
+            linhas.append({'modo': 'http', 'modelos': 'todos', 'linhas': n,
+                           'latencia_ms': round(s * 1000, 3),
+                           'linhas_por_s': round(n / s)})
+        print(f"[INFO] lote de {n} linhas medido ({rep} repetição(ões))")
+    server.shutdown()
+
+    print()
+    print(pd.DataFrame(linhas).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmark_regioes.py
+# Mede tempo de parede e pico de memória (RSS) das etapas 00, 01, 03 e 04
+# para seleções de 3, 500 e 5.570 municípios.
+#
+# Cada etapa roda como subprocesso com --regiao/PIPELINE_REGIAO; o RSS é o
+# máximo do processo e dos seus filhos (pool por UF), obtido por wait4.
+# ATENÇÃO: as etapas gravam nas saídas normais de data/partial e
+# data/generated; rode o pipeline de novo com a região padrão depois.
+#
+# Uso (a partir da raiz do repositório):
+#     python diagnosis/benchmark_regioes.py
+#     python diagnosis/benchmark_regioes.py --tamanhos 3 500 --etapas 01 03
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from variaveis import REGIAO  # noqa: E402
+
+ETAPAS = {
+    "00": "00_extrair_pib_municipal.py",
+    "01": "01_extrair_cobertura_municipal.py",
+    "03": "03_extrair_uso_terra_timeseries.py",
+    "04": "04_consolidar_dados_carbono.py",
+}
+
+
+def seletor(tamanho: int) -> str:
+    """3 = região de estudo; 5570 = Brasil; demais = primeiros N códigos."""
+    if tamanho == 3:
+        return REGIAO
+    if tamanho >= 5570:
+        return "brasil"
+    return f"amostra:{tamanho}"
+
+
+def medir(script: str, regiao: str) -> tuple[float, float, int]:
+    """Executa a etapa e retorna (segundos, pico de RSS em MiB, código de saída)."""
+    env = dict(os.environ, PIPELINE_REGIAO=regiao)
+    inicio = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, script], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, uso = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - inicio
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    if proc.returncode != 0:
+        print(proc.stderr.read().decode(errors="replace"), file=sys.stderr)
+    proc.stderr.close()
+    # ru_maxrss em KiB no Linux
+    return elapsed, uso.ru_maxrss / 1024, proc.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark de escala das etapas por número de municípios."
+    )
+    parser.add_argument("--tamanhos", nargs="+", type=int, default=[3, 500, 5570])
+    parser.add_argument("--etapas", nargs="+", default=list(ETAPAS),
+                        choices=list(ETAPAS))
+    parser.add_argument("--output", default=None,
+                        help="CSV opcional com os resultados")
+    args = parser.parse_args()
+
+    linhas = []
+    for tamanho in args.tamanhos:
+        regiao = seletor(tamanho)
+        for etapa in args.etapas:
+            segundos, rss, codigo = medir(ETAPAS[etapa], regiao)
+            linhas.append({"municipios": tamanho, "regiao": regiao,
+                           "etapa": etapa, "segundos": round(segundos, 2),
+                           "pico_rss_mib": round(rss, 1), "ok": codigo == 0})
+            print(f"[INFO] {tamanho:>5} municípios | etapa {etapa} | "
+                  f"{segundos:8.2f} s | {rss:8.1f} MiB"
+                  + ("" if codigo == 0 else f" | FALHOU ({codigo})"))
+
+    df = pd.DataFrame(linhas)
+    print()
+    print(df.pivot_table(index="etapa", columns="municipios",
+                         values=["segundos", "pico_rss_mib"]).to_string())
+    if args.output:
+        df.to_csv(args.output, index=False)
+        print(f"✅ Resultados salvos em: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,64 +1,44 @@
 # get_municipality_ids.py
+# IDs de território da API de alertas para municípios pelo nome, via índice
+# local de territórios (territorios.py): o catálogo só é baixado quando o
+# índice vence o TTL.
+#
+# Uso (a partir da raiz do repositório):
+#     python diagnosis/get_municipality_ids.py
+#     python diagnosis/get_municipality_ids.py --nomes Balsas "Alto Parnaíba" --uf MA
 
 import os
+import sys
 import json
-from unidecode import unidecode
-from map_biomas_api import MapBiomasAlertApi
+import argparse
 
-def get_token():
-    creds = {
-        "email":    os.getenv("MAPBIOMAS_EMAIL"),
-        "password": os.getenv("MAPBIOMAS_PASSWORD")
-    }
-    return MapBiomasAlertApi.token(creds)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
 
-def fetch_territory_options(token):
-    q = """
-    query {
-      territoryOptions {
-        categoryName
-        territories {
-          code
-          name
-        }
-      }
-    }
-    """
-    return MapBiomasAlertApi.query(token, q, {})["data"]["territoryOptions"]
+import territorios  # noqa: E402
+from cliente_api import ClienteAPI  # noqa: E402
+from variaveis import API_ALERTAS, MUNICIPIOS  # noqa: E402
 
-def normalize(s: str) -> str:
-    """Remove acentos e coloca em caixa alta."""
-    return unidecode(s).strip().upper()
-
-def extract_target_ids(options, targets):
-    # 1) Filtra pela categoria "Município", normalizada
-    munis_opts = [
-        opt for opt in options
-        if normalize(opt["categoryName"]) == "MUNICIPIO"
-    ]
-    # 2) Achata todas as listas de TerritoryOption
-    all_munis = [t for opt in munis_opts for t in opt["territories"]]
-    # 3) Mapeia NOME_NORMALIZADO → code
-    mapping = { normalize(t["name"]): t["code"] for t in all_munis }
-    # 4) Para cada alvo, tenta correspondência exata na versão normalizada
-    result = {}
-    for tgt in targets:
-        key = normalize(tgt)
-        result[tgt] = mapping.get(key)
-    return result
 
 if __name__ == "__main__":
-    # 1) Autentica
-    token = get_token()
-
-    # 2) Busca opções de território
-    opts = fetch_territory_options(token)
-
-    # 3) Seus municípios de interesse
-    alvos = ["Balsas", "Tasso Fragoso", "Alto Parnaíba"]
-
-    # 4) Extrai os códigos
-    ids = extract_target_ids(opts, alvos)
-
-    # 5) Exibe o resultado
+    parser = argparse.ArgumentParser(
+        description="IDs de território dos municípios, pelo nome.")
+    parser.add_argument("--nomes", nargs="+",
+                        default=[m.nome for m in MUNICIPIOS])
+    parser.add_argument("--uf", default=None)
+    parser.add_argument("--server", "-u", default=API_ALERTAS.url)
+    parser.add_argument("--atualizar", action="store_true",
+                        help="Baixa o catálogo mesmo dentro do TTL")
+    args = parser.parse_args()
+
+    # 1) Índice local (baixa o catálogo só se vencido)
+    con = territorios.garantir_indice(ClienteAPI(args.server),
+                                      forcar=args.atualizar)
+
+    # 2) Nome normalizado → ID de território
+    ids = territorios.territorios_por_nome(con, args.nomes, args.uf)
+    con.close()
+
+    # 3) Exibe o resultado
     print(json.dumps(ids, indent=2, ensure_ascii=False))
@@ -0,0 +1,126 @@
+# servidor_api_local.py
+# Substituto local da API de alertas (localhost:8000) para testar a etapa 02
+# sem credenciais nem rede. Gera alertas sintéticos determinísticos.
+#
+# Uso:
+#   python diagnosis/servidor_api_local.py --port 8000 --alerts 5000
+#   MAPBIOMAS_EMAIL=x MAPBIOMAS_PASSWORD=y python 02_extrair_alertas_desmatamento.py
+
+import json
+import random
+import argparse
+from datetime import date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# territoryId → (nome, código IBGE)
+TERRITORIOS = {
+    19606: ("Alto Parnaíba", 2100501),
+    17294: ("Balsas", 2101400),
+    17994: ("Tasso Fragoso", 2112001),
+}
+TOKEN = "token-local"
+
+
+def gerar_alertas(n: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    inicio = date(2019, 1, 1)
+    alertas = []
+    for i in range(n):
+        tid = rng.choice(list(TERRITORIOS))
+        nome, geocode = TERRITORIOS[tid]
+        detectado = inicio + timedelta(days=rng.randrange(0, 6 * 365))
+        alertas.append({
+            "alertCode": 100000 + i,
+            "detectedAt": detectado.isoformat(),
+            "publishedAt": (detectado + timedelta(days=30)).isoformat(),
+            "areaHa": round(rng.uniform(0.5, 300.0), 4),
+            "territoryId": tid,
+            "crossedCitiesList": [
+                {"source": "Município", "name": nome, "code": geocode},
+                {"source": "Estado", "name": "Maranhão", "code": 21},
+            ],
+        })
+    return alertas
+
+
+def criar_handler(alertas: list[dict], falhas: int = 0, status_falha: int = 503):
+    estado = {"falhas": falhas}
+
+    class Handler(BaseHTTPRequestHandler):
+        def _json(self, status: int, payload, headers: dict | None = None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+        def _autorizado(self) -> bool:
+            return self.headers.get("Authorization") == f"Bearer {TOKEN}"
+
+        def do_POST(self):
+            if urlparse(self.path).path == "/token":
+                self._json(200, {"token": TOKEN, "expiresIn": 3600})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if not self._autorizado():
+                self._json(401, {"error": "unauthorized"})
+                return
+            if estado["falhas"] > 0:
+                estado["falhas"] -= 1
+                self._json(status_falha, {"error": "unavailable"},
+                           {"Retry-After": "1"} if status_falha == 429 else None)
+                return
+            if url.path == "/alerts/all":
+                ini = q.get("startDate", "0000-00-00")
+                fim = q.get("endDate", "9999-99-99")
+                tids = {int(t) for t in q.get("territoryIds", "").split(",") if t}
+                sel = [a for a in alertas
+                       if ini <= a["detectedAt"] <= fim
+                       and (not tids or a["territoryId"] in tids)]
+                self._json(200, {"collection": sel})
+            elif url.path == "/territories/options":
+                self._json(200, [{
+                    "categoryName": "Município",
+                    "territories": [
+                        {"code": tid, "name": nome}
+                        for tid, (nome, _) in TERRITORIOS.items()
+                    ],
+                }])
+            else:
+                self._json(404, {"error": "not found"})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API de alertas local (stand-in)")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--alerts", type=int, default=5000)
+    parser.add_argument("--fail-first", type=int, default=0,
+                        help="Responde --fail-status às N primeiras consultas")
+    parser.add_argument("--fail-status", type=int, default=503,
+                        help="Status das falhas (429 vem com Retry-After)")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(
+        ("127.0.0.1", args.port),
+        criar_handler(gerar_alertas(args.alerts), args.fail_first,
+                      args.fail_status),
+    )
+    print(f"API local em http://127.0.0.1:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# testar_cliente_api.py
+# Verifica o cliente da API de alertas (cliente_api.py) contra a API local
+# (servidor_api_local.py), servida numa thread em porta livre:
+#
+# - o token é pedido uma vez e reaproveitado do disco por um cliente novo;
+# - um token recusado (401) é renovado;
+# - 503 e 429 (com Retry-After) são repetidos até a resposta válida;
+# - o limite de requisições por segundo é respeitado.
+#
+# Uso (a partir da raiz do repositório):
+#     python diagnosis/testar_cliente_api.py
+
+import os
+import sys
+import stat
+import time
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "diagnosis"))
+
+from cliente_api import CacheToken, ClienteAPI  # noqa: E402
+from servidor_api_local import criar_handler, gerar_alertas  # noqa: E402
+
+
+def servir(falhas: int = 0, status_falha: int = 503):
+    """API local numa thread; devolve (url, contador de /token, server)."""
+    base = criar_handler(gerar_alertas(200), falhas, status_falha)
+    contagem = {"token": 0}
+
+    class Handler(base):
+        def do_POST(self):
+            contagem["token"] += 1
+            super().do_POST()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}", contagem, server
+
+
+def verificar(condicao: bool, descricao: str):
+    print(f"{'✅' if condicao else '❌'} {descricao}")
+    if not condicao:
+        sys.exit(1)
+
+
+def main():
+    os.environ.setdefault("MAPBIOMAS_EMAIL", "teste@local")
+    os.environ.setdefault("MAPBIOMAS_PASSWORD", "teste")
+    tmp = tempfile.mkdtemp()
+    cache = CacheToken(os.path.join(tmp, "token_api.json"))
+
+    # 1) Token em disco
+    url, contagem, server = servir()
+    alertas = ClienteAPI(url, cache_token=cache, backoff=0.05).alertas(
+        "2019-01-01", "2025-12-31", [])
+    verificar(len(alertas) == 200 and contagem["token"] == 1,
+              "primeiro cliente pede um token e baixa os alertas")
+    modo = stat.S_IMODE(os.stat(cache.path).st_mode)
+    verificar(modo == 0o600, f"cache de token gravado com permissão {oct(modo)}")
+    ClienteAPI(url, cache_token=cache).opcoes_territorios()
+    verificar(contagem["token"] == 1, "cliente novo reaproveita o token do disco")
+
+    # 2) Token recusado
+    chave = CacheToken.chave(url, os.environ["MAPBIOMAS_EMAIL"])
+    cache.gravar(chave, "token-vencido", time.time() + 3600)
+    ClienteAPI(url, cache_token=cache).opcoes_territorios()
+    verificar(contagem["token"] == 2 and cache.ler(chave) == "token-local",
+              "401 com token em cache renova o token")
+    server.shutdown()
+
+    # 3) Backoff em 503
+    url, _, server = servir(falhas=3)
+    cliente = ClienteAPI(url, cache_token=cache, backoff=0.05)
+    alertas = cliente.alertas("2019-01-01", "2025-12-31", [])
+    verificar(len(alertas) == 200 and cliente.novas_tentativas == 3,
+              "três 503 seguidos são repetidos com backoff")
+    server.shutdown()
+
+    # 4) 429 com Retry-After
+    url, _, server = servir(falhas=1, status_falha=429)
+    cliente = ClienteAPI(url, cache_token=cache, backoff=0.05)
+    inicio = time.perf_counter()
+    cliente.opcoes_territorios()
+    espera = time.perf_counter() - inicio
+    verificar(cliente.novas_tentativas == 1 and espera >= 1.0,
+              f"429 respeita o Retry-After ({espera:.2f} s)")
+    server.shutdown()
+
+    # 5) Limite de taxa, com requisições de várias threads
+    url, _, server = servir()
+    cliente = ClienteAPI(url, conexoes=4, req_por_segundo=20, cache_token=cache)
+    cliente.token()
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=cliente.opcoes_territorios) for _ in range(21)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+    verificar(duracao >= 0.95,
+              f"21 requisições a 20 req/s levam {duracao:.2f} s (>= 1 s)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+# extracao_cobertura.py
+# Extração única da planilha de cobertura MapBiomas (COVERAGE_9), comum às
+# etapas 01 e 03.
+#
+# A planilha (via cache Parquet) é lida uma vez por UF, com tipos compactos,
+# e cada saída do pipeline é uma projeção dessa mesma tabela larga em
+# memória: a tabela long de cobertura (etapa 01), a série de uso da terra
+# (etapa 03) e o cubo de agregados por nível de classe (consultas em
+# cubo_cobertura.py). Novas saídas entram em PROJECOES.
+#
+# Modo anexar (--anexar): para uma nova coleção (ou versão) da planilha, só
+# as partições (codigo_ibge, ano) novas ou alteradas são processadas. Cada
+# partição tem uma impressão digital das suas células (classe, bioma e área);
+# a tabela long já gravada contém as mesmas células, de modo que as
+# impressões da fonte e do que já foi extraído são comparadas sem arquivos
+# extras. Partições com impressão diferente são refeitas; as demais são
+# mantidas como estão.
+
+import argparse
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+import armazenamento
+from cache_cobertura import carregar_cobertura
+from formato_longo import agregar_longo, colunas_ano, para_longo
+from regioes import (
+    SELETOR_AJUDA, caminhos_regiao, processar_por_uf, selecionar_regioes,
+    uf_do_codigo)
+from variaveis import INPUT_PATHS, REGIOES_SELECIONADAS, N_JOBS
+
+FONTE = INPUT_PATHS.mapbiomas
+
+# Colunas da planilha → nomes do pipeline. Rótulos repetidos em todas as
+# linhas de ano são lidos como category.
+COLUNAS = {
+    "geocode": "codigo_ibge",
+    "municipality": "municipio",
+    "state": "uf",
+    "biome": "bioma",
+    "class": "classe_codigo",
+    "class_level_0": "classe_level_0",
+    "class_level_1": "classe_level_1",
+    "class_level_2": "classe_level_2",
+}
+ROTULOS = ["municipality", "state", "biome",
+           "class_level_0", "class_level_1", "class_level_2"]
+# Hierarquia de classes, da mais geral para a mais detalhada
+NIVEIS = ["classe_level_0", "classe_level_1", "classe_level_2"]
+
+
+def carregar_largo(codigos: list[int]) -> pd.DataFrame:
+    """
+    Tabela larga de cobertura dos municípios `codigos` (uma coluna por ano),
+    com nomes do pipeline e tipos compactos: código IBGE int32, classe
+    Int16, rótulos category. Mantém a ordem do cache.
+    """
+    df = carregar_cobertura(
+        FONTE,
+        codigos=codigos,
+        colunas=list(COLUNAS),
+        categoricas=ROTULOS,
+    )
+    df["geocode"] = df["geocode"].astype("int32")
+    df["class"] = df["class"].astype("Int16")
+    df = df.rename(columns=COLUNAS)
+    return df[df["codigo_ibge"].isin(codigos)]
+
+
+def cobertura_long(df: pd.DataFrame) -> pd.DataFrame:
+    """Etapa 01: uma linha por município × bioma × classe × ano."""
+    id_vars = list(COLUNAS.values())
+    df = df.sort_values(["codigo_ibge", "bioma", "classe_codigo"],
+                        kind="stable")
+    return para_longo(df, id_vars, var_name="ano", value_name="cobertura")
+
+
+def uso_timeseries(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Etapa 03: área por município, uso (classe) e ano, somada sobre os
+    biomas, em hectares e km².
+    """
+    serie = agregar_longo(
+        df.rename(columns={"classe_codigo": "uso"}),
+        ["codigo_ibge", "municipio", "uso"], var_name="year",
+        # 1 hectare = 0.01 km²
+        valores={"area_ha": 1.0, "area_km2": 0.01},
+    )
+    return serie.sort_values(["codigo_ibge", "municipio", "year", "uso"],
+                             kind="stable", ignore_index=True)
+
+
+ORDEM_CUBO = ["codigo_ibge", "nivel", *NIVEIS, "ano"]
+
+
+def construir_cubo(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cubo de cobertura: área por município × ano em cada nível da hierarquia
+    de classes (`nivel` 0, 1 e 2), somada sobre biomas e códigos de classe.
+    As colunas de níveis mais detalhados que `nivel` ficam vazias; rótulos
+    ausentes na planilha formam o seu próprio grupo.
+    """
+    partes = []
+    for nivel in range(len(NIVEIS)):
+        chaves = ["codigo_ibge", *NIVEIS[:nivel + 1]]
+        parte = agregar_longo(df, chaves, var_name="ano",
+                              valores={"cobertura": 1.0}, dropna=False)
+        for col in NIVEIS[nivel + 1:]:
+            parte[col] = pd.Series(pd.NA, index=parte.index, dtype=df[col].dtype)
+        parte.insert(0, "nivel", nivel)
+        partes.append(parte)
+    return (pd.concat(partes, ignore_index=True)
+            .sort_values(ORDEM_CUBO, kind="stable", ignore_index=True))
+
+
+@dataclass(frozen=True)
+class Projecao:
+    funcao: Callable[[pd.DataFrame], pd.DataFrame]
+    saida: str  # atributo de OUTPUT_PATHS com o caminho lógico
+    descricao: str
+    ordem: list[str]  # ordem das linhas gravadas (refeita no modo anexar)
+    coluna_ano: str = "ano"
+
+
+# Nome do esquema (armazenamento.ESQUEMAS) → projeção
+PROJECOES = {
+    "cobertura_long": Projecao(cobertura_long, "mapbiomas_long_csv",
+                               "Tabela long de cobertura MapBiomas",
+                               ["codigo_ibge", "bioma", "classe_codigo", "ano"]),
+    "uso_timeseries": Projecao(uso_timeseries, "uso_timeseries_csv",
+                               "Série de uso da terra",
+                               ["codigo_ibge", "municipio", "year", "uso"],
+                               coluna_ano="year"),
+    "cubo_cobertura": Projecao(construir_cubo, "cubo_cobertura_csv",
+                               "Cubo de cobertura por nível de classe",
+                               ORDEM_CUBO),
+}
+
+
+def _misturar(x: np.ndarray) -> np.ndarray:
+    """splitmix64: espalha os bits de cada uint64 (aritmética módulo 2**64)."""
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _celulas(df: pd.DataFrame, valores: np.ndarray) -> np.ndarray:
+    """
+    Impressão de cada célula: identidade da linha (bioma, classe) combinada
+    com os bits da área. `valores` tem uma linha por linha de `df` (uma
+    coluna por ano, na tabela larga).
+    """
+    linha = pd.util.hash_pandas_object(df[["bioma", "classe_codigo"]],
+                                       index=False).to_numpy()
+    v = np.asarray(valores, dtype="float64")
+    # NaN canônico e -0.0 → 0.0, para que a impressão só dependa do valor
+    v = np.where(np.isnan(v), np.nan, v) + 0.0
+    if v.ndim == 2:
+        linha = linha[:, None]
+    return _misturar(linha ^ _misturar(v.view(np.uint64)))
+
+
+def impressoes_largo(df: pd.DataFrame) -> pd.Series:
+    """Impressão digital (uint64) de cada partição (codigo_ibge, ano) da fonte."""
+    anos = colunas_ano(df)
+    celulas = _celulas(df, df[anos].to_numpy(dtype="float64"))
+    posicao, codigos = pd.factorize(df["codigo_ibge"].to_numpy(dtype="int64"))
+    soma = np.zeros((len(codigos), len(anos)), dtype=np.uint64)
+    np.add.at(soma, posicao, celulas)
+    indice = pd.MultiIndex.from_product([codigos, anos],
+                                        names=["codigo_ibge", "ano"])
+    return pd.Series(soma.ravel(), index=indice)
+
+
+def impressoes_longo(df: pd.DataFrame) -> pd.Series:
+    """As mesmas impressões, calculadas a partir da tabela long já gravada."""
+    celulas = _celulas(df, df["cobertura"].to_numpy(dtype="float64"))
+    posicao, indice = pd.factorize(armazenamento.particoes(df))
+    soma = np.zeros(len(indice), dtype=np.uint64)
+    np.add.at(soma, posicao, celulas)
+    return pd.Series(soma, index=indice)
+
+
+def extrair_particao(codigos: list[int],
+                     projecoes: tuple[str, ...] = tuple(PROJECOES)
+                     ) -> dict[str, pd.DataFrame]:
+    """Lê a UF uma vez e devolve cada projeção pedida."""
+    df = carregar_largo(codigos)
+    return {nome: PROJECOES[nome].funcao(df) for nome in projecoes}
+
+
+def anexar_particao(codigos: list[int],
+                    projecoes: tuple[str, ...],
+                    existentes: dict[str, str],
+                    referencia: str) -> dict[str, pd.DataFrame]:
+    """
+    Modo anexar para uma UF: compara as impressões das partições da fonte
+    com as da tabela long já gravada (`referencia`) e devolve, para cada
+    projeção, o intermediário atual (`existentes[projecao]`) com as
+    partições novas ou alteradas refeitas. Só as linhas largas e colunas de
+    ano dessas partições passam pelas projeções. Partições que não estão
+    mais na fonte (municípios fora da seleção) são removidas.
+    """
+    largo = carregar_largo(codigos)
+    fonte = impressoes_largo(largo)
+    if armazenamento.existe(referencia):
+        extraido = impressoes_longo(armazenamento.ler(
+            referencia, "cobertura_long",
+            ["codigo_ibge", "bioma", "classe_codigo", "ano", "cobertura"],
+            codigos=codigos))
+        verificadas = fonte.index.intersection(extraido.index)
+        alteradas = verificadas[fonte[verificadas].to_numpy()
+                                != extraido[verificadas].to_numpy()]
+    else:
+        verificadas = alteradas = fonte.index[:0]
+
+    uf = uf_do_codigo(codigos[0])
+    ids = [c for c in largo.columns if c not in set(colunas_ano(largo))]
+    saida = {}
+    for nome in projecoes:
+        proj = PROJECOES[nome]
+        if armazenamento.existe(existentes[nome]):
+            atual = armazenamento.ler(existentes[nome], nome, codigos=codigos)
+        else:
+            atual = armazenamento.vazio(nome)
+        presentes = armazenamento.particoes(atual, proj.coluna_ano).unique()
+        novas = fonte.index.difference(presentes)
+        na_fonte = presentes.intersection(fonte.index)
+        # presentes sem impressão conferida na referência também são refeitas
+        refazer = na_fonte.difference(verificadas).union(
+            alteradas.intersection(presentes))
+        afetadas = novas.union(refazer)
+
+        manter = armazenamento.particoes(atual, proj.coluna_ano).isin(
+            na_fonte.difference(refazer))
+        partes = [atual[manter]]
+        if len(afetadas):
+            anos = sorted(afetadas.get_level_values(1).unique())
+            linhas = largo["codigo_ibge"].isin(afetadas.get_level_values(0))
+            novos = proj.funcao(largo.loc[linhas, [*ids, *anos]])
+            partes.append(novos[armazenamento.particoes(novos, proj.coluna_ano)
+                                .isin(afetadas)])
+        saida[nome] = (pd.concat(partes, ignore_index=True)
+                       .sort_values(proj.ordem, kind="stable", ignore_index=True))
+        print(f"[INFO] {uf} | {nome}: {len(novas)} partições novas, "
+              f"{len(refazer)} refeitas, {len(na_fonte) - len(refazer)} "
+              f"mantidas, {len(presentes) - len(na_fonte)} removidas")
+    return saida
+
+
+def _validar(projecoes: list[str] | None) -> tuple[str, ...]:
+    projecoes = tuple(dict.fromkeys(projecoes or PROJECOES))
+    desconhecidas = set(projecoes) - set(PROJECOES)
+    if desconhecidas:
+        raise ValueError(f"Projeções desconhecidas: {sorted(desconhecidas)} "
+                         f"(use {list(PROJECOES)})")
+    return projecoes
+
+
+def _relatar(regioes: dict[str, list[int]],
+             projecoes: tuple[str, ...],
+             destinos: dict[str, dict[str, str]],
+             linhas: dict[str, dict[str, int]]):
+    for regiao, codigos in regioes.items():
+        print(f"[INFO] {regiao}: {len(codigos)} municípios")
+        for nome in projecoes:
+            print(f"✅ {PROJECOES[nome].descricao}: {linhas[nome][regiao]} "
+                  f"linhas em {armazenamento.caminho(destinos[nome][regiao])}")
+
+
+def anexar(seletores: list[str],
+           projecoes: list[str] | None = None,
+           n_jobs: int = N_JOBS) -> dict[str, dict[str, int]]:
+    """
+    Atualiza os intermediários de cada região processando só as partições
+    (codigo_ibge, ano) novas ou alteradas na planilha (ver anexar_particao).
+    Cada região é atualizada contra os seus próprios intermediários.
+    Retorna as linhas gravadas por projeção e região.
+    """
+    projecoes = _validar(projecoes)
+    regioes = selecionar_regioes(seletores, FONTE)
+    linhas = {nome: {} for nome in projecoes}
+    destinos = {nome: {} for nome in projecoes}
+    for regiao, codigos in regioes.items():
+        saidas = caminhos_regiao(regiao)[1]
+        for nome in projecoes:
+            destinos[nome][regiao] = getattr(saidas, PROJECOES[nome].saida)
+        funcao = partial(
+            anexar_particao, projecoes=projecoes,
+            existentes={nome: destinos[nome][regiao] for nome in projecoes},
+            referencia=saidas.mapbiomas_long_csv)
+        gravadas = processar_por_uf(
+            funcao, {regiao: codigos},
+            {nome: {regiao: destinos[nome][regiao]} for nome in projecoes},
+            n_jobs=n_jobs)
+        for nome in projecoes:
+            linhas[nome][regiao] = gravadas[nome][regiao]
+    _relatar(regioes, projecoes, destinos, linhas)
+    return linhas
+
+
+def extrair(seletores: list[str],
+            projecoes: list[str] | None = None,
+            n_jobs: int = N_JOBS) -> dict[str, dict[str, int]]:
+    """
+    Extrai as projeções (todas, por padrão) para cada região e grava os
+    intermediários. Retorna as linhas gravadas por projeção e região.
+    """
+    projecoes = _validar(projecoes)
+
+    # Códigos IBGE dos municípios de cada região
+    regioes = selecionar_regioes(seletores, FONTE)
+    saidas = {r: caminhos_regiao(r)[1] for r in regioes}
+    destinos = {
+        nome: {r: getattr(saidas[r], PROJECOES[nome].saida) for r in regioes}
+        for nome in projecoes
+    }
+    linhas = processar_por_uf(partial(extrair_particao, projecoes=projecoes),
+                              regioes, destinos, n_jobs=n_jobs)
+    _relatar(regioes, projecoes, destinos, linhas)
+    return linhas
+
+
+def main(projecoes: list[str] | None = None,
+         descricao: str = "Extrai a cobertura MapBiomas por município."):
+    """CLI comum às etapas 01 e 03; `projecoes` é o padrão de --saidas."""
+    parser = argparse.ArgumentParser(description=descricao)
+    parser.add_argument(
+        "--regioes", "--regiao", nargs="+", default=REGIOES_SELECIONADAS,
+        help=f"Uma ou mais regiões: {SELETOR_AJUDA}. Padrão: %(default)s"
+    )
+    parser.add_argument(
+        "--saidas", nargs="+", choices=list(PROJECOES),
+        default=projecoes or list(PROJECOES),
+        help="Projeções gravadas na mesma leitura. Padrão: %(default)s"
+    )
+    parser.add_argument(
+        "--anexar", action="store_true",
+        help="Processa só as partições (município, ano) novas ou alteradas "
+             "desde a última extração"
+    )
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=N_JOBS,
+        help="Processos (um por UF; -1 = todos os núcleos). Padrão: %(default)s"
+    )
+    args = parser.parse_args()
+    if args.anexar:
+        anexar(args.regioes, args.saidas, n_jobs=args.jobs)
+    else:
+        extrair(args.regioes, args.saidas, n_jobs=args.jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# fontes_pib.py
+# Registro das publicações do PIB dos Municípios (IBGE) e carregador da etapa 00
+#
+# Cada publicação é descrita por uma FontePib: arquivo, motor de leitura,
+# faixa de anos e, se preciso, o cabeçalho exato de alguma coluna (as demais
+# são detectadas por trechos do cabeçalho, como nas planilhas do IBGE). As
+# planilhas são lidas em streaming (leitor_xlsx.py), extraindo só as colunas
+# mapeadas, em processos paralelos, e cada uma é guardada em Parquet
+# (data/cache/pib/), invalidado pela impressão digital do arquivo:
+# acrescentar uma publicação não reprocessa as demais. Anos publicados em
+# mais de uma fonte ficam com o valor da mais recente (a última do registro).
+
+import os
+import re
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from cache_arquivos import fonte_inalterada, impressao_digital, ler_meta, salvar_meta
+from leitor_xlsx import ler_filtrado
+from variaveis import CACHE_PATHS, INPUT_PATHS, N_JOBS, PIB_EXTRAS
+
+VERSAO_CACHE = 2
+
+
+def _contem(*trechos: str):
+    return lambda c: all(t in c for t in trechos)
+
+
+# Detecção das colunas pelos cabeçalhos do IBGE: a primeira coluna que casa
+# a regra é usada, então mudanças de redação, quebras de linha ou unidade
+# numa nova publicação não exigem configuração
+REGRAS_IBGE = {
+    "codigo_ibge": _contem("Código", "Município"),
+    "municipio": _contem("Nome", "Município"),
+    "ano": lambda c: c.strip().lower() == "ano",
+    "pib": _contem("Produto Interno Bruto"),
+}
+
+
+@dataclass(frozen=True)
+class FontePib:
+    arquivo: str
+    motor: str  # 'xlrd' (XLS) ou 'openpyxl' (XLSX)
+    anos: tuple[int, int] | None = None  # faixa publicada; None = qualquer
+    # cabeçalho exato de colunas que a detecção não acerta (sem diferenças
+    # de espaços e quebras de linha); as demais seguem REGRAS_IBGE
+    colunas: dict[str, str] = field(default_factory=dict)
+    sheet_name: str | None = None  # None = primeira aba
+
+
+def motor_do_arquivo(arquivo: str) -> str:
+    return "xlrd" if arquivo.lower().endswith(".xls") else "openpyxl"
+
+
+# Publicações em ordem; as extras (PIPELINE_PIB_EXTRAS) entram por último
+FONTES_PIB = [
+    FontePib(INPUT_PATHS.pib_2002_2009, "xlrd", (2002, 2009)),
+    FontePib(INPUT_PATHS.pib_2010_2021, "openpyxl", (2010, 2021)),
+    *(FontePib(p, motor_do_arquivo(p)) for p in PIB_EXTRAS),
+]
+
+
+def fonte_extra(arquivo: str) -> FontePib:
+    """Publicação avulsa no layout das planilhas do IBGE."""
+    return FontePib(arquivo, motor_do_arquivo(arquivo))
+
+
+def registro(input_old: str | None = None,
+             input_new: str | None = None,
+             extras: list[str] | None = None) -> list[FontePib]:
+    """FONTES_PIB com os arquivos-base e as extras trocados, se informados."""
+    base, novo, *registradas = FONTES_PIB
+    if input_old:
+        base = replace(base, arquivo=input_old)
+    if input_new:
+        novo = replace(novo, arquivo=input_new)
+    if extras is not None:
+        registradas = [fonte_extra(p) for p in extras]
+    return [base, novo, *registradas]
+
+
+def _mesmo_cabecalho(esperado: str):
+    alvo = " ".join(esperado.split())
+    return lambda c: " ".join(c.split()) == alvo
+
+
+def _caminho_cache(fonte: FontePib) -> tuple[str, str]:
+    nome = re.sub(r"[^0-9A-Za-z]+", "_",
+                  os.path.splitext(os.path.basename(fonte.arquivo))[0]).strip("_")
+    raiz = os.path.join(CACHE_PATHS.pib_dir, nome)
+    return f"{raiz}.parquet", f"{raiz}.meta.json"
+
+
+def _config(fonte: FontePib) -> dict:
+    # anos como lista: é assim que a faixa volta do .meta.json
+    return {"motor": fonte.motor, "anos": list(fonte.anos) if fonte.anos else None,
+            "colunas": fonte.colunas, "sheet": fonte.sheet_name}
+
+
+def _em_cache(fonte: FontePib) -> bool:
+    destino, meta_path = _caminho_cache(fonte)
+    meta = ler_meta(meta_path)
+    return (
+        os.path.exists(destino)
+        and meta is not None
+        and meta.get("versao") == VERSAO_CACHE
+        and meta.get("caminho") == os.path.abspath(fonte.arquivo)
+        and meta.get("config") == _config(fonte)
+        and fonte_inalterada(fonte.arquivo, meta, meta_path)
+    )
+
+
+def ler_fonte(fonte: FontePib) -> pd.DataFrame:
+    """
+    Lê a publicação inteira (todas as linhas, só as colunas mapeadas) e
+    devolve ['codigo_ibge','municipio','ano','pib'] tipados. Linhas fora da
+    faixa de anos da fonte são descartadas.
+    """
+    regras = {saida: _mesmo_cabecalho(fonte.colunas[saida])
+              if saida in fonte.colunas else regra
+              for saida, regra in REGRAS_IBGE.items()}
+    df = ler_filtrado(fonte.arquivo, regras, "codigo_ibge",
+                      sheet_name=fonte.sheet_name, motor=fonte.motor)
+    df = df[["codigo_ibge", "municipio", "ano", "pib"]]
+    df = df.assign(
+        codigo_ibge=pd.to_numeric(df["codigo_ibge"], errors="coerce").astype("Int64"),
+        municipio=df["municipio"].astype("string"),
+        ano=pd.to_numeric(df["ano"], errors="coerce").astype("Int64"),
+        pib=pd.to_numeric(df["pib"], errors="coerce").astype("float64"),
+    ).dropna(subset=["codigo_ibge", "ano"])
+    if fonte.anos is not None:
+        dentro = df["ano"].between(*fonte.anos)
+        if not dentro.all():
+            print(f"[AVISO] {fonte.arquivo}: {int((~dentro).sum())} linhas fora "
+                  f"de {fonte.anos[0]}–{fonte.anos[1]} descartadas")
+        df = df[dentro]
+    return df.astype({"codigo_ibge": "int64", "ano": "int64"}).reset_index(drop=True)
+
+
+def _gravar_cache(fonte: FontePib) -> str:
+    """Lê a publicação e grava o seu cache (executado nos processos)."""
+    destino, meta_path = _caminho_cache(fonte)
+    print(f"[INFO] Lendo PIB de {fonte.arquivo} ({fonte.motor})...")
+    df = ler_fonte(fonte)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, destino)
+    salvar_meta(meta_path, {
+        "versao": VERSAO_CACHE,
+        "caminho": os.path.abspath(fonte.arquivo),
+        "config": _config(fonte),
+        "fonte": impressao_digital(fonte.arquivo),
+    })
+    return destino
+
+
+def garantir_caches(fontes: list[FontePib], n_jobs: int = N_JOBS):
+    """Lê, em paralelo, só as publicações sem cache válido."""
+    pendentes = [f for f in fontes if not _em_cache(f)]
+    workers = min(len(pendentes), n_jobs if n_jobs > 0 else os.cpu_count() or 1)
+    if workers <= 1:
+        for fonte in pendentes:
+            _gravar_cache(fonte)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(_gravar_cache, pendentes))
+
+
+def carregar_fontes(fontes: list[FontePib],
+                    codigos: set[int] | None = None,
+                    n_jobs: int = N_JOBS) -> list[pd.DataFrame]:
+    """Uma tabela por publicação (na ordem dada), só com os `codigos`."""
+    garantir_caches(fontes, n_jobs)
+    filtros = None if codigos is None else [("codigo_ibge", "in", sorted(codigos))]
+    dfs = [pd.read_parquet(_caminho_cache(f)[0], filters=filtros or None)
+           for f in fontes]
+    if codigos is not None and not codigos:  # filtro 'in' vazio: nenhuma linha
+        dfs = [df.iloc[:0] for df in dfs]
+    return dfs
+
+
+def combinar(dfs: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Junta as publicações na ordem do registro; um (codigo_ibge, ano)
+    repetido fica com o valor da mais recente. Ordenado por código e ano.
+    """
+    df = pd.concat(dfs, ignore_index=True)
+    df = df.drop_duplicates(["codigo_ibge", "ano"], keep="last")
+    return df.sort_values(["codigo_ibge", "ano"])
+
+
+def carregar_pib(fontes: list[FontePib] | None = None,
+                 codigos: set[int] | None = None,
+                 n_jobs: int = N_JOBS) -> pd.DataFrame:
+    """Série de PIB de todas as publicações, sem anos repetidos."""
+    return combinar(carregar_fontes(fontes or FONTES_PIB, codigos, n_jobs))
@@ -0,0 +1,84 @@
+# formato_longo.py
+# Conversão das tabelas largas de cobertura (uma coluna por ano) para o
+# formato longo, usada pelas etapas 01 e 03.
+#
+# Em vez de `DataFrame.melt`, o bloco de anos é extraído como uma matriz
+# NumPy e achatado com `ravel`; as colunas de identificação são repetidas por
+# posição (`np.repeat`), mantendo os dtypes compactos (category, int16/int32)
+# sem criar objetos Python por célula. Filtre as linhas antes de chamar: o
+# custo é proporcional às linhas largas recebidas × anos.
+
+import numpy as np
+import pandas as pd
+
+
+def colunas_ano(df: pd.DataFrame) -> list[int]:
+    """Colunas de ano (inteiras, como devolvidas por carregar_cobertura)."""
+    return [c for c in df.columns
+            if isinstance(c, (int, np.integer)) and not isinstance(c, bool)]
+
+
+def _longo(ids: pd.DataFrame,
+           anos: list[int],
+           blocos: dict[str, np.ndarray],
+           var_name: str,
+           dtype_ano: str) -> pd.DataFrame:
+    """Monta a tabela longa (linha × ano) a partir das matrizes (linhas, anos)."""
+    n, k = len(ids), len(anos)
+    df = ids.take(np.repeat(np.arange(n), k)).reset_index(drop=True)
+    df[var_name] = np.tile(np.asarray(anos, dtype=dtype_ano), n)
+    for nome, bloco in blocos.items():
+        df[nome] = bloco.ravel()
+    return df
+
+
+def para_longo(df: pd.DataFrame,
+               id_vars: list[str],
+               var_name: str,
+               value_name: str,
+               dtype_ano: str = "int16") -> pd.DataFrame:
+    """
+    Equivalente a `df.melt(id_vars, anos, var_name, value_name)`, com o ano
+    em `dtype_ano` e o valor em float64. As linhas saem na ordem
+    linha de `df` × ano (o melt devolve ano × linha).
+    """
+    anos = colunas_ano(df)
+    bloco = df[anos].to_numpy(dtype="float64")
+    return _longo(df[id_vars], anos, {value_name: bloco}, var_name, dtype_ano)
+
+
+def agregar_longo(df: pd.DataFrame,
+                  chaves: list[str],
+                  var_name: str,
+                  valores: dict[str, float],
+                  dtype_ano: str = "int16",
+                  dropna: bool = True) -> pd.DataFrame:
+    """
+    Soma as linhas largas por `chaves` e devolve o resultado já no formato
+    longo, numa única passada: o mesmo que `para_longo` seguido de
+    groupby(chaves + [var_name]).sum(), sem materializar a tabela longa
+    intermediária.
+
+    `valores` mapeia cada coluna de saída ao fator aplicado à área antes da
+    soma (ex.: {'area_ha': 1.0, 'area_km2': 0.01}); o fator é aplicado linha
+    a linha, como na soma da tabela longa, para que os totais sejam os
+    mesmos. Grupos com chave ausente são descartados (a menos que
+    `dropna=False`) e grupos só com NaN somam 0, como no groupby. Saída
+    ordenada por chaves × ano.
+    """
+    anos = colunas_ano(df)
+    bloco = df[anos].to_numpy(dtype="float64")
+    largas = df[chaves].copy()
+    blocos = {}
+    for nome, fator in valores.items():
+        somas = (
+            pd.concat([largas, pd.DataFrame(bloco * fator, index=df.index)],
+                      axis=1)
+            .groupby(chaves, observed=True, sort=True, dropna=dropna)
+            .sum()
+        )
+        blocos[nome] = somas.to_numpy(dtype="float64")
+    ids = somas.index.to_frame(index=False)
+    for col in chaves:
+        ids[col] = ids[col].astype(df[col].dtype)
+    return _longo(ids, anos, blocos, var_name, dtype_ano)
@@ -0,0 +1,159 @@
+# leitor_xlsx.py
+# Leitura em streaming de planilhas grandes (XLSX/XLS) com filtro de linhas
+# por código IBGE, sem materializar a planilha inteira em um DataFrame.
+
+from pathlib import Path
+from typing import Callable, Iterator
+
+import pandas as pd
+
+Regras = dict[str, Callable[[str], bool]]
+
+
+def exata(nome: str) -> Callable[[str], bool]:
+    """Regra que casa o cabeçalho exatamente igual a `nome`."""
+    return lambda c: c == nome
+
+
+def eh_coluna_ano(col) -> bool:
+    """Colunas de ano do MapBiomas: inteiros ou strings numéricas."""
+    return (isinstance(col, str) and col.isdigit()) or isinstance(col, int)
+
+
+def _converter(valor):
+    """Replica a conversão do pandas: floats inteiros viram int."""
+    if isinstance(valor, float) and valor.is_integer():
+        return int(valor)
+    return valor
+
+
+def _linhas_xlsx(path: Path, sheet_name: str | None) -> Iterator[tuple]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.worksheets[0]
+        for row in ws.iter_rows(values_only=True):
+            yield tuple(_converter(v) for v in row)
+    finally:
+        wb.close()
+
+
+def _linhas_xls(path: Path, sheet_name: str | None) -> Iterator[tuple]:
+    import xlrd
+
+    book = xlrd.open_workbook(path, on_demand=True)
+    try:
+        sheet = (book.sheet_by_name(sheet_name) if sheet_name
+                 else book.sheet_by_index(0))
+        for row in sheet.get_rows():
+            yield tuple(
+                None if c.ctype == xlrd.XL_CELL_EMPTY else _converter(c.value)
+                for c in row
+            )
+    finally:
+        book.release_resources()
+
+
+def iterar_linhas(path: str | Path,
+                  sheet_name: str | None = None,
+                  motor: str | None = None) -> Iterator[tuple]:
+    """
+    Itera as linhas (tuplas de valores) da planilha, uma por vez. `motor`
+    ('xlrd' ou 'openpyxl') vem da extensão do arquivo, se omitido.
+    """
+    path = Path(path)
+    if motor is None:
+        motor = "xlrd" if path.suffix.lower() == ".xls" else "openpyxl"
+    if motor == "xlrd":
+        return _linhas_xls(path, sheet_name)
+    if motor == "openpyxl":
+        return _linhas_xlsx(path, sheet_name)
+    raise ValueError(f"Motor de leitura desconhecido: {motor!r}")
+
+
+def _mapear_cabecalho(cabecalho: tuple,
+                      regras: Regras | None,
+                      manter_anos: bool) -> tuple[list, list[int]]:
+    """
+    Resolve cada regra para o índice da primeira coluna que a satisfaz.
+    Sem regras, mantém todas as colunas com os nomes originais.
+    Retorna (nomes de saída, índices na linha).
+    """
+    if regras is None:
+        pares = [(int(c) if eh_coluna_ano(c) else c, i)
+                 for i, c in enumerate(cabecalho) if c is not None]
+        return [n for n, _ in pares], [i for _, i in pares]
+    nomes, idx = [], []
+    for saida, regra in regras.items():
+        pos = next(
+            (i for i, c in enumerate(cabecalho)
+             if isinstance(c, str) and regra(c)),
+            None,
+        )
+        if pos is None:
+            raise KeyError(f"Coluna para '{saida}' não encontrada no cabeçalho")
+        nomes.append(saida)
+        idx.append(pos)
+    if manter_anos:
+        for i, c in enumerate(cabecalho):
+            if eh_coluna_ano(c) and i not in idx:
+                nomes.append(int(c))
+                idx.append(i)
+    return nomes, idx
+
+
+def iterar_lotes(path: str | Path,
+                 regras: Regras | None,
+                 coluna_codigo: str,
+                 codigos: set[int] | None = None,
+                 sheet_name: str | None = None,
+                 manter_anos: bool = False,
+                 tamanho_lote: int = 50_000,
+                 motor: str | None = None) -> Iterator[pd.DataFrame]:
+    """
+    Lê a planilha em streaming e produz DataFrames de até `tamanho_lote`
+    linhas, contendo só as colunas das `regras` (mais os anos, se
+    `manter_anos`; todas as colunas, se `regras` for None) e só as linhas
+    cujo `coluna_codigo` está em `codigos` (todas, se None). A memória fica
+    limitada ao tamanho do lote.
+    """
+    linhas = iterar_linhas(path, sheet_name, motor)
+    cabecalho = next(linhas)
+    nomes, idx = _mapear_cabecalho(cabecalho, regras, manter_anos)
+    pos_codigo = idx[nomes.index(coluna_codigo)]
+    alvo = None if codigos is None else {int(c) for c in codigos}
+
+    lote = []
+    for row in linhas:
+        if alvo is not None:
+            codigo = row[pos_codigo] if pos_codigo < len(row) else None
+            try:
+                if int(codigo) not in alvo:
+                    continue
+            except (TypeError, ValueError):
+                continue
+        lote.append(tuple(row[i] if i < len(row) else None for i in idx))
+        if len(lote) >= tamanho_lote:
+            yield pd.DataFrame.from_records(lote, columns=nomes)
+            lote = []
+    if lote:
+        yield pd.DataFrame.from_records(lote, columns=nomes)
+
+
+def ler_filtrado(path: str | Path,
+                 regras: Regras | None,
+                 coluna_codigo: str,
+                 codigos: set[int] | None = None,
+                 sheet_name: str | None = None,
+                 manter_anos: bool = False,
+                 motor: str | None = None) -> pd.DataFrame:
+    """Como `iterar_lotes`, mas concatena os lotes em um único DataFrame."""
+    lotes = list(iterar_lotes(path, regras, coluna_codigo, codigos,
+                              sheet_name, manter_anos, motor=motor))
+    if not lotes:
+        linhas = iterar_linhas(path, sheet_name, motor)
+        nomes, _ = _mapear_cabecalho(next(linhas), regras, manter_anos)
+        linhas.close()
+        return pd.DataFrame(columns=nomes)
+    return pd.concat(lotes, ignore_index=True)
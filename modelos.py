@@ -0,0 +1,89 @@
+# modelos.py
+# Catálogo de regressores e treino paralelo do "zoo" de modelos (etapas 04/05)
+
+import os
+
+from joblib import Parallel, delayed, parallel_config
+from sklearn.metrics import r2_score, mean_squared_error
+from sklearn.linear_model import LinearRegression, Lasso
+from sklearn.neighbors import KNeighborsRegressor
+from sklearn.tree import DecisionTreeRegressor
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.neural_network import MLPRegressor
+from sklearn.svm import SVR
+from sklearn.dummy import DummyRegressor
+from xgboost import XGBRegressor
+
+# Modelos com paralelismo interno (recebem parte do orçamento de núcleos)
+MODELOS_MULTITHREAD = ('Random Forest', 'XGBoost')
+
+
+def criar_modelos(threads_internos: int = 1,
+                  hiperparametros: dict[str, dict] | None = None) -> dict:
+    """
+    Os nove regressores comparados no artigo, na ordem das figuras.
+    `hiperparametros` (modelo → parâmetros, ex.: os melhores encontrados por
+    ajuste_modelos.py) substitui os valores padrão dos modelos indicados.
+    """
+    modelos = {
+        'Linear Regression': LinearRegression(),
+        'Random Forest':     RandomForestRegressor(random_state=42,
+                                                   n_jobs=threads_internos),
+        'KNN':               KNeighborsRegressor(),
+        'Decision Tree':     DecisionTreeRegressor(random_state=42),
+        'MLP Regressor':     MLPRegressor(max_iter=1000, random_state=42),
+        'Lasso':             Lasso(alpha=0.01, random_state=42),
+        'SVR':               SVR(kernel='rbf'),
+        'Dummy':             DummyRegressor(),
+        'XGBoost':           XGBRegressor(random_state=42,
+                                          n_jobs=threads_internos)
+    }
+    for nome, params in (hiperparametros or {}).items():
+        modelos[nome].set_params(**params)
+    return modelos
+
+
+def dividir_nucleos(n_jobs: int, n_modelos: int) -> tuple[int, int]:
+    """
+    Reparte `n_jobs` núcleos entre processos (um modelo por processo) e
+    threads internas de RandomForest/XGBoost, sem exceder o orçamento.
+    `n_jobs <= 0` usa todos os núcleos. Retorna (processos, threads).
+    """
+    total = os.cpu_count() or 1
+    if n_jobs <= 0:
+        n_jobs = total
+    processos = max(1, min(n_jobs, n_modelos))
+    threads = max(1, n_jobs // processos)
+    return processos, threads
+
+
+def _treinar(nome, modelo, X_train, y_train, X_test, y_test):
+    modelo.fit(X_train, y_train)
+    preds = modelo.predict(X_test)
+    return {
+        'model': nome,
+        'R2':    r2_score(y_test, preds),
+        'MSE':   mean_squared_error(y_test, preds)
+    }, modelo, preds
+
+
+def treinar_modelos(X_train, y_train, X_test, y_test,
+                    n_jobs: int = -1,
+                    hiperparametros: dict[str, dict] | None = None
+                    ) -> tuple[list[dict], dict, dict]:
+    """
+    Ajusta os modelos em paralelo (joblib/loky) e devolve, na ordem do
+    catálogo: métricas, estimadores ajustados e predições no teste.
+    Com sementes fixas, o resultado é idêntico ao da execução serial.
+    """
+    processos, threads = dividir_nucleos(n_jobs, len(criar_modelos()))
+    modelos = criar_modelos(threads, hiperparametros)
+    with parallel_config(backend='loky', inner_max_num_threads=threads):
+        saidas = Parallel(n_jobs=processos)(
+            delayed(_treinar)(nome, modelo, X_train, y_train, X_test, y_test)
+            for nome, modelo in modelos.items()
+        )
+    resultados = [r for r, _, _ in saidas]
+    ajustados = {r['model']: m for r, m, _ in saidas}
+    predicoes = {r['model']: p for r, _, p in saidas}
+    return resultados, ajustados, predicoes
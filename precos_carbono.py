@@ -0,0 +1,94 @@
+# precos_carbono.py
+# Carregador único da planilha de preços de carbono (carbon-prices-latest.xlsx)
+#
+# A planilha é lida uma vez e normalizada em uma tabela longa com todos os
+# instrumentos (instrumento, ano, carbon_price_usd), guardada em Parquet e
+# invalidada pela impressão digital do arquivo. Etapas 04 e 05 consultam as
+# séries por instrumento sem reprocessar o Excel.
+
+import os
+from functools import lru_cache
+
+import pandas as pd
+
+from cache_arquivos import fonte_inalterada, impressao_digital, ler_meta, salvar_meta
+from variaveis import CACHE_PATHS, INPUT_PATHS
+
+INSTRUMENTO_PADRAO = 'EU ETS'
+INSTRUMENT_COL = 'Instrument name'
+VERSAO_CACHE = 1
+
+
+def _normalizar(fonte: str) -> pd.DataFrame:
+    """Lê o Excel (cabeçalho na 2ª linha) e derrete para formato longo."""
+    price_raw = pd.read_excel(fonte, sheet_name=0, header=1, engine='openpyxl')
+    # identifica anos nas colunas
+    year_cols = [c for c in price_raw.columns if isinstance(c, int)]
+    df = price_raw.melt(
+        id_vars=[INSTRUMENT_COL], value_vars=year_cols,
+        var_name='ano', value_name='carbon_price_usd'
+    ).rename(columns={INSTRUMENT_COL: 'instrumento'})
+    df['instrumento'] = df['instrumento'].astype('string')
+    df['ano'] = df['ano'].astype('int16')
+    df['carbon_price_usd'] = pd.to_numeric(
+        df['carbon_price_usd'], errors='coerce')
+    return df.dropna(subset=['instrumento', 'carbon_price_usd']).reset_index(drop=True)
+
+
+def _garantir_cache(fonte: str) -> str:
+    destino = CACHE_PATHS.precos_parquet
+    meta_path = CACHE_PATHS.precos_meta
+    meta = ler_meta(meta_path)
+    if (
+        os.path.exists(destino)
+        and meta is not None
+        and meta.get('versao') == VERSAO_CACHE
+        and os.path.abspath(fonte) == meta.get('caminho')
+        and fonte_inalterada(fonte, meta, meta_path)
+    ):
+        return destino
+    print(f"[INFO] Normalizando preços de carbono de {fonte}...")
+    df = _normalizar(fonte)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, destino)
+    salvar_meta(meta_path, {
+        'versao': VERSAO_CACHE,
+        'caminho': os.path.abspath(fonte),
+        'fonte': impressao_digital(fonte),
+    })
+    return destino
+
+
+@lru_cache(maxsize=4)
+def _tabela(fonte: str, impressao: tuple) -> pd.DataFrame:
+    return pd.read_parquet(_garantir_cache(fonte))
+
+
+def carregar_precos(fonte: str = INPUT_PATHS.carbon_prices_raw) -> pd.DataFrame:
+    """
+    Tabela longa normalizada de todos os instrumentos:
+    ['instrumento', 'ano', 'carbon_price_usd'].
+    Memorizada no processo enquanto o arquivo não mudar.
+    """
+    st = os.stat(fonte)
+    return _tabela(fonte, (st.st_size, st.st_mtime_ns))
+
+
+def instrumentos(fonte: str = INPUT_PATHS.carbon_prices_raw) -> list[str]:
+    """Instrumentos com ao menos um preço na planilha."""
+    return sorted(carregar_precos(fonte)['instrumento'].unique().tolist())
+
+
+def serie_preco(instrumento: str = INSTRUMENTO_PADRAO,
+                fonte: str = INPUT_PATHS.carbon_prices_raw) -> pd.DataFrame:
+    """
+    Série ano → preço de um instrumento: ['ano', 'carbon_price_usd'],
+    sem linhas vazias nem duplicadas.
+    """
+    df = carregar_precos(fonte)
+    serie = df.loc[df['instrumento'] == instrumento, ['ano', 'carbon_price_usd']]
+    serie = serie.drop_duplicates().reset_index(drop=True)
+    serie['ano'] = serie['ano'].astype(int)
+    return serie
@@ -0,0 +1,264 @@
+# regioes.py
+# Seleção do conjunto de municípios (códigos IBGE) processado pelo pipeline
+#
+# Um seletor escolhe os municípios por região nomeada (REGIOES), UF, bioma,
+# lista de códigos ou o Brasil inteiro. O catálogo de municípios vem do cache
+# Parquet da planilha de cobertura MapBiomas. As etapas pesadas processam a
+# seleção particionada por UF (dois primeiros dígitos do código IBGE), em
+# processos paralelos, cada um gravando a sua parte dos intermediários de saída.
+#
+# Várias regiões são processadas juntas: as entradas brutas são lidas uma vez
+# (para a união dos municípios) e as linhas repartidas entre as regiões por
+# um único groupby em codigo_ibge. A região de estudo (REGIAO) usa os
+# caminhos de variaveis.py; as demais espelham a mesma árvore em
+# regioes/<slug>/.
+
+import os
+import re
+import shutil
+from functools import lru_cache
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from unidecode import unidecode
+
+import armazenamento
+from cache_cobertura import garantir_cache
+from variaveis import (
+    INPUT_PATHS, OUTPUT_PATHS, CACHE_PATHS, N_JOBS, REGIAO, REGIOES, Municipio)
+
+SELETOR_AJUDA = (
+    "região nomeada (ex.: 'Serra do Penitente'), 'uf:MA,PI', 'bioma:Cerrado', "
+    "'ibge:2100501,2101400', 'amostra:500' (primeiros N códigos) ou 'brasil'"
+)
+
+# Código IBGE da UF (dois primeiros dígitos do município) → sigla
+UF_POR_CODIGO = {
+    11: "RO", 12: "AC", 13: "AM", 14: "RR", 15: "PA", 16: "AP", 17: "TO",
+    21: "MA", 22: "PI", 23: "CE", 24: "RN", 25: "PB", 26: "PE", 27: "AL",
+    28: "SE", 29: "BA",
+    31: "MG", 32: "ES", 33: "RJ", 35: "SP",
+    41: "PR", 42: "SC", 43: "RS",
+    50: "MS", 51: "MT", 52: "GO", 53: "DF",
+}
+
+
+RAIZ_REGIOES = "regioes"
+# Entradas brutas e a base de alertas (etapa 02) são comuns a todas as regiões
+CAMINHOS_COMPARTILHADOS = {
+    INPUT_PATHS.pib_2002_2009, INPUT_PATHS.pib_2010_2021, INPUT_PATHS.mapbiomas,
+    INPUT_PATHS.carbon_prices_raw, OUTPUT_PATHS.alertas_csv,
+    OUTPUT_PATHS.alertas_db, OUTPUT_PATHS.alertas_municipios_csv,
+}
+
+
+def uf_do_codigo(codigo: int) -> str:
+    return UF_POR_CODIGO.get(int(codigo) // 100_000, "??")
+
+
+def _normalizar(texto: str) -> str:
+    return unidecode(str(texto)).strip().lower()
+
+
+@lru_cache(maxsize=2)
+def catalogo_municipios(fonte: str = INPUT_PATHS.mapbiomas,
+                        construir: bool = True) -> pd.DataFrame:
+    """
+    Municípios presentes na planilha de cobertura:
+    ['codigo_ibge', 'municipio', 'uf', 'bioma'], uma linha por
+    município × bioma, ordenada por código.
+
+    Com `construir=False`, só lê o cache Parquet já existente (sem conferir
+    nem converter a planilha) e levanta FileNotFoundError se ele não existe.
+    """
+    if construir:
+        path = garantir_cache(fonte)
+    elif os.path.exists(CACHE_PATHS.cobertura_parquet):
+        path = CACHE_PATHS.cobertura_parquet
+    else:
+        raise FileNotFoundError(CACHE_PATHS.cobertura_parquet)
+    df = pq.read_table(path, columns=["geocode", "municipality", "biome"]).to_pandas()
+    df = (
+        df.dropna(subset=["geocode"])
+        .drop_duplicates()
+        .rename(columns={"geocode": "codigo_ibge", "municipality": "municipio",
+                         "biome": "bioma"})
+    )
+    df["codigo_ibge"] = df["codigo_ibge"].astype(int)
+    df["uf"] = df["codigo_ibge"].map(uf_do_codigo)
+    return (df[["codigo_ibge", "municipio", "uf", "bioma"]]
+            .sort_values(["codigo_ibge", "bioma"]).reset_index(drop=True))
+
+
+def selecionar(seletor: str, fonte: str = INPUT_PATHS.mapbiomas) -> list[Municipio]:
+    """
+    Resolve um seletor de região em municípios (ordenados por código).
+    Regiões nomeadas não consultam o catálogo; os demais seletores usam o
+    cache da planilha de cobertura.
+    """
+    if seletor in REGIOES:
+        return sorted(REGIOES[seletor], key=lambda m: m.id)
+
+    tipo, _, valor = seletor.partition(":")
+    tipo = tipo.strip().lower()
+    valores = [v.strip() for v in valor.split(",") if v.strip()]
+    cat = catalogo_municipios(fonte)
+    if tipo in ("brasil", "br") and not valores:
+        sel = cat
+    elif tipo == "uf" and valores:
+        sel = cat[cat["uf"].isin([v.upper() for v in valores])]
+    elif tipo == "bioma" and valores:
+        alvos = {_normalizar(v) for v in valores}
+        sel = cat[cat["bioma"].map(_normalizar).isin(alvos)]
+    elif tipo == "ibge" and valores:
+        codigos = {int(v) for v in valores}
+        sel = cat[cat["codigo_ibge"].isin(codigos)]
+        ausentes = codigos - set(sel["codigo_ibge"])
+        if ausentes:
+            print(f"[AVISO] {len(ausentes)} códigos IBGE fora da planilha de "
+                  f"cobertura: {sorted(ausentes)[:10]}")
+    elif tipo == "amostra" and len(valores) == 1 and valores[0].isdigit():
+        primeiros = cat["codigo_ibge"].drop_duplicates().head(int(valores[0]))
+        sel = cat[cat["codigo_ibge"].isin(primeiros)]
+    else:
+        raise ValueError(f"Seletor de região inválido: {seletor!r}. "
+                         f"Use {SELETOR_AJUDA}")
+
+    sel = sel.drop_duplicates("codigo_ibge")
+    if sel.empty:
+        raise ValueError(f"Nenhum município corresponde ao seletor {seletor!r}")
+    return [Municipio(int(r.codigo_ibge), r.municipio, r.uf)
+            for r in sel.itertuples(index=False)]
+
+
+def slug_regiao(regiao: str) -> str:
+    """'uf:MA,PI' → 'uf_ma_pi'; 'Serra do Penitente' → 'serra_do_penitente'."""
+    return re.sub(r"[^0-9a-z]+", "_", _normalizar(regiao)).strip("_")
+
+
+def caminho_regional(path: str, regiao: str) -> str:
+    """Caminho de `path` para a região (inalterado na região de estudo)."""
+    if regiao == REGIAO or path in CAMINHOS_COMPARTILHADOS:
+        return path
+    slug = slug_regiao(regiao)
+    return os.path.join(RAIZ_REGIOES, slug, path.replace("serra_penitente", slug))
+
+
+def caminhos_regiao(regiao: str) -> tuple[SimpleNamespace, SimpleNamespace]:
+    """INPUT_PATHS e OUTPUT_PATHS da região."""
+    return tuple(
+        SimpleNamespace(**{k: caminho_regional(v, regiao) for k, v in vars(ns).items()})
+        for ns in (INPUT_PATHS, OUTPUT_PATHS)
+    )
+
+
+def selecionar_regioes(seletores: list[str],
+                       fonte: str = INPUT_PATHS.mapbiomas) -> dict[str, list[int]]:
+    """Seletor → códigos IBGE, para cada região (sem repetir seletores)."""
+    return {s: [m.id for m in selecionar(s, fonte)] for s in dict.fromkeys(seletores)}
+
+
+def distribuir(df: pd.DataFrame,
+               regioes: dict[str, list[int]],
+               coluna: str = "codigo_ibge") -> dict[str, pd.DataFrame]:
+    """
+    Reparte as linhas de `df` entre as regiões (que podem se sobrepor) com um
+    único groupby por código, preservando a ordem original das linhas.
+    """
+    posicoes = {int(k): v for k, v in df.groupby(coluna, sort=False).indices.items()}
+    saida = {}
+    for nome, codigos in regioes.items():
+        blocos = [posicoes[c] for c in codigos if c in posicoes]
+        idx = np.sort(np.concatenate(blocos)) if blocos else np.array([], dtype=np.intp)
+        saida[nome] = df.iloc[idx]
+    return saida
+
+
+def particionar_por_uf(codigos) -> dict[str, list[int]]:
+    """Agrupa códigos IBGE por UF, na ordem dos códigos."""
+    particoes: dict[int, list[int]] = {}
+    for c in sorted(int(c) for c in codigos):
+        particoes.setdefault(c // 100_000, []).append(c)
+    return {uf_do_codigo(uf * 100_000): cods for uf, cods in particoes.items()}
+
+
+def _processar_particao(funcao,
+                        codigos: list[int],
+                        regioes: dict[str, list[int]],
+                        partes: dict[str, dict[str, str]]
+                        ) -> dict[str, dict[str, int]]:
+    """Extrai uma UF uma única vez e grava a parte de cada saída e região."""
+    linhas = {}
+    for esquema, df in funcao(codigos).items():
+        linhas[esquema] = {}
+        for nome, df_regiao in distribuir(df, regioes).items():
+            armazenamento.gravar(df_regiao, partes[esquema][nome], esquema,
+                                 exportar_csv=False)
+            linhas[esquema][nome] = len(df_regiao)
+    return linhas
+
+
+def processar_por_uf(funcao,
+                     regioes: dict[str, list[int]],
+                     destinos: dict[str, dict[str, str]],
+                     n_jobs: int = N_JOBS) -> dict[str, dict[str, int]]:
+    """
+    Executa `funcao(codigos_uf) -> {esquema: DataFrame}` (com coluna
+    codigo_ibge) para cada UF da união das regiões, em paralelo quando há
+    mais de uma, e junta as partes de cada saída e região no intermediário
+    `destinos[esquema][regiao]` (esquemas de armazenamento.py), na ordem dos
+    códigos IBGE. `funcao` deve ser importável (definida no nível do módulo,
+    ou um functools.partial dela). Retorna as linhas gravadas por esquema e
+    região.
+
+    Cada UF é lida uma única vez, qualquer que seja o número de saídas e de
+    regiões, e cada processo mantém em memória apenas a sua UF: o pico de
+    memória é o da maior UF da seleção, não o do país inteiro.
+    """
+    uniao = sorted({c for codigos in regioes.values() for c in codigos})
+    particoes = particionar_por_uf(uniao)
+    pasta = os.path.join(os.path.dirname(CACHE_PATHS.pipeline_estado), "partes",
+                         f"{os.getpid()}")
+    tarefas = {}
+    for uf, codigos in particoes.items():
+        conjunto = set(codigos)
+        regioes_uf = {nome: [c for c in cods if c in conjunto]
+                      for nome, cods in regioes.items()}
+        regioes_uf = {nome: cods for nome, cods in regioes_uf.items() if cods}
+        partes = {
+            esquema: {nome: os.path.join(pasta, esquema, slug_regiao(nome),
+                                         f"{uf}.csv")
+                      for nome in regioes_uf}
+            for esquema in destinos
+        }
+        tarefas[uf] = (codigos, regioes_uf, partes)
+    for esquema, por_regiao in destinos.items():
+        for nome in regioes:
+            os.makedirs(os.path.join(pasta, esquema, slug_regiao(nome)),
+                        exist_ok=True)
+            os.makedirs(os.path.dirname(por_regiao[nome]) or ".", exist_ok=True)
+
+    workers = min(len(tarefas), n_jobs if n_jobs > 0 else os.cpu_count() or 1)
+    if workers <= 1:
+        resultados = [_processar_particao(funcao, *t) for t in tarefas.values()]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = [pool.submit(_processar_particao, funcao, *t)
+                       for t in tarefas.values()]
+            resultados = [fut.result() for fut in futuros]
+
+    linhas = {esquema: {nome: 0 for nome in regioes} for esquema in destinos}
+    for r in resultados:
+        for esquema, por_regiao in r.items():
+            for nome, n in por_regiao.items():
+                linhas[esquema][nome] += n
+    for esquema, por_regiao in destinos.items():
+        for nome, destino in por_regiao.items():
+            partes = [t[2][esquema][nome] for t in tarefas.values()
+                      if nome in t[1]]
+            armazenamento.juntar(partes, destino, esquema)
+    shutil.rmtree(pasta, ignore_errors=True)
+    return linhas
@@ -1,8 +1,49 @@
-import subprocess
+"""
+Incremental, dependency-aware runner for the pipeline stages 00–05.
+
+Each stage declares its inputs (INPUT_PATHS) and outputs (OUTPUT_PATHS).
+Dependencies are derived from those declarations: a stage depends on every
+stage that produces one of its inputs. A stage is skipped when its outputs
+exist, were not touched since the last run and its fingerprint (inputs,
+code of the script and of the local modules it imports, parameters) is
+unchanged. Independent stages run in parallel.
+
+Usage:
+    python run_pipeline_validation.py                 # run what is stale
+    python run_pipeline_validation.py --force 02      # rerun stage 02 (+ dependents)
+    python run_pipeline_validation.py --stages 00 04  # only these (+ their deps)
+    python run_pipeline_validation.py --dry-run       # show what would run
+    python run_pipeline_validation.py --regioes "Serra do Penitente" uf:MA
+                                                      # several regions in one pass
+"""
 import os
+import ast
 import sys
+import json
+import time
+import argparse
+import hashlib
 import subprocess
-from variaveis import INPUT_PATHS, OUTPUT_PATHS
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from cache_arquivos import impressao_digital, ler_meta, salvar_meta
+from armazenamento import caminho
+from regioes import caminho_regional
+from variaveis import (
+    INPUT_PATHS, OUTPUT_PATHS, CACHE_PATHS, PIB_EXTRAS, REGIOES,
+    REGIOES_SELECIONADAS)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Settings read from the environment that change what the stages write
+# (format and CSV exports of intermediates, core budget for model training,
+# extra PIB releases, default regions); part of every stage fingerprint
+ENV_FINGERPRINT = (
+    "PIPELINE_FORMATO", "PIPELINE_EXPORTAR_CSV", "PIPELINE_N_JOBS",
+    "PIPELINE_PIB_EXTRAS", "PIPELINE_REGIAO",
+)
+
 
 # Utility to safely print possibly non-ASCII output without encoding errors
 
@@ -16,80 +57,323 @@ def safe_print(s: str):
         clean = s.encode(sys.stdout.encoding, errors='replace').decode(
             sys.stdout.encoding)
         sys.stdout.write(clean)
+    sys.stdout.flush()
+
+
+@dataclass
+class Stage:
+    id: str
+    script: str
+    inputs: list[str]
+    outputs: list[str]
+    args: list[str] = field(default_factory=list)
+    # Remote stages (API downloads) only rerun when forced or outputs are missing
+    remote: bool = False
+    # Regional stages receive --regioes (part of their fingerprint) and
+    # read/write one copy of their non-shared paths per region
+    regional: bool = False
+
 
+FIG_DIR = os.path.dirname(OUTPUT_PATHS.evolucao_pib_png)
+FIGURES = [
+    "Figura01_Evolucao_PIB.png",
+    "Figura02_Evolucao_GEE.png",
+    "Figura03_Evolucao_Desmatamento.png",
+    "Figura04_EQM_Modelos.png",
+    "Figura05_Correlacoes.png",
+    *(f"Figura07_{i}_{name}.png" for i, name in enumerate(
+        ["LinearRegression", "RandomForest", "KNN", "DecisionTree", "MLP",
+         "Lasso", "SVR", "Dummy", "XGBoost"], start=1)),
+    "Figura08_Importancia_Variaveis.png",
+    "Figura09_Evolucao_Preco_Carbono.png",
+]
+
+# Intermediates are declared by their logical path; the physical file
+# follows PIPELINE_FORMATO (see armazenamento.py)
+PIB = caminho(OUTPUT_PATHS.pib_ibge_csv)
+COVERAGE_LONG = caminho(OUTPUT_PATHS.mapbiomas_long_csv)
+LAND_USE = caminho(OUTPUT_PATHS.uso_timeseries_csv)
+COVERAGE_CUBE = caminho(OUTPUT_PATHS.cubo_cobertura_csv)
+CONSOLIDATED = caminho(OUTPUT_PATHS.carbono_consolidado_csv)
 
-# Define each stage script and its expected output files
-stages = [
-    ("00_extrair_pib_municipal.py", [OUTPUT_PATHS.pib_ibge_csv]),
-    ("01_extrair_gee_municipal_excel.py", [OUTPUT_PATHS.mapbiomas_long_csv]),
-    ("02_extrair_alertas_desmatamento.py", [OUTPUT_PATHS.alertas_csv]),
-    ("03_extrair_uso_terra_timeseries.py", [INPUT_PATHS.uso_timeseries]),
-    ("04_consolidar_modelar_carbono.py", [
-        OUTPUT_PATHS.carbono_consolidado_csv,
-        OUTPUT_PATHS.model_results_csv
-    ]),
-    ("05_gerar_figuras_carbono.py", None),  # Outputs checked dynamically
+# Define each stage script with its declared inputs and outputs
+STAGES = [
+    # The coverage sheet is also the municipality catalogue for --regiao;
+    # later IBGE releases (PIPELINE_PIB_EXTRAS) are inputs too
+    Stage("00", "00_extrair_pib_municipal.py",
+          [INPUT_PATHS.pib_2002_2009, INPUT_PATHS.pib_2010_2021,
+           *PIB_EXTRAS, INPUT_PATHS.mapbiomas],
+          [PIB],
+          regional=True),
+    # One pass over the coverage sheet writes every coverage intermediate
+    # (extracao_cobertura.py), including the class roll-up cube queried with
+    # cubo_cobertura.py; 03_extrair_uso_terra_timeseries.py remains as a
+    # standalone script for the land-use series only
+    Stage("01", "01_extrair_cobertura_municipal.py",
+          [INPUT_PATHS.mapbiomas],
+          [COVERAGE_LONG, LAND_USE, COVERAGE_CUBE],
+          regional=True),
+    # Remote API: no file inputs, rerun with --force 02 to refresh alerts
+    # (or run the stage with --sync for an incremental update). Named regions
+    # resolve their territories without the MapBiomas workbook; other
+    # selectors (uf:, bioma:, ...) need its catalogue, declared in main()
+    Stage("02", "02_extrair_alertas_desmatamento.py",
+          [],
+          [OUTPUT_PATHS.alertas_csv, OUTPUT_PATHS.alertas_db],
+          remote=True),
+    Stage("04", "04_consolidar_dados_carbono.py",
+          [PIB, COVERAGE_LONG,
+           INPUT_PATHS.alertas_db, INPUT_PATHS.carbon_prices_raw],
+          [CONSOLIDATED,
+           OUTPUT_PATHS.model_results_csv, OUTPUT_PATHS.modelos_latest],
+          regional=True),
+    Stage("05", "05_gerar_figuras_carbono.py",
+          [CONSOLIDATED,
+           OUTPUT_PATHS.model_results_csv, OUTPUT_PATHS.modelos_latest,
+           INPUT_PATHS.carbon_prices_raw],
+          [os.path.join(FIG_DIR, f) for f in FIGURES],
+          regional=True),
 ]
 
-# Helper to check file existence
+
+def regional_paths(paths: list[str], regions: list[str]) -> list[str]:
+    """Every path for every region (shared paths only once)."""
+    return list(dict.fromkeys(
+        caminho_regional(p, r) for r in regions for p in paths))
+
+
+def dependencies(stages: list[Stage]) -> dict[str, set[str]]:
+    """Maps each stage id to the ids of the stages producing its inputs."""
+    producer = {os.path.normpath(o): s.id for s in stages for o in s.outputs}
+    return {
+        s.id: {producer[os.path.normpath(i)] for i in s.inputs
+               if os.path.normpath(i) in producer} - {s.id}
+        for s in stages
+    }
+
+
+def local_modules(script: str) -> list[str]:
+    """
+    Local .py files imported (transitively) by the script, including itself,
+    so that editing a shared module invalidates the stages that use it.
+    """
+    seen, todo = [], [os.path.join(ROOT, script)]
+    while todo:
+        path = todo.pop()
+        if path in seen or not os.path.exists(path):
+            continue
+        seen.append(path)
+        with open(path, encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                todo.append(os.path.join(ROOT, name.split(".")[0] + ".py"))
+    return sorted(seen)
+
+
+def file_hash(path: str, known: dict) -> dict:
+    """
+    Fingerprint of an input file. The SHA-256 is reused from the previous
+    run when size and mtime did not change.
+    """
+    info = impressao_digital(path, com_hash=False)
+    prev = known.get(path)
+    if prev and prev["size"] == info["size"] and prev["mtime_ns"] == info["mtime_ns"]:
+        info["sha256"] = prev["sha256"]
+    else:
+        info["sha256"] = impressao_digital(path)["sha256"]
+    return info
+
+
+def stage_fingerprint(stage: Stage, known_files: dict) -> tuple[str, dict]:
+    """Hash of inputs, code, parameters and output-affecting env of a stage."""
+    h = hashlib.sha256()
+    files = {}
+    for path in sorted(set(stage.inputs) | set(local_modules(stage.script))):
+        if not os.path.exists(path):
+            h.update(f"{path}:missing".encode())
+            continue
+        files[path] = file_hash(path, known_files)
+        h.update(f"{path}:{files[path]['sha256']}".encode())
+    h.update(json.dumps(stage.args).encode())
+    h.update(json.dumps({k: os.getenv(k) for k in ENV_FINGERPRINT},
+                        sort_keys=True).encode())
+    return h.hexdigest(), files
 
 
-def check_files(files):
-    status = True
-    for f in files:
-        if not os.path.exists(f):
-            print(f"[MISSING] {f}")
-            status = False
-        else:
-            print(f"[OK]      {f}")
-    return status
+def outputs_state(stage: Stage) -> dict | None:
+    """size/mtime of every output; None if any is missing."""
+    state = {}
+    for out in stage.outputs:
+        if not os.path.exists(out):
+            return None
+        state[out] = impressao_digital(out, com_hash=False)
+    return state
 
 
-all_ok = True
+def is_up_to_date(stage: Stage, fingerprint: str, saved: dict) -> bool:
+    if stage.remote:
+        return outputs_state(stage) is not None
+    entry = saved.get(stage.id)
+    if not entry or entry.get("fingerprint") != fingerprint:
+        return False
+    current = outputs_state(stage)
+    return current is not None and current == entry.get("outputs")
 
-for script, outputs in stages:
-    print(f"\n=== Running {script} ===")
-    result = subprocess.run([sys.executable, script],
-                            capture_output=True, text=True)
-    print(result.stdout)
+
+def run_stage(stage: Stage) -> tuple[int, str, float]:
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, stage.script, *stage.args],
+        cwd=ROOT, capture_output=True, text=True,
+    )
+    out = result.stdout
     if result.returncode != 0:
-        safe_print(f"[ERROR] {script} failed(exit code {result.returncode}")
-        # stderr suppressed to avoid encoding issues
-        all_ok = False
-        continue
-
-    if outputs:
-        print(f"Checking outputs for {script}:")
-        if not check_files(outputs):
-            all_ok = False
+        out += result.stderr
+    return result.returncode, out, time.perf_counter() - start
+
+
+def select(stages: list[Stage], deps: dict, wanted: list[str] | None) -> list[Stage]:
+    """Requested stages plus everything they depend on."""
+    if not wanted:
+        return stages
+    keep, todo = set(), list(wanted)
+    while todo:
+        sid = todo.pop()
+        if sid not in keep:
+            keep.add(sid)
+            todo.extend(deps[sid])
+    return [s for s in stages if s.id in keep]
+
+
+def dependents(deps: dict, roots: set[str]) -> set[str]:
+    """All stages downstream of `roots` (inclusive)."""
+    out = set(roots)
+    changed = True
+    while changed:
+        changed = False
+        for sid, ds in deps.items():
+            if sid not in out and ds & out:
+                out.add(sid)
+                changed = True
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Runs the pipeline stages incrementally and validates outputs."
+    )
+    parser.add_argument("--stages", nargs="*",
+                        help="Stage ids to run (dependencies included)")
+    parser.add_argument("--force", nargs="*", default=[],
+                        help="Stage ids to rerun even if up to date")
+    parser.add_argument("--jobs", "-j", type=int, default=4,
+                        help="Maximum stages running at once. Default: %(default)s")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only report which stages are stale")
+    parser.add_argument("--regioes", "--regiao", nargs="+",
+                        default=REGIOES_SELECIONADAS,
+                        help="Region selectors (see regioes.py), processed "
+                             "together in one pass. Default: %(default)s")
+    args = parser.parse_args()
+
+    regions = list(dict.fromkeys(args.regioes))
+    for stage in STAGES:
+        if stage.regional:
+            stage.args = [*stage.args, "--regioes", *regions]
+            stage.inputs = regional_paths(stage.inputs, regions)
+            stage.outputs = regional_paths(stage.outputs, regions)
+        elif stage.id == "02":
+            stage.args = [*stage.args, "--regioes", *regions]
+            if any(r not in REGIOES for r in regions):
+                stage.inputs = [*stage.inputs, INPUT_PATHS.mapbiomas]
+
+    deps = dependencies(STAGES)
+    stages = {s.id: s for s in select(STAGES, deps, args.stages)}
+    forced = dependents(deps, set(args.force))
+
+    state_path = CACHE_PATHS.pipeline_estado
+    saved = ler_meta(state_path) or {}
+    known_files = saved.get("_files", {})
+
+    fingerprints = {}
+    pending = set()
+    for sid, stage in stages.items():
+        fp, files = stage_fingerprint(stage, known_files)
+        known_files.update(files)
+        fingerprints[sid] = fp
+        if sid in forced or not is_up_to_date(stage, fp, saved):
+            pending.add(sid)
+    # A stale stage makes everything downstream stale as well
+    pending = dependents({k: v & set(stages) for k, v in deps.items()
+                          if k in stages}, pending)
+
+    for sid in sorted(stages):
+        print(f"[{'STALE' if sid in pending else 'FRESH'}] {sid} {stages[sid].script}")
+    if args.dry_run:
+        return
+
+    all_ok = True
+    failed: set[str] = set()
+    done = set(stages) - pending
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        while pending or running:
+            for sid in sorted(pending):
+                blocked = deps[sid] & set(stages)
+                if blocked & failed:
+                    print(f"[SKIPPED] {sid}: dependency failed")
+                    pending.discard(sid)
+                    failed.add(sid)
+                    all_ok = False
+                elif blocked <= done:
+                    # Inputs are final now that dependencies have finished
+                    fingerprints[sid], files = stage_fingerprint(
+                        stages[sid], known_files)
+                    known_files.update(files)
+                    print(f"=== Running {stages[sid].script} ===")
+                    running[pool.submit(run_stage, stages[sid])] = sid
+                    pending.discard(sid)
+            if not running:
+                break
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                sid = running.pop(fut)
+                code, out, elapsed = fut.result()
+                safe_print(out)
+                outputs = outputs_state(stages[sid])
+                if code != 0:
+                    safe_print(f"[ERROR] {stages[sid].script} failed "
+                               f"(exit code {code})\n")
+                    failed.add(sid)
+                    all_ok = False
+                elif outputs is None:
+                    for o in stages[sid].outputs:
+                        if not os.path.exists(o):
+                            print(f"[MISSING] {o}")
+                    failed.add(sid)
+                    all_ok = False
+                else:
+                    print(f"[OK]      {sid} in {elapsed:.1f}s")
+                    saved[sid] = {"fingerprint": fingerprints[sid],
+                                  "outputs": outputs}
+                    done.add(sid)
+                saved["_files"] = known_files
+                salvar_meta(state_path, saved)
+
+    print("\nPipeline validation completed.")
+    if not all_ok:
+        print("Some steps failed or outputs are missing.")
+        sys.exit(1)
     else:
-        # For stage 05, check numbered figures
-        fig_dir = os.path.dirname(OUTPUT_PATHS.evolucao_pib_png)
-        expected = []
-        # Figures 01-05
-        for i in range(1, 6):
-            expected.append(os.path.join(fig_dir, f"Figura{i:02d}_*.png"))
-        # Scatters Figura07_1..9
-        for i in range(1, 10):
-            expected.append(os.path.join(fig_dir, f"Figura07_{i}_*.png"))
-        # Figura08 and Figura09
-        expected.append(os.path.join(
-            fig_dir, "Figura08_Importancia_Variaveis.png"))
-        expected.append(os.path.join(
-            fig_dir, "Figura09_Evolucao_Preco_Carbono.png"))
-        print(f"Checking figures in {fig_dir}:")
-        import glob
-        for pattern in expected:
-            matches = glob.glob(pattern)
-            if matches:
-                print(f"[OK]      Pattern {pattern} -> {len(matches)} file(s)")
-            else:
-                print(f"[MISSING] Pattern {pattern}")
-                all_ok = False
-
-print("\nPipeline validation completed.")
-if not all_ok:
-    print("Some steps failed or outputs are missing.")
-    sys.exit(1)
-else:
-    print("All steps ran successfully and outputs are present.")
+        print("All steps ran successfully and outputs are present.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+# servico_predicao.py
+# Predição do preço de carbono com os modelos persistidos pela etapa 04
+#
+# O scaler e os estimadores de uma versão (results/models, ver
+# artefatos_modelos.py) são carregados uma única vez; cada lote de linhas
+# (municipio, ano, pib, GEE_tCO2e, area_desmatada_ha) é escalado de uma vez e
+# cada modelo faz uma única chamada a predict sobre o lote inteiro.
+#
+# Uso:
+#     python servico_predicao.py prever --entrada novos.csv --saida pred.csv
+#     cat novos.csv | python servico_predicao.py prever --modelos XGBoost "Random Forest"
+#     python servico_predicao.py servir --port 8080
+#     curl -X POST localhost:8080/predict -d '{"linhas": [{"municipio": "Balsas",
+#          "ano": 2020, "pib": 5e6, "GEE_tCO2e": 1e5, "area_desmatada_ha": 300}]}'
+
+import io
+import os
+import sys
+import json
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from artefatos_modelos import carregar_artefatos
+from regioes import caminhos_regiao
+from variaveis import FEATURE_COLS, REGIAO
+
+COLUNAS_ID = ['municipio', 'ano']
+
+
+class Preditor:
+    """Modelos de uma versão da etapa 04 em memória, prontos para predizer."""
+
+    def __init__(self, versao: str | None = None,
+                 base_dir: str | None = None,
+                 regiao: str = REGIAO):
+        base_dir = base_dir or caminhos_regiao(regiao)[1].modelos_dir
+        artefatos = carregar_artefatos(versao, base_dir)
+        self.versao = artefatos['versao']
+        self.scaler = artefatos['scaler']
+        self.modelos = artefatos['modelos']
+
+    def _selecionar(self, modelos: list[str] | None) -> dict:
+        if modelos is None:
+            return self.modelos
+        faltando = [m for m in modelos if m not in self.modelos]
+        if faltando:
+            raise KeyError(f"Modelos inexistentes na versão {self.versao}: "
+                           f"{faltando} (disponíveis: {list(self.modelos)})")
+        return {m: self.modelos[m] for m in modelos}
+
+    def prever(self, df: pd.DataFrame,
+               modelos: list[str] | None = None) -> pd.DataFrame:
+        """
+        Uma coluna de predição por modelo (todos, ou só `modelos`), ao lado
+        das colunas de identificação presentes (municipio, ano). Valores não
+        numéricos ou vazios das features valem 0, como no treino; colunas de
+        feature ausentes são rejeitadas com KeyError (400 no endpoint HTTP).
+        """
+        faltando = [c for c in FEATURE_COLS if c not in df.columns]
+        if faltando:
+            raise KeyError(f"Colunas obrigatórias ausentes: {faltando}")
+        X = pd.DataFrame({
+            c: pd.to_numeric(df[c], errors='coerce').fillna(0).astype('float64')
+            for c in FEATURE_COLS
+        })
+        X_s = self.scaler.transform(X)
+        saida = df[[c for c in COLUNAS_ID if c in df.columns]].reset_index(drop=True)
+        for nome, modelo in self._selecionar(modelos).items():
+            saida[nome] = np.asarray(modelo.predict(X_s), dtype='float64')
+        return saida
+
+
+# -----------------------------------------------------------------------
+# Entrada em lote (arquivo ou stdin)
+
+def ler_lote(entrada: str, formato: str | None = None) -> pd.DataFrame:
+    """
+    Lê um lote de CSV, Parquet ou JSON Lines; '-' lê do stdin (CSV, a menos
+    que `formato` seja 'jsonl').
+    """
+    if entrada == '-':
+        texto = sys.stdin.read()
+        if formato == 'jsonl':
+            return pd.read_json(io.StringIO(texto), lines=True)
+        return pd.read_csv(io.StringIO(texto))
+    formato = formato or os.path.splitext(entrada)[1].lstrip('.').lower()
+    if formato == 'parquet':
+        return pd.read_parquet(entrada)
+    if formato in ('jsonl', 'json'):
+        return pd.read_json(entrada, lines=(formato == 'jsonl'))
+    return pd.read_csv(entrada, encoding='utf-8-sig')
+
+
+# -----------------------------------------------------------------------
+# Endpoint HTTP local
+
+def criar_handler(preditor: Preditor):
+    class Handler(BaseHTTPRequestHandler):
+        def _json(self, status: int, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if urlparse(self.path).path == "/health":
+                self._json(200, {"versao": preditor.versao,
+                                 "modelos": list(preditor.modelos),
+                                 "features": FEATURE_COLS})
+            else:
+                self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            if urlparse(self.path).path != "/predict":
+                self._json(404, {"error": "not found"})
+                return
+            try:
+                tamanho = int(self.headers.get("Content-Length", 0))
+                corpo = json.loads(self.rfile.read(tamanho) or b"{}")
+                # {"linhas": [...], "modelos": [...]} ou só a lista de linhas
+                if isinstance(corpo, list):
+                    corpo = {"linhas": corpo}
+                df = pd.DataFrame.from_records(corpo.get("linhas", []))
+                pred = preditor.prever(df, corpo.get("modelos"))
+            except (ValueError, KeyError) as e:
+                self._json(400, {"error": str(e)})
+                return
+            self._json(200, {"versao": preditor.versao,
+                             "predicoes": json.loads(pred.to_json(orient="records"))})
+
+    return Handler
+
+
+def servir(preditor: Preditor, host: str = "127.0.0.1", port: int = 8080):
+    server = ThreadingHTTPServer((host, port), criar_handler(preditor))
+    print(f"[INFO] Modelos da versão {preditor.versao} em "
+          f"http://{host}:{port}/predict")
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Predição do preço de carbono com os modelos da etapa 04."
+    )
+    parser.add_argument("--regiao", default=REGIAO,
+                        help="Região cujos artefatos são usados. Padrão: %(default)s")
+    parser.add_argument("--versao", default=None,
+                        help="Versão dos artefatos (padrão: latest.json)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_prev = sub.add_parser("prever", help="Prediz um lote de arquivo ou stdin")
+    p_prev.add_argument("--entrada", default="-",
+                        help="CSV, Parquet ou JSON Lines; '-' = stdin (padrão)")
+    p_prev.add_argument("--formato", choices=["csv", "jsonl", "parquet"],
+                        default=None, help="Formato da entrada (padrão: extensão)")
+    p_prev.add_argument("--saida", default=None,
+                        help="CSV de saída (padrão: stdout)")
+    p_prev.add_argument("--modelos", nargs="+", default=None,
+                        help="Modelos a usar (padrão: todos)")
+
+    p_serv = sub.add_parser("servir", help="Endpoint HTTP local (POST /predict)")
+    p_serv.add_argument("--host", default="127.0.0.1")
+    p_serv.add_argument("--port", type=int, default=8080)
+
+    args = parser.parse_args()
+    preditor = Preditor(args.versao, regiao=args.regiao)
+    if args.comando == "servir":
+        servir(preditor, args.host, args.port)
+        return
+
+    pred = preditor.prever(ler_lote(args.entrada, args.formato), args.modelos)
+    if args.saida:
+        pred.to_csv(args.saida, index=False, encoding="utf-8-sig")
+        print(f"✅ {len(pred)} predições (versão {preditor.versao}) salvas em "
+              f"{args.saida}", file=sys.stderr)
+    else:
+        pred.to_csv(sys.stdout, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# territorios.py
+# Índice local de territórios da API MapBiomas Alerta (SQLite)
+#
+# O catálogo /territories/options traz o ID de cada território e o nome, mas
+# não o código IBGE. O índice guarda os territórios da categoria "Município"
+# com o nome normalizado (sem acento, caixa ou pontuação), a UF (quando o nome
+# a traz, ex. "Balsas - MA") e o código IBGE resolvido pelo nome na tabela de
+# municípios (consolidacao.tabela_nomes): as regiões nomeadas e, se o cache
+# Parquet da cobertura já existir, o catálogo nacional; a planilha MapBiomas
+# nunca é lida nem convertida aqui. Nomes repetidos em mais de uma UF só são
+# resolvidos quando a UF vem no nome.
+#
+# O catálogo só é baixado de novo (pelo cliente_api.ClienteAPI) quando o
+# índice passa do TTL (PIPELINE_TERRITORIOS_TTL_DIAS, padrão 30 dias) ou com
+# `forcar`. A impressão digital da tabela de nomes fica nos metadados: se ela
+# mudar (ex.: o cache da cobertura passou a existir), os códigos IBGE do
+# índice são resolvidos de novo, sem baixar o catálogo.
+#
+# Usado pela etapa 02 (IDs a partir dos códigos IBGE das regiões), por
+# tests/list_territories.py e por diagnosis/get_municipality_ids.py.
+
+import os
+import re
+import time
+import hashlib
+import sqlite3
+
+import pandas as pd
+
+from cliente_api import ClienteAPI
+from consolidacao import normalizar_nome, tabela_nomes
+from variaveis import CACHE_PATHS, TERRITORIOS_TTL_DIAS
+
+CATEGORIA_MUNICIPIO = "municipio"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS territorios (
+    territory_id INTEGER PRIMARY KEY,
+    nome         TEXT NOT NULL,
+    chave        TEXT NOT NULL,
+    uf           TEXT,
+    codigo_ibge  INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_territorios_chave ON territorios (chave, uf);
+CREATE INDEX IF NOT EXISTS idx_territorios_ibge ON territorios (codigo_ibge);
+
+CREATE TABLE IF NOT EXISTS meta (
+    chave TEXT PRIMARY KEY,
+    valor TEXT NOT NULL
+);
+"""
+
+# "Balsas - MA", "Balsas (MA)", "Balsas/MA"
+_RE_UF = re.compile(r"^(.*?)\s*(?:-|/|\()\s*([A-Z]{2})\)?\s*$")
+
+
+def conectar(path: str = CACHE_PATHS.territorios_db) -> sqlite3.Connection:
+    """Abre (e cria, se preciso) o índice de territórios."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    con = sqlite3.connect(path)
+    con.executescript(SCHEMA)
+    return con
+
+
+def _meta(con: sqlite3.Connection, chave: str) -> str | None:
+    linha = con.execute(
+        "SELECT valor FROM meta WHERE chave = ?", (chave,)).fetchone()
+    return linha[0] if linha else None
+
+
+def atualizado_em(con: sqlite3.Connection) -> float | None:
+    marca = _meta(con, "atualizado_em")
+    return float(marca) if marca else None
+
+
+def _tabela() -> pd.DataFrame:
+    return tabela_nomes(construir_cache=False)
+
+
+def impressao_nomes() -> str:
+    """Impressão digital da tabela de nomes usada para resolver os códigos."""
+    colunas = ["codigo_ibge", "chave", "uf"]
+    valores = pd.util.hash_pandas_object(_tabela()[colunas], index=False)
+    return hashlib.sha256(valores.to_numpy().tobytes()).hexdigest()
+
+
+def expirado(con: sqlite3.Connection, ttl_dias: float = TERRITORIOS_TTL_DIAS) -> bool:
+    marca = atualizado_em(con)
+    return marca is None or time.time() - marca > ttl_dias * 86400
+
+
+def territorios_municipio(opcoes: list[dict]) -> pd.DataFrame:
+    """
+    Territórios da categoria Município: ['territory_id', 'nome', 'chave',
+    'uf', 'codigo_ibge'], com o código IBGE resolvido pelo nome (e UF).
+    """
+    linhas = []
+    for opcao in opcoes:
+        if normalizar_nome(opcao.get("categoryName", "")) != CATEGORIA_MUNICIPIO:
+            continue
+        for t in opcao.get("territories", []):
+            nome = str(t["name"])
+            m = _RE_UF.match(nome)
+            base, uf = m.groups() if m else (nome, None)
+            linhas.append((int(t["code"]), nome, normalizar_nome(base), uf))
+    df = pd.DataFrame(linhas, columns=["territory_id", "nome", "chave", "uf"])
+    return resolver_codigos(df)
+
+
+def resolver_codigos(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Preenche 'codigo_ibge' pela chave (e UF, quando presente) na tabela de
+    nomes, só quando não ambígua.
+    """
+    df = df.drop(columns="codigo_ibge", errors="ignore").reset_index(drop=True)
+    tabela = _tabela()
+    por_chave = (tabela.drop_duplicates("chave", keep=False)
+                 .set_index("chave")["codigo_ibge"])
+    por_chave_uf = (tabela.drop_duplicates(["chave", "uf"], keep=False)
+                    .set_index(["chave", "uf"])["codigo_ibge"])
+    com_uf = df["uf"].notna()
+    codigo = df["chave"].map(por_chave).astype("Int64")
+    if com_uf.any():
+        chaves_uf = pd.MultiIndex.from_frame(df.loc[com_uf, ["chave", "uf"]])
+        codigo[com_uf] = pd.Series(por_chave_uf.reindex(chaves_uf).to_numpy(),
+                                   index=df.index[com_uf]).astype("Int64")
+    df["codigo_ibge"] = codigo
+    return df
+
+
+def gravar_indice(con: sqlite3.Connection, df: pd.DataFrame):
+    """Substitui o índice pelos territórios de `df` e marca a atualização."""
+    with con:
+        con.execute("DELETE FROM territorios")
+        con.executemany(
+            "INSERT INTO territorios VALUES (?, ?, ?, ?, ?)",
+            [(int(r.territory_id), r.nome, r.chave, r.uf,
+              None if pd.isna(r.codigo_ibge) else int(r.codigo_ibge))
+             for r in df.itertuples(index=False)],
+        )
+        con.execute("INSERT OR REPLACE INTO meta VALUES ('atualizado_em', ?)",
+                    (str(time.time()),))
+        con.execute("INSERT OR REPLACE INTO meta VALUES ('tabela_nomes', ?)",
+                    (impressao_nomes(),))
+
+
+def reresolver_indice(con: sqlite3.Connection) -> pd.DataFrame:
+    """
+    Resolve de novo os códigos IBGE dos territórios já no índice (tabela de
+    nomes mudou), mantendo a data de atualização do catálogo.
+    """
+    df = resolver_codigos(pd.read_sql_query(
+        "SELECT territory_id, nome, chave, uf FROM territorios", con))
+    with con:
+        con.executemany(
+            "UPDATE territorios SET codigo_ibge = ? WHERE territory_id = ?",
+            [(None if pd.isna(r.codigo_ibge) else int(r.codigo_ibge),
+              int(r.territory_id)) for r in df.itertuples(index=False)],
+        )
+        con.execute("INSERT OR REPLACE INTO meta VALUES ('tabela_nomes', ?)",
+                    (impressao_nomes(),))
+    return df
+
+
+def garantir_indice(cliente: ClienteAPI,
+                    path: str = CACHE_PATHS.territorios_db,
+                    ttl_dias: float = TERRITORIOS_TTL_DIAS,
+                    forcar: bool = False) -> sqlite3.Connection:
+    """
+    Conexão com o índice, baixando o catálogo só se ele estiver vencido (ou
+    com `forcar`); dentro do TTL, os códigos IBGE são resolvidos de novo se
+    a tabela de nomes mudou. O cliente só autentica quando há download.
+    """
+    con = conectar(path)
+    if forcar or expirado(con, ttl_dias):
+        df = territorios_municipio(cliente.opcoes_territorios())
+        gravar_indice(con, df)
+        resolvidos = int(df["codigo_ibge"].notna().sum())
+        print(f"[INFO] Índice de territórios atualizado: {len(df)} municípios "
+              f"({resolvidos} com código IBGE) em {path}")
+    elif _meta(con, "tabela_nomes") != impressao_nomes():
+        df = reresolver_indice(con)
+        resolvidos = int(df["codigo_ibge"].notna().sum())
+        print(f"[INFO] Tabela de nomes mudou: códigos IBGE do índice de "
+              f"territórios resolvidos de novo ({resolvidos} de {len(df)})")
+    return con
+
+
+def territorios_por_codigo(con: sqlite3.Connection,
+                           codigos: list[int]) -> dict[int, int]:
+    """Código IBGE → territory_id (códigos sem território ficam de fora)."""
+    codigos = [int(c) for c in codigos]
+    marcadores = ",".join("?" * len(codigos))
+    linhas = con.execute(
+        f"SELECT codigo_ibge, territory_id FROM territorios "
+        f"WHERE codigo_ibge IN ({marcadores})", codigos).fetchall()
+    return dict(linhas)
+
+
+def territorios_por_nome(con: sqlite3.Connection,
+                         nomes: list[str],
+                         uf: str | None = None) -> dict[str, int | None]:
+    """Nome → territory_id pelo nome normalizado (None se ausente ou ambíguo)."""
+    saida = {}
+    for nome in nomes:
+        sql = "SELECT territory_id FROM territorios WHERE chave = ?"
+        params = [normalizar_nome(nome)]
+        if uf:
+            sql += " AND (uf = ? OR uf IS NULL)"
+            params.append(uf.upper())
+        ids = [r[0] for r in con.execute(sql, params)]
+        saida[nome] = ids[0] if len(ids) == 1 else None
+    return saida
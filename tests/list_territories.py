@@ -1,32 +1,37 @@
 #!/usr/bin/env python3
-import os, sys, requests
+# Lista os territórios de município da API de alertas a partir do índice
+# local (territorios.py), que só baixa o catálogo quando vence o TTL.
+import os, sys, argparse
 
-BASE = "http://localhost:8000"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import territorios  # noqa: E402
+from cliente_api import ClienteAPI  # noqa: E402
+from variaveis import API_ALERTAS, MUNICIPIOS  # noqa: E402
 
-def generate_token():
-    email = "marioh90@gmail.com" # os.getenv("MAPBIOMIAS_EMAIL")
-    pwd = "xZyn$3*6Hh" #os.getenv("MAPBIOMIAS_PASSWORD")
-    if not email or not pwd:
-        print("Defina MAPBIOMIAS_EMAIL e MAPBIOMIAS_PASSWORD", file=sys.stderr)
-        sys.exit(1)
-    r = requests.post(f"{BASE}/token",
-                      json={"email": email, "password": pwd})
-    r.raise_for_status()
-    return r.json()["token"]
 
-
-def list_territories(token):
-    h = {"Authorization": f"Bearer {token}"}
-    r = requests.get(f"{BASE}/territories/options", headers=h)
-    r.raise_for_status()
-    return r.json()
+def list_territories(con, todos: bool = False):
+    if todos:
+        return con.execute(
+            "SELECT territory_id, nome, codigo_ibge FROM territorios "
+            "ORDER BY nome").fetchall()
+    ids = territorios.territorios_por_codigo(con, [m.id for m in MUNICIPIOS])
+    return [(ids.get(m.id), m.nome, m.id) for m in MUNICIPIOS]
 
 
 if __name__ == "__main__":
-    token = generate_token()
-    opts = list_territories(token)
-    for cat in opts:
-        print(f"{cat['categoryName']}:")
-        for t in cat["territories"]:
-            print(f"  {t['code']}  {t['name']}")
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--server", "-u", default=API_ALERTAS.url)
+    parser.add_argument("--todos", action="store_true",
+                        help="Todos os municípios do índice")
+    parser.add_argument("--atualizar", action="store_true",
+                        help="Baixa o catálogo mesmo dentro do TTL")
+    args = parser.parse_args()
+
+    # credenciais de MAPBIOMAS_EMAIL / MAPBIOMAS_PASSWORD
+    con = territorios.garantir_indice(ClienteAPI(args.server),
+                                      forcar=args.atualizar)
+    print("Município:")
+    for tid, nome, codigo in list_territories(con, args.todos):
+        print(f"  {tid}  {nome}  (IBGE {codigo})")
+    con.close()
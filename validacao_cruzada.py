@@ -0,0 +1,159 @@
+# validacao_cruzada.py
+# Validação cruzada dos regressores da etapa 04 por ano e por município
+#
+# O split único aleatório (train_test_split) mistura anos futuros no treino e,
+# com poucas dezenas de linhas município-ano, dá métricas muito ruidosas.
+# Aqui cada esquema gera várias dobras:
+#
+# - 'temporal': origem móvel com janela expansível; treina com todos os anos
+#   anteriores e testa nos `horizonte` anos seguintes.
+# - 'janela':   origem móvel com janela deslizante de `janela` anos.
+# - 'municipio': dobras agrupadas por código IBGE (nenhum município aparece no
+#   treino e no teste da mesma dobra), repetidas com sorteios diferentes.
+#
+# O alvo (preço anual do carbono) é constante dentro de um ano, então as
+# dobras temporais testam em `horizonte` >= 2 anos para que o R² faça sentido.
+#
+# O scaler é ajustado só no treino de cada dobra. As dobras × modelos rodam
+# em paralelo (joblib/loky) e cada ajuste é memorizado em disco
+# (ajuste_modelos.avaliar), então repetir a validação só refaz o que mudou.
+# O resumo traz média e intervalo de confiança (t de Student) por modelo.
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy import stats
+from sklearn.preprocessing import StandardScaler
+
+from ajuste_modelos import avaliar
+from modelos import criar_modelos, dividir_nucleos
+from variaveis import N_JOBS
+
+ESQUEMAS = ('temporal', 'janela', 'municipio')
+
+
+def divisoes_temporais(anos: pd.Series,
+                       n_dobras: int = 5,
+                       horizonte: int = 2,
+                       janela: int | None = None,
+                       min_anos_treino: int = 3) -> list[tuple]:
+    """
+    Dobras de origem móvel por ano: a dobra i testa em `horizonte` anos e
+    treina com os anos anteriores (todos, ou os últimos `janela`). As
+    origens são as mais recentes possíveis, até `n_dobras`.
+    """
+    valores = np.asarray(anos)
+    unicos = np.unique(valores)
+    origens = range(min_anos_treino, len(unicos) - horizonte + 1)
+    dobras = []
+    for i in list(origens)[-n_dobras:]:
+        treino = unicos[max(0, i - janela) if janela else 0:i]
+        teste = unicos[i:i + horizonte]
+        dobras.append((np.flatnonzero(np.isin(valores, treino)),
+                       np.flatnonzero(np.isin(valores, teste))))
+    return dobras
+
+
+def divisoes_por_municipio(grupos: pd.Series,
+                           n_dobras: int = 5,
+                           repeticoes: int = 5,
+                           random_state: int = 42) -> list[tuple]:
+    """
+    Dobras agrupadas por município (código IBGE, para que homônimos de UFs
+    diferentes sejam grupos distintos), repetidas `repeticoes` vezes com
+    sorteios diferentes dos grupos (GroupKFold embaralhado).
+    """
+    codigos, unicos = pd.factorize(pd.Series(grupos), sort=True)
+    n_dobras = min(n_dobras, len(unicos))
+    rng = np.random.RandomState(random_state)
+    dobras = []
+    for _ in range(repeticoes):
+        for bloco in np.array_split(rng.permutation(len(unicos)), n_dobras):
+            teste = np.isin(codigos, bloco)
+            dobras.append((np.flatnonzero(~teste), np.flatnonzero(teste)))
+    return dobras
+
+
+def gerar_dobras(df: pd.DataFrame, esquema: str,
+                 n_dobras: int = 5, repeticoes: int = 5,
+                 horizonte: int = 2, janela: int = 5,
+                 random_state: int = 42) -> list[tuple]:
+    """Dobras (índices posicionais de treino e teste) do `esquema`."""
+    if esquema == 'temporal':
+        return divisoes_temporais(df['ano'], n_dobras, horizonte)
+    if esquema == 'janela':
+        return divisoes_temporais(df['ano'], n_dobras, horizonte, janela=janela)
+    if esquema == 'municipio':
+        return divisoes_por_municipio(df['codigo_ibge'], n_dobras, repeticoes,
+                                      random_state)
+    raise ValueError(f"Esquema de validação desconhecido: {esquema} "
+                     f"(use {', '.join(ESQUEMAS)})")
+
+
+def _escalar(X: np.ndarray, treino, teste) -> tuple[np.ndarray, np.ndarray]:
+    scaler = StandardScaler().fit(X[treino])
+    return scaler.transform(X[treino]), scaler.transform(X[teste])
+
+
+def intervalo(valores, confianca: float = 0.95) -> tuple[float, float, float]:
+    """Média e intervalo de confiança t de Student (ignora NaN)."""
+    v = np.asarray(valores, dtype=float)
+    v = v[~np.isnan(v)]
+    if len(v) == 0:
+        return np.nan, np.nan, np.nan
+    media = float(v.mean())
+    if len(v) < 2:
+        return media, np.nan, np.nan
+    meia = stats.t.ppf((1 + confianca) / 2, len(v) - 1) * v.std(ddof=1) / np.sqrt(len(v))
+    return media, media - meia, media + meia
+
+
+def validar(df: pd.DataFrame,
+            features: list[str],
+            alvo: str,
+            esquema: str = 'temporal',
+            hiperparametros: dict[str, dict] | None = None,
+            n_jobs: int = N_JOBS,
+            **kwargs) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Avalia todos os modelos do catálogo nas dobras do `esquema`. Retorna
+    (métricas por dobra, resumo por modelo com média e IC de 95%).
+
+    As dobras repetidas do esquema 'municipio' compartilham linhas, então o
+    IC é uma aproximação (otimista) da incerteza.
+    """
+    dobras = gerar_dobras(df, esquema, **kwargs)
+    if not dobras:
+        raise ValueError(f"Sem dobras para o esquema '{esquema}' "
+                         f"({df['ano'].nunique()} anos, "
+                         f"{df['codigo_ibge'].nunique()} municípios)")
+    X = df[features].to_numpy(dtype=float)
+    y = df[alvo].to_numpy(dtype=float)
+    escalados = [_escalar(X, tr, te) for tr, te in dobras]
+
+    hiper = hiperparametros or {}
+    nomes = list(criar_modelos())
+    processos, _ = dividir_nucleos(n_jobs, len(nomes) * len(dobras))
+    saidas = Parallel(n_jobs=processos)(
+        delayed(avaliar)(nome, hiper.get(nome, {}), X_tr, y[tr], X_te, y[te])
+        for nome in nomes
+        for (tr, te), (X_tr, X_te) in zip(dobras, escalados)
+    )
+
+    por_dobra = pd.DataFrame([
+        {'model': nome, 'esquema': esquema, 'dobra': i,
+         'n_treino': len(tr), 'n_teste': len(te), **saidas[k * len(dobras) + i]}
+        for k, nome in enumerate(nomes)
+        for i, (tr, te) in enumerate(dobras)
+    ])
+
+    resumo = []
+    for nome in nomes:
+        linhas = por_dobra[por_dobra['model'] == nome]
+        r = {'model': nome, 'esquema': esquema, 'dobras': len(linhas)}
+        for metrica in ('R2', 'MSE'):
+            media, inf, sup = intervalo(linhas[metrica])
+            r.update({f'{metrica}_media': media, f'{metrica}_ic95_inf': inf,
+                      f'{metrica}_ic95_sup': sup})
+        resumo.append(r)
+    return por_dobra, pd.DataFrame(resumo)
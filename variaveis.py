@@ -1,3 +1,4 @@
+import os
 from dataclasses import dataclass
 from types import SimpleNamespace
 
@@ -19,6 +20,17 @@ MUNICIPIOS = [
 # Região de estudo
 REGIAO = "Serra do Penitente"
 
+# Regiões nomeadas aceitas pelos seletores de regioes.py
+REGIOES = {
+    REGIAO: MUNICIPIOS,
+}
+
+# Seletores de região processados pelas etapas (ver regioes.SELETOR_AJUDA);
+# várias regiões separadas por ';' são processadas em uma única passada
+REGIOES_SELECIONADAS = [
+    r.strip() for r in os.getenv("PIPELINE_REGIAO", REGIAO).split(";") if r.strip()
+]
+
 CARBONO_CONSOLIDADO = "data/generated/carbono_serra_penitente.csv"
 
 # Caminhos de entrada
@@ -28,22 +40,72 @@ INPUT_PATHS = SimpleNamespace(
     mapbiomas="data/raw/mapbiomas_brazil_col_coverage_biome_state_municipality.xlsx",
     uso_timeseries="data/partial/uso_terra_serra_penitente_timeseries.csv",
     alertas="data/partial/alertas_serra_penitente.csv",
+    alertas_db="data/partial/alertas_serra_penitente.sqlite",
+    alertas_municipios="data/partial/alertas_serra_penitente_municipios.csv",
     pib_municipal="data/partial/pib_municipal_serra_penitente_ibge.csv",
     cobertura_municipal="data/partial/mapbiomas_cobertura_municipal_long.csv",
+    cubo_cobertura="data/partial/cubo_cobertura_serra_penitente.csv",
     carbon_prices_raw="data/raw/carbon-prices-latest.xlsx",
 )
 
+# Versões posteriores do PIB dos Municípios (ex.: 2010–2022), separadas por
+# ";", na ordem de publicação; anos repetidos ficam com o valor da mais recente
+PIB_EXTRAS = [
+    p.strip() for p in os.getenv("PIPELINE_PIB_EXTRAS", "").split(";") if p.strip()
+]
+
 # Caminhos de saída
 OUTPUT_PATHS = SimpleNamespace(
     pib_ibge_csv="data/partial/pib_municipal_serra_penitente_ibge.csv",
     mapbiomas_long_csv="data/partial/mapbiomas_cobertura_municipal_long.csv",
     alertas_csv="data/partial/alertas_serra_penitente.csv",
+    alertas_db="data/partial/alertas_serra_penitente.sqlite",
+    alertas_municipios_csv="data/partial/alertas_serra_penitente_municipios.csv",
+    uso_timeseries_csv="data/partial/uso_terra_serra_penitente_timeseries.csv",
+    cubo_cobertura_csv="data/partial/cubo_cobertura_serra_penitente.csv",
+    carbono_consolidado_csv=CARBONO_CONSOLIDADO,
     model_results_csv="results/carbon_price_model_all_results.csv",
+    modelos_dir="results/models",
+    modelos_latest="results/models/latest.json",
     scatter_xgboost_png="results/figures/scatter_real_vs_pred_xgboost.png",
     evolucao_pib_png="results/figures/evolucao_pib_serra_penitente.png",
     evolucao_gee_png="results/figures/evolucao_gee_serra_penitente.png",
     evolucao_desmat_png="results/figures/evolucao_desmatamento_serra_penitente.png",
 )
 
+# Caminhos de cache (artefatos derivados, podem ser apagados a qualquer momento)
+CACHE_PATHS = SimpleNamespace(
+    cobertura_parquet="data/cache/mapbiomas_coverage_9.parquet",
+    cobertura_meta="data/cache/mapbiomas_coverage_9.meta.json",
+    pipeline_estado="data/cache/pipeline_estado.json",
+    precos_parquet="data/cache/carbon_prices_long.parquet",
+    precos_meta="data/cache/carbon_prices_long.meta.json",
+    figuras_estado="data/cache/figuras_estado.json",
+    pib_dir="data/cache/pib",
+    ajuste_dir="data/cache/ajuste",
+    territorios_db="data/cache/territorios.sqlite",
+    token_api="data/cache/token_api.json",
+)
+
+# Validade do índice local de territórios da API de alertas (territorios.py)
+TERRITORIOS_TTL_DIAS = float(os.getenv("PIPELINE_TERRITORIOS_TTL_DIAS", "30"))
+
+# Cliente da API de alertas (cliente_api.py): URL base, limite de requisições
+# por segundo (0 = sem limite), tentativas e espera inicial do backoff em 429/5xx
+API_ALERTAS = SimpleNamespace(
+    url=os.getenv("MAPBIOMAS_API_URL", "http://localhost:8000"),
+    req_por_segundo=float(os.getenv("PIPELINE_API_RPS", "0")),
+    tentativas=int(os.getenv("PIPELINE_API_TENTATIVAS", "5")),
+    backoff=float(os.getenv("PIPELINE_API_BACKOFF", "1.0")),
+)
+
+# Formato físico dos intermediários de data/partial e data/generated
+# ('parquet' ou 'csv'; ver armazenamento.py) e exportação adicional em CSV
+FORMATO_INTERMEDIARIOS = os.getenv("PIPELINE_FORMATO", "parquet")
+EXPORTAR_CSV = os.getenv("PIPELINE_EXPORTAR_CSV", "0") == "1"
+
 # Features padrão para modelagem
 FEATURE_COLS = ['pib', 'GEE_tCO2e', 'area_desmatada_ha']
+
+# Orçamento de núcleos para o treino dos modelos (-1 = todos)
+N_JOBS = int(os.getenv("PIPELINE_N_JOBS", "-1"))